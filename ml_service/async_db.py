@@ -0,0 +1,68 @@
+import asyncio
+import functools
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List
+
+from enhanced_data_loader import EnhancedDataLoader, DEFAULT_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """
+    Асинхронний доступ до БД для FastAPI endpoint'ів.
+    Блокуючі виклики SQLite виконуються в пулі потоків; кожен потік має власне
+    з'єднання, тож запит, що виконується в потоці, користується ним одноосібно,
+    а event loop ніколи не чекає на SQLite.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_workers: int = 4, timeout: float = 30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ml-db")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        """З'єднання поточного потоку пулу (відкривається один раз)"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            # check_same_thread=False лише для закриття в close(); запити йдуть з цього потоку
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+            self._local.connection = conn
+            with self._lock:
+                self._connections.append(conn)
+            logger.debug(f"Відкрито з'єднання пулу в потоці {threading.current_thread().name}")
+        return conn
+
+    def _call(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        conn = self._thread_connection()
+        loader = EnhancedDataLoader(self.db_path, connection=conn)
+        try:
+            return fn(loader, *args, **kwargs)
+        finally:
+            # Незавершена транзакція не повинна перейти до наступного запиту
+            if conn.in_transaction:
+                conn.rollback()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Виконання fn(loader, *args, **kwargs) у потоці пулу.
+        loader - EnhancedDataLoader поверх з'єднання цього потоку.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self._call, fn, args, kwargs)
+        )
+
+    def close(self):
+        """Зупинка пулу та закриття з'єднань"""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
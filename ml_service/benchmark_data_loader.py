@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк завантаження взаємодій: pandas (read_sql_query) проти типізованих NumPy масивів
+
+Використання:
+    python benchmark_data_loader.py                      # БД проекту
+    python benchmark_data_loader.py --db path/to.db
+    python benchmark_data_loader.py --generate 2000000   # синтетична БД на N записів історії
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from data_loader import DataLoader
+
+
+def generate_database(path: str, history_rows: int, n_users: int = 5000, n_tracks: int = 50000):
+    """Синтетична БД з трьома джерелами взаємодій"""
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE History (Id INTEGER PRIMARY KEY, UserId INTEGER, SpotifyTrackId TEXT, ListenedAt TEXT);
+        CREATE TABLE Favorites (Id INTEGER PRIMARY KEY, UserId INTEGER, SpotifyTrackId TEXT, AddedToFavoritesAt TEXT);
+        CREATE TABLE UserSongInteractions (
+            Id INTEGER PRIMARY KEY, UserId INTEGER, SpotifyTrackId TEXT, InteractionType TEXT,
+            Rating REAL, PlayDuration INTEGER, IsLiked INTEGER, IsSkipped INTEGER, IsRepeat INTEGER,
+            InteractionTime TEXT
+        );
+    """)
+
+    def track():
+        return f"track{rng.randrange(n_tracks):06d}"
+
+    conn.executemany(
+        "INSERT INTO History (UserId, SpotifyTrackId, ListenedAt) VALUES (?, ?, '2025-06-01')",
+        ((rng.randrange(n_users), track()) for _ in range(history_rows))
+    )
+    conn.executemany(
+        "INSERT INTO Favorites (UserId, SpotifyTrackId, AddedToFavoritesAt) VALUES (?, ?, '2025-06-01')",
+        ((rng.randrange(n_users), track()) for _ in range(history_rows // 20))
+    )
+    conn.executemany(
+        """
+        INSERT INTO UserSongInteractions
+        (UserId, SpotifyTrackId, InteractionType, Rating, PlayDuration, IsLiked, IsSkipped, IsRepeat, InteractionTime)
+        VALUES (?, ?, 'listen', ?, 180, 0, 0, 0, '2025-06-01')
+        """,
+        ((rng.randrange(n_users), track(), rng.randint(1, 5)) for _ in range(history_rows // 10))
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(name: str, fn):
+    """Час та пікова пам'ять (tracemalloc) одного завантаження"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {name:<28} {elapsed:8.3f} с   пік пам'яті {peak / 1024 / 1024:9.1f} MB   рядків {len(result)}")
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк DataLoader")
+    parser.add_argument("--db", help="Шлях до SQLite БД")
+    parser.add_argument("--generate", type=int, help="Згенерувати синтетичну БД на N записів історії")
+    parser.add_argument("--repeat", type=int, default=3, help="Кількість повторів")
+    args = parser.parse_args()
+
+    db_path = args.db
+    if args.generate:
+        db_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        print(f"🛠️ Генерація синтетичної БД ({args.generate} записів історії)...")
+        generate_database(db_path, args.generate)
+
+    loader = DataLoader(db_path)
+
+    print("🏁 Бенчмарк завантаження взаємодій")
+    print("=" * 70)
+    for i in range(args.repeat):
+        print(f"Прогін {i + 1}:")
+        pandas_time, pandas_peak = measure("pandas read_sql_query", loader._read_user_interactions)
+        arrays_time, arrays_peak = measure("NumPy масиви", loader.load_interaction_arrays)
+        print(f"  ⚡ Прискорення: x{pandas_time / max(arrays_time, 1e-9):.2f}, "
+              f"пам'ять: x{pandas_peak / max(arrays_peak, 1):.2f}")
+
+
+if __name__ == "__main__":
+    main()
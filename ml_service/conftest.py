@@ -0,0 +1,159 @@
+"""
+Спільні фікстури для тестів ML сервісу: тимчасова SQLite БД зі схемою MusicRecommender
+"""
+
+import random
+import sqlite3
+
+import pytest
+
+SCHEMA = """
+CREATE TABLE Users (
+    UserId INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserName TEXT
+);
+CREATE TABLE SongFeatures (
+    SpotifyTrackId TEXT PRIMARY KEY,
+    Title TEXT, Artist TEXT, Genre TEXT,
+    Danceability REAL, Energy REAL, Valence REAL, Tempo REAL,
+    Acousticness REAL, Instrumentalness REAL, Speechiness REAL, Loudness REAL,
+    Popularity REAL, Key REAL, Mode REAL, TimeSignature REAL, DurationMs REAL,
+    ArtistPopularity REAL
+);
+CREATE TABLE History (
+    Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserId INTEGER, SpotifyTrackId TEXT,
+    Title TEXT, Artist TEXT, Genre TEXT, ImageUrl TEXT,
+    ListenedAt TEXT, Popularity REAL, ReleaseYear INTEGER
+);
+CREATE INDEX IX_History_UserId ON History (UserId);
+CREATE TABLE Favorites (
+    Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserId INTEGER NOT NULL, SpotifyTrackId TEXT,
+    Title TEXT, Artist TEXT, ImageUrl TEXT,
+    AddedToFavoritesAt TEXT
+);
+CREATE INDEX IX_Favorites_UserId ON Favorites (UserId);
+CREATE INDEX IX_Favorites_SpotifyTrackId ON Favorites (SpotifyTrackId);
+CREATE TABLE UserSongInteractions (
+    Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserId INTEGER NOT NULL, SpotifyTrackId TEXT NOT NULL,
+    InteractionType TEXT, Rating REAL, PlayDuration INTEGER,
+    IsLiked INTEGER, IsSkipped INTEGER, IsRepeat INTEGER,
+    InteractionTime TEXT
+);
+CREATE INDEX IX_UserSongInteractions_UserId ON UserSongInteractions (UserId);
+CREATE TABLE MLTrainingData (
+    Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserId INTEGER NOT NULL, SpotifyTrackId TEXT NOT NULL,
+    Danceability REAL, Energy REAL, Valence REAL, Tempo REAL, Acousticness REAL,
+    Instrumentalness REAL, Speechiness REAL, Loudness REAL, Popularity REAL,
+    DurationMs REAL, [Key] INTEGER, Mode INTEGER, TimeSignature INTEGER,
+    Artist TEXT, Genre TEXT, ReleaseYear INTEGER, ArtistPopularity REAL,
+    Rating REAL, InteractionType INTEGER, PlayCount INTEGER, PlayDuration REAL,
+    ListeningContext TEXT, Timestamp TEXT,
+    UserAvgDanceability REAL, UserAvgEnergy REAL, UserAvgValence REAL, UserAvgTempo REAL
+);
+CREATE INDEX IX_MLTrainingData_Timestamp ON MLTrainingData (Timestamp);
+CREATE UNIQUE INDEX IX_MLTrainingData_UserId_SpotifyTrackId ON MLTrainingData (UserId, SpotifyTrackId);
+CREATE TABLE MLModelMetrics (
+    Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ModelType TEXT NOT NULL, ModelVersion TEXT NOT NULL,
+    Accuracy REAL, Precision REAL, Recall REAL, F1Score REAL, MAE REAL, MSE REAL,
+    TrainingSamples INTEGER, TestSamples INTEGER, UniqueUsers INTEGER, UniqueTracks INTEGER,
+    TrainingDate TEXT, TrainingDuration TEXT, ModelConfig TEXT, FeatureImportance TEXT
+);
+CREATE INDEX IX_MLModelMetrics_ModelType_TrainingDate ON MLModelMetrics (ModelType, TrainingDate);
+CREATE TABLE MLUserProfiles (
+    Id INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserId INTEGER NOT NULL,
+    PreferredDanceability REAL, PreferredEnergy REAL, PreferredValence REAL, PreferredTempo REAL,
+    PreferredAcousticness REAL, PreferredInstrumentalness REAL, PreferredSpeechiness REAL,
+    PreferredLoudness REAL, DanceabilityVariance REAL, EnergyVariance REAL, ValenceVariance REAL,
+    TempoVariance REAL, SkipRate REAL, RepeatRate REAL, ExplorationRate REAL,
+    GenreDiversity REAL, ArtistDiversity REAL, ClusterId INTEGER,
+    TotalInteractions INTEGER, LastUpdated TEXT
+);
+"""
+
+GENRES = ['Rock', 'Pop', 'Jazz', 'Electronic', 'Hip-Hop']
+
+
+def populate(conn: sqlite3.Connection, n_users: int = 12, n_tracks: int = 60, seed: int = 7):
+    """Детерміновані демо-дані для всіх джерел взаємодій"""
+    rng = random.Random(seed)
+
+    for user_id in range(1, n_users + 1):
+        conn.execute("INSERT INTO Users (UserId, UserName) VALUES (?, ?)", (user_id, f"user{user_id}"))
+
+    for t in range(n_tracks):
+        conn.execute(
+            """
+            INSERT INTO SongFeatures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                f"track{t:03d}", f" Title {t}\n", f"Artist {t % 9}", GENRES[t % len(GENRES)],
+                rng.random(), rng.random(), rng.random(), rng.uniform(60, 180),
+                rng.random(), rng.random(), rng.random(), rng.uniform(-20, 0),
+                rng.randint(0, 100), rng.randint(0, 11), rng.randint(0, 1), 4, rng.randint(120000, 300000),
+                rng.randint(0, 100),
+            ),
+        )
+
+    for user_id in range(1, n_users + 1):
+        tracks = rng.sample(range(n_tracks), 15)
+        for t in tracks[:6]:
+            for _ in range(rng.randint(1, 3)):
+                conn.execute(
+                    """
+                    INSERT INTO History (UserId, SpotifyTrackId, Title, Artist, Genre, ListenedAt, Popularity, ReleaseYear)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (user_id, f"track{t:03d}", f"Title {t}", f"Artist {t % 9}", GENRES[t % len(GENRES)],
+                     f"2025-06-{rng.randint(1, 28):02d}T12:00:00", 50, 2000 + t % 20),
+                )
+        for t in tracks[4:9]:
+            conn.execute(
+                "INSERT INTO Favorites (UserId, SpotifyTrackId, Title, Artist, AddedToFavoritesAt) VALUES (?, ?, ?, ?, ?)",
+                (user_id, f"track{t:03d}", f"Title {t}", f"Artist {t % 9}", f"2025-06-{rng.randint(1, 28):02d}T13:00:00"),
+            )
+        for t in tracks[8:15]:
+            conn.execute(
+                """
+                INSERT INTO UserSongInteractions
+                (UserId, SpotifyTrackId, InteractionType, Rating, PlayDuration, IsLiked, IsSkipped, IsRepeat, InteractionTime)
+                VALUES (?, ?, 'listen', ?, ?, ?, ?, ?, ?)
+                """,
+                (user_id, f"track{t:03d}", float(rng.randint(1, 5)), rng.randint(10, 240),
+                 int(rng.random() < 0.4), int(rng.random() < 0.2), int(rng.random() < 0.2),
+                 f"2025-06-{rng.randint(1, 28):02d}T14:00:00"),
+            )
+        for t in tracks:
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO MLTrainingData
+                (UserId, SpotifyTrackId, Danceability, Energy, Valence, Tempo, Acousticness, Instrumentalness,
+                 Speechiness, Loudness, Popularity, DurationMs, [Key], Mode, TimeSignature, Artist, Genre,
+                 ReleaseYear, ArtistPopularity, Rating, InteractionType, PlayCount, PlayDuration,
+                 ListeningContext, Timestamp, UserAvgDanceability, UserAvgEnergy, UserAvgValence, UserAvgTempo)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (user_id, f"track{t:03d}", rng.random(), rng.random(), rng.random(), rng.uniform(60, 180),
+                 rng.random(), rng.random(), rng.random(), rng.uniform(-20, 0), rng.randint(0, 100),
+                 200000, rng.randint(0, 11), 1, 4, f"Artist {t % 9}", GENRES[t % len(GENRES)],
+                 2000 + t % 20, 50, rng.random(), rng.randint(1, 4), rng.randint(1, 5), 180.0,
+                 rng.choice(['morning', 'afternoon', 'evening', 'night']),
+                 f"2025-06-{rng.randint(1, 28):02d}T15:00:00", 0.5, 0.5, 0.5, 120.0),
+            )
+    conn.commit()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Шлях до заповненої тимчасової БД"""
+    path = str(tmp_path / "MusicRecommender.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    populate(conn)
+    conn.close()
+    return path
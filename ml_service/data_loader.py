@@ -1,14 +1,277 @@
 import pandas as pd
 import numpy as np
 import sqlite3
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Dict, NamedTuple
 import logging
 import os
+import threading
+from datetime import datetime
+from track_catalog import TrackCatalog
+from db_connections import get_connection_manager
+from training_set_store import TrainingSetStore
+from db_indexes import USER_TRACK_INDEXES, create_indexes
 
 logger = logging.getLogger(__name__)
 
+
+class InteractionSnapshot:
+    """
+    Незмінний знімок взаємодій користувачів, побудований один раз на версію БД.
+    Фрейм спільний для всіх запитів, тому його не можна модифікувати.
+    """
+
+    def __init__(self, interactions: pd.DataFrame, data_version: Tuple):
+        self.interactions = interactions
+        self.data_version = data_version
+        # Позиції рядків кожного користувача - зріз без повторного сканування
+        if interactions.empty:
+            self._user_rows = {}
+        else:
+            self._user_rows = interactions.groupby('UserId', sort=False).indices
+        self._heard_tracks: Dict[int, frozenset] = {}
+
+    def user_interactions(self, user_id: int) -> pd.DataFrame:
+        """Взаємодії одного користувача"""
+        rows = self._user_rows.get(user_id)
+        if rows is None:
+            return self.interactions.iloc[0:0]
+        return self.interactions.iloc[rows]
+
+    def heard_tracks(self, user_id: int) -> frozenset:
+        """Треки, які користувач вже слухав (будується ліниво, один раз на користувача)"""
+        heard = self._heard_tracks.get(user_id)
+        if heard is None:
+            rows = self._user_rows.get(user_id)
+            if rows is None:
+                heard = frozenset()
+            else:
+                heard = frozenset(self.interactions['SpotifyTrackId'].values[rows])
+            self._heard_tracks[user_id] = heard
+        return heard
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+
+class InteractionArrays(NamedTuple):
+    """
+    Типізовані масиви взаємодій для тренування (без DataFrame).
+    Коди - індекси у словниках user_ids / track_ids.
+    """
+    user_codes: np.ndarray  # int32
+    item_codes: np.ndarray  # int32
+    ratings: np.ndarray     # float32
+    user_ids: np.ndarray    # int64, відсортовані
+    track_ids: np.ndarray   # object, відсортовані
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+
+class TrainingSet(NamedTuple):
+    """
+    Дані для тренування: COO масиви рейтингів + фічі один раз на трек.
+    item_features[item_code] - рядок фічей у порядку feature_columns.
+    """
+    user_codes: np.ndarray     # int32
+    item_codes: np.ndarray     # int32
+    ratings: np.ndarray        # float32
+    user_ids: np.ndarray       # int64, відсортовані
+    track_ids: np.ndarray      # object, відсортовані
+    item_features: np.ndarray  # float32 [n_items, n_features]
+    feature_columns: list
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+
+class UserProfiles:
+    """
+    Профілі смаку всіх користувачів, обчислені одним SQL запитом на версію БД.
+    Рядок матриць - код користувача (індекс у відсортованому user_ids).
+    """
+
+    def __init__(self, rows: pd.DataFrame, data_version: Optional[Tuple] = None):
+        self.data_version = data_version
+
+        self.user_ids, user_codes = np.unique(rows['UserId'].to_numpy(dtype=np.int64), return_inverse=True)
+        # Жанр NULL (-1 у factorize) не потрапляє в preferred_genres. Навмисна зміна: раніше
+        # load_song_features перетворював NULL через astype(str), і value_counts рахував жанр 'None'
+        genre_codes, genres = pd.factorize(rows['Genre'], sort=True)
+        self.genres = np.asarray(genres, dtype=object)
+        n_users = len(self.user_ids)
+
+        # Рядки запиту згруповані по (UserId, Genre) - підсумовуємо групи користувача
+        sums = np.zeros((n_users, len(PROFILE_FEATURES)))
+        counts = np.zeros((n_users, len(PROFILE_FEATURES)))
+        for i, column in enumerate(PROFILE_FEATURES):
+            np.add.at(sums[:, i], user_codes, rows[f'Sum{column}'].fillna(0).to_numpy(dtype=float))
+            np.add.at(counts[:, i], user_codes, rows[f'Count{column}'].to_numpy(dtype=float))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.features = (sums / counts).astype(np.float32)  # NaN якщо значень немає
+
+        liked = rows['LikedCount'].to_numpy(dtype=np.int32)
+        self.liked_counts = np.zeros(n_users, dtype=np.int32)
+        np.add.at(self.liked_counts, user_codes, liked)
+        known = genre_codes >= 0
+        self.genre_counts = np.zeros((n_users, len(self.genres)), dtype=np.int32)
+        np.add.at(self.genre_counts, (user_codes[known], genre_codes[known]), liked[known])
+        self.total_interactions = np.zeros(n_users, dtype=np.int64)
+        self.total_interactions[user_codes] = rows['TotalInteractions'].to_numpy(dtype=np.int64)
+
+        for array in (self.features, self.genre_counts, self.liked_counts, self.total_interactions):
+            array.setflags(write=False)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def user_code(self, user_id: int) -> int:
+        """Код користувача (-1 якщо профілю немає)"""
+        code = int(np.searchsorted(self.user_ids, user_id))
+        if code < len(self.user_ids) and self.user_ids[code] == user_id:
+            return code
+        return -1
+
+    def profile(self, user_id: int) -> dict:
+        """Профіль у форматі DataLoader.get_user_profile ({} якщо профілю немає)"""
+        code = self.user_code(user_id)
+        if code < 0:
+            return {}
+        genre_counts = self.genre_counts[code]
+        order = np.argsort(-genre_counts, kind='stable')
+        profile = {
+            f'avg_{column.lower()}': float(value)
+            for column, value in zip(PROFILE_FEATURES, self.features[code])
+        }
+        profile.update({
+            'preferred_genres': {self.genres[g]: int(genre_counts[g]) for g in order if genre_counts[g] > 0},
+            'total_interactions': int(self.total_interactions[code]),
+            'liked_count': int(self.liked_counts[code])
+        })
+        return profile
+
+
+def _sorting_permutation(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Порядок сортування та ранг кожного елемента (для перекодування кодів)"""
+    order = np.argsort(values, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return order, rank
+
+
+# Джерела взаємодій, з яких складається "вже прослухане" користувачем
+INTERACTION_SOURCES = ['UserSongInteractions', 'Favorites', 'History']
+
+# SELECT для кожного джерела з єдиним набором колонок для UNION ALL.
+# Favorites та History - неявні сигнали з фіксованим рейтингом 5.0 та 3.0.
+INTERACTION_SOURCE_QUERIES = {
+    'UserSongInteractions': """
+        SELECT UserId, SpotifyTrackId, 0 AS SourcePriority, InteractionType, Rating,
+               PlayDuration, IsLiked, IsSkipped, IsRepeat, 1 AS IsPlay, InteractionTime
+        FROM UserSongInteractions
+        WHERE UserId IS NOT NULL AND SpotifyTrackId IS NOT NULL""",
+    'Favorites': """
+        SELECT UserId, SpotifyTrackId, 1 AS SourcePriority, 'favorite' AS InteractionType, 5.0 AS Rating,
+               NULL AS PlayDuration, 1 AS IsLiked, 0 AS IsSkipped, 0 AS IsRepeat, 0 AS IsPlay,
+               AddedToFavoritesAt AS InteractionTime
+        FROM Favorites
+        WHERE UserId IS NOT NULL AND SpotifyTrackId IS NOT NULL""",
+    'History': """
+        SELECT UserId, SpotifyTrackId, 2 AS SourcePriority, 'listen' AS InteractionType, 3.0 AS Rating,
+               NULL AS PlayDuration, 0 AS IsLiked, 0 AS IsSkipped, 0 AS IsRepeat, 1 AS IsPlay,
+               ListenedAt AS InteractionTime
+        FROM History
+        WHERE UserId IS NOT NULL AND SpotifyTrackId IS NOT NULL""",
+}
+
+# Колонки джерел, з яких складаються дані для тренування (user, track, rating):
+# по них рахується контрольна сума у відбитку training_data_fingerprint
+TRAINING_SOURCE_COLUMNS = {
+    'UserSongInteractions': {'numeric': ['UserId', 'Rating'], 'text': ['SpotifyTrackId']},
+    'Favorites': {'numeric': ['UserId'], 'text': ['SpotifyTrackId']},
+    'History': {'numeric': ['UserId'], 'text': ['SpotifyTrackId']},
+}
+
+
+def _content_checksum_sql(numeric: list, text: list) -> str:
+    """
+    Цілочисельна контрольна сума вмісту таблиці одним SQL агрегатом.
+    Кожен доданок зважується позицією рядка (rowid), тож зміна значення на місці,
+    обмін значеннями між рядками та DELETE + INSERT змінюють суму. Для тексту
+    враховуються довжина та перший, середній і останній символи. Модулі тримають
+    SUM у межах int64 навіть для десятків мільйонів рядків.
+    """
+    terms = [f"(CAST(ROUND(COALESCE({column}, 0) * 100) AS INTEGER) % 100003)" for column in numeric]
+    terms += [
+        f"(COALESCE(length({column}), 0) + 3 * COALESCE(unicode({column}), 0)"
+        f" + 5 * COALESCE(unicode(substr({column}, length({column}) / 2 + 1, 1)), 0)"
+        f" + 7 * COALESCE(unicode(substr({column}, -1)), 0))"
+        for column in text
+    ]
+    return f"COALESCE(SUM((rowid % 65521 + 1) * ({' + '.join(terms)})), 0)"
+
+# Агреговані сигнали на (UserId, SpotifyTrackId).
+# Тип взаємодії береться з джерела з найвищим пріоритетом
+# (UserSongInteractions > Favorites > History).
+AGGREGATED_SIGNALS = [
+    "substr(MIN(SourcePriority || InteractionType), 2) AS InteractionType",
+    "MAX(Rating) AS Rating",
+    "MAX(PlayDuration) AS PlayDuration",
+    "MAX(IsLiked) AS IsLiked",
+    "MAX(IsSkipped) AS IsSkipped",
+    "MAX(IsRepeat) AS IsRepeat",
+    "SUM(IsPlay) AS PlayCount",
+    "SUM(IsSkipped) AS SkipCount",
+    "SUM(IsRepeat) AS RepeatCount",
+    "MAX(InteractionTime) AS InteractionTime",
+]
+
+# Колонки неявних сигналів (load_implicit_signals)
+IMPLICIT_SIGNAL_COLUMNS = ['UserId', 'SpotifyTrackId', 'PlayCount', 'IsLiked', 'SkipCount', 'RepeatCount', 'PlayDuration']
+
+# Аудіо фічі, з яких складається профіль смаку користувача
+PROFILE_FEATURES = ['Danceability', 'Energy', 'Valence', 'Tempo', 'Acousticness']
+
+# Колонки рядка запиту профілів (по одному рядку на UserId + Genre)
+PROFILE_ROW_COLUMNS = ['UserId', 'Genre', 'LikedCount', 'TotalInteractions'] + [
+    f'{prefix}{column}' for column in PROFILE_FEATURES for prefix in ('Sum', 'Count')
+]
+
+
+def _clean_text_sql(column: str) -> str:
+    """SQL-аналог очищення тексту в _read_song_features (NULL лишається NULL)"""
+    return f"trim(replace({column}, char(10), ''))"
+
+
+# Збережені high-watermarks джерел (для інкрементального тренування)
+WATERMARKS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS MLDataWatermarks (
+    Name TEXT NOT NULL,
+    SourceTable TEXT NOT NULL,
+    LastRowId INTEGER NOT NULL,
+    UpdatedAt TEXT NOT NULL,
+    PRIMARY KEY (Name, SourceTable)
+)
+"""
+
+# Кеші на рівні процесу, спільні для всіх екземплярів DataLoader
+_interaction_snapshots: Dict[str, InteractionSnapshot] = {}
+_track_catalogs: Dict[str, TrackCatalog] = {}
+_user_profiles: Dict[str, UserProfiles] = {}
+# Побудова кешованого об'єкта блокує лише запити до того ж кешу тієї ж БД;
+# загальний замок лише коротко захищає словник замків
+_build_locks: Dict[Tuple[int, str], threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+
+
+def _build_lock(cache: Dict, db_path: str) -> threading.Lock:
+    """Замок побудови для пари (кеш, БД)"""
+    with _build_locks_guard:
+        return _build_locks.setdefault((id(cache), db_path), threading.Lock())
+
+
 class DataLoader:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, snapshot_dir: str = None):
         if db_path is None:
             # Шлях до бази даних відносно ml_service директорії
             current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,113 +280,501 @@ class DataLoader:
         else:
             self.db_path = db_path
             
+        self.connections = get_connection_manager(self.db_path)
+        # Знімки підготовлених даних для тренування на диску (None - вимкнено)
+        self.snapshot_store = TrainingSetStore(snapshot_dir) if snapshot_dir else None
         logger.info(f"Використовується база даних: {self.db_path}")
+    
+    def __reduce__(self):
+        # Між процесами передаються лише параметри: з'єднання та кеші - свої в кожному процесі
+        return DataLoader, (self.db_path, self.snapshot_store.root if self.snapshot_store else None)
         
     def connect_db(self) -> sqlite3.Connection:
-        """Підключення до бази даних"""
+        """Перевикористовуване read-only з'єднання поточного потоку"""
         try:
-            if not os.path.exists(self.db_path):
-                logger.error(f"База даних не знайдена: {self.db_path}")
-                raise FileNotFoundError(f"Database file not found: {self.db_path}")
-                
-            conn = sqlite3.connect(self.db_path)
-            return conn
+            return self.connections.reader()
         except Exception as e:
             logger.error(f"Помилка підключення до БД: {e}")
             raise
-    
+
+    def training_snapshot(self):
+        """Контекст узгодженого знімка БД на час тренування"""
+        return self.connections.snapshot()
+
+    def connection_stats(self) -> Dict:
+        """Лічильники відкриттів з'єднань та запитів"""
+        return self.connections.stats()
+
+    def get_data_version(self) -> Optional[Tuple]:
+        """Поточна версія даних БД (None, якщо БД недоступна)"""
+        try:
+            return self.connections.data_version()
+        except Exception as e:
+            logger.error(f"Не вдалося визначити версію даних: {e}")
+            return None
+
+    def _get_versioned(self, cache: Dict, build):
+        """
+        Об'єкт з кешу процесу для поточної версії БД.
+        build(version) викликається лише тоді, коли дані в БД змінились.
+        """
+        version = self.get_data_version()
+        if version is None or self.connections.is_pinned():
+            # Всередині знімка тренування дані можуть бути старшими за версію - не кешуємо
+            return build(version)
+
+        cached = cache.get(self.db_path)
+        if cached is not None and cached.data_version == version:
+            return cached
+
+        with _build_lock(cache, self.db_path):
+            # Інший потік міг вже побудувати об'єкт, поки ми чекали
+            cached = cache.get(self.db_path)
+            if cached is not None and cached.data_version == version:
+                return cached
+
+            cached = build(version)
+            cache[self.db_path] = cached
+            return cached
+
+    def get_interaction_snapshot(self) -> InteractionSnapshot:
+        """Знімок взаємодій для поточної версії БД"""
+        def build(version):
+            snapshot = InteractionSnapshot(self._read_user_interactions(), version)
+            logger.info(f"Побудовано знімок взаємодій ({len(snapshot)} записів)")
+            return snapshot
+
+        return self._get_versioned(_interaction_snapshots, build)
+
+    def get_track_catalog(self) -> TrackCatalog:
+        """Каталог треків для поточної версії БД"""
+        def build(version):
+            catalog = TrackCatalog(self._read_song_features(), version)
+            logger.info(f"Побудовано каталог треків ({len(catalog)} треків)")
+            return catalog
+
+        return self._get_versioned(_track_catalogs, build)
+
     def load_user_interactions(self) -> pd.DataFrame:
-        """Завантаження взаємодій користувачів з піснями з усіх джерел"""
-        
-        # 1. Завантажуємо з UserSongInteractions (якщо є)
-        interactions_list = []
-        
+        """
+        Взаємодії користувачів з піснями з усіх джерел.
+        Повертає спільний кешований фрейм - не модифікуйте його.
+        """
+        return self.get_interaction_snapshot().interactions
+
+    def get_user_interactions(self, user_id: int) -> pd.DataFrame:
+        """Взаємодії одного користувача зі знімка без повторного сканування"""
+        return self.get_interaction_snapshot().user_interactions(user_id)
+
+    def get_listened_tracks(self, user_id: int) -> frozenset:
+        """
+        Треки, які користувач вже слухав (з усіх джерел).
+        Якщо знімок взаємодій актуальний - відповідаємо з пам'яті,
+        інакше робимо індексовані запити WHERE UserId = ? без побудови знімка.
+        """
+        snapshot = _interaction_snapshots.get(self.db_path)
+        if snapshot is not None and snapshot.data_version == self.get_data_version():
+            return snapshot.heard_tracks(user_id)
+
+        heard = set()
         try:
             with self.connect_db() as conn:
-                # Спробуємо завантажити з UserSongInteractions
-                try:
-                    query_interactions = """
-                    SELECT 
-                        UserId,
-                        SpotifyTrackId,
-                        InteractionType,
-                        Rating,
-                        PlayDuration,
-                        IsLiked,
-                        IsSkipped,
-                        IsRepeat,
-                        InteractionTime
-                    FROM UserSongInteractions
-                    """
-                    df_interactions = pd.read_sql_query(query_interactions, conn)
-                    if not df_interactions.empty:
-                        interactions_list.append(df_interactions)
-                        logger.info(f"Завантажено {len(df_interactions)} з UserSongInteractions")
-                except Exception as e:
-                    logger.info(f"UserSongInteractions не доступна: {e}")
-                
-                # 2. Завантажуємо з Favorites
-                try:
-                    query_favorites = """
-                    SELECT 
-                        UserId,
-                        SpotifyTrackId,
-                        'favorite' as InteractionType,
-                        5.0 as Rating,
-                        NULL as PlayDuration,
-                        1 as IsLiked,
-                        0 as IsSkipped,
-                        0 as IsRepeat,
-                        AddedToFavoritesAt as InteractionTime
-                    FROM Favorites
-                    """
-                    df_favorites = pd.read_sql_query(query_favorites, conn)
-                    if not df_favorites.empty:
-                        interactions_list.append(df_favorites)
-                        logger.info(f"Завантажено {len(df_favorites)} з Favorites")
-                except Exception as e:
-                    logger.info(f"Favorites не доступна: {e}")
-                
-                # 3. Завантажуємо з History
-                try:
-                    query_history = """
-                    SELECT 
-                        UserId,
-                        SpotifyTrackId,
-                        'listen' as InteractionType,
-                        3.0 as Rating,
-                        NULL as PlayDuration,
-                        0 as IsLiked,
-                        0 as IsSkipped,
-                        0 as IsRepeat,
-                        ListenedAt as InteractionTime
-                    FROM History
-                    """
-                    df_history = pd.read_sql_query(query_history, conn)
-                    if not df_history.empty:
-                        interactions_list.append(df_history)
-                        logger.info(f"Завантажено {len(df_history)} з History")
-                except Exception as e:
-                    logger.info(f"History не доступна: {e}")
-                
+                for table in INTERACTION_SOURCES:
+                    try:
+                        cursor = conn.execute(
+                            f"SELECT DISTINCT SpotifyTrackId FROM {table} WHERE UserId = ?",
+                            (user_id,)
+                        )
+                        heard.update(row[0] for row in cursor)
+                    except sqlite3.Error as e:
+                        logger.info(f"{table} не доступна: {e}")
         except Exception as e:
-            logger.error(f"Помилка підключення до БД: {e}")
+            logger.error(f"Помилка завантаження прослуханих треків: {e}")
+        return frozenset(heard)
+
+    def get_user_ratings(self, user_id: int) -> pd.DataFrame:
+        """
+        Поточні агреговані рейтинги користувача (SpotifyTrackId, Rating) - як у тренуванні,
+        максимум по всіх джерелах. Зі знімка, якщо він актуальний, інакше індексований запит.
+        """
+        snapshot = _interaction_snapshots.get(self.db_path)
+        if snapshot is not None and snapshot.data_version == self.get_data_version():
+            return snapshot.user_interactions(user_id)[['SpotifyTrackId', 'Rating']]
+
+        try:
+            with self.connect_db() as conn:
+                sources = self._existing_sources(conn)
+                if sources:
+                    query = self._aggregated_interactions_query(
+                        sources, ["MAX(Rating) AS Rating"],
+                        row_filters={table: "UserId = ?" for table in sources}
+                    )
+                    return pd.read_sql_query(query, conn, params=(user_id,) * len(sources))[
+                        ['SpotifyTrackId', 'Rating']
+                    ]
+        except Exception as e:
+            logger.error(f"Помилка завантаження рейтингів користувача {user_id}: {e}")
+        return pd.DataFrame(columns=['SpotifyTrackId', 'Rating'])
+
+    def ensure_indexes(self) -> int:
+        """Створення індексів (UserId, SpotifyTrackId) для джерел взаємодій"""
+        created = create_indexes(self.connections.writer(), USER_TRACK_INDEXES)
+        logger.info(f"Перевірено {created} індексів взаємодій")
+        return created
+
+    def _existing_sources(self, conn: sqlite3.Connection) -> list:
+        """Джерела взаємодій, таблиці яких існують у БД"""
+        placeholders = ','.join('?' for _ in INTERACTION_SOURCES)
+        existing = {
+            row[0] for row in conn.execute(
+                f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+                INTERACTION_SOURCES
+            )
+        }
+        return [table for table in INTERACTION_SOURCES if table in existing]
+
+    def _aggregated_interactions_query(self, sources: list, aggregates: list = None,
+                                       row_filters: Optional[Dict[str, str]] = None) -> str:
+        """
+        Один UNION ALL запит по всіх джерелах з агрегацією в SQLite:
+        рівно один рядок на (UserId, SpotifyTrackId) з агрегованими сигналами.
+        row_filters - додаткові умови WHERE для окремих джерел.
+        """
+        row_filters = row_filters or {}
+        union_sql = "\nUNION ALL\n".join(
+            INTERACTION_SOURCE_QUERIES[table] + (f" AND {row_filters[table]}" if table in row_filters else "")
+            for table in sources
+        )
+        select_sql = ",\n            ".join(aggregates or AGGREGATED_SIGNALS)
+        return f"""
+        WITH AllInteractions AS (
+            {union_sql}
+        )
+        SELECT
+            UserId,
+            SpotifyTrackId,
+            {select_sql}
+        FROM AllInteractions
+        GROUP BY UserId, SpotifyTrackId
+        """
+
+    def _read_user_interactions(self) -> pd.DataFrame:
+        """Завантаження агрегованих взаємодій користувачів з піснями з усіх джерел"""
+        try:
+            with self.connect_db() as conn:
+                sources = self._existing_sources(conn)
+                if not sources:
+                    logger.warning("Не знайдено жодної таблиці взаємодій користувачів")
+                    return pd.DataFrame()
+
+                df = pd.read_sql_query(self._aggregated_interactions_query(sources), conn)
+        except Exception as e:
+            logger.error(f"Помилка завантаження взаємодій: {e}")
             return pd.DataFrame()
-        
-        # Об'єднуємо всі джерела даних
-        if interactions_list:
-            df = pd.concat(interactions_list, ignore_index=True)
-            
-            # Видаляємо дублікати (той самий користувач + трек)
-            df = df.drop_duplicates(subset=['UserId', 'SpotifyTrackId'], keep='first')
-            
-            logger.info(f"Загалом завантажено {len(df)} унікальних взаємодій користувачів")
-            return df
-        else:
+
+        if df.empty:
             logger.warning("Не знайдено жодних взаємодій користувачів")
             return pd.DataFrame()
+
+        logger.info(f"Загалом завантажено {len(df)} унікальних взаємодій користувачів з {', '.join(sources)}")
+        return df
     
+    def iter_interaction_chunks(self, chunk_size: int = 50000):
+        """Агреговані взаємодії (UserId, SpotifyTrackId, Rating) порціями по chunk_size рядків"""
+        with self.connect_db() as conn:
+            sources = self._existing_sources(conn)
+            if not sources:
+                logger.warning("Не знайдено жодної таблиці взаємодій користувачів")
+                return
+
+            cursor = conn.execute(self._aggregated_interactions_query(sources, ["MAX(Rating) AS Rating"]))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def get_current_watermark(self) -> Dict[str, int]:
+        """Поточний high-watermark (MAX(rowid)) кожного джерела взаємодій"""
+        with self.connect_db() as conn:
+            return {
+                table: conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+                for table in self._existing_sources(conn)
+            }
+
+    def interaction_checksums(self, until: Dict[str, int],
+                              since: Optional[Dict[str, int]] = None) -> Dict[str, list]:
+        """
+        COUNT(*) та контрольна сума колонок TRAINING_SOURCE_COLUMNS рядків джерел
+        взаємодій з since < rowid <= until. Суми адитивні: стан до нового watermark
+        дорівнює стану до старого плюс стан дельти, тож змінені на місці (UPDATE)
+        чи видалені старі рядки виявляються порівнянням зі збереженим станом.
+        """
+        with self.connect_db() as conn:
+            sources = set(self._existing_sources(conn))
+            checksums = {}
+            for table, last_row_id in until.items():
+                if table not in sources:
+                    continue
+                checksum = _content_checksum_sql(**TRAINING_SOURCE_COLUMNS[table])
+                first_row_id = (since or {}).get(table, 0)
+                checksums[table] = list(conn.execute(
+                    f"SELECT COUNT(*), {checksum} FROM {table} WHERE rowid > ? AND rowid <= ?",
+                    (int(first_row_id), int(last_row_id))
+                ).fetchone())
+        return checksums
+
+    def load_watermark(self, name: str = 'training') -> Dict[str, int]:
+        """Збережений watermark ({} якщо ще не зберігався)"""
+        try:
+            with self.connect_db() as conn:
+                rows = conn.execute(
+                    "SELECT SourceTable, LastRowId FROM MLDataWatermarks WHERE Name = ?", (name,)
+                ).fetchall()
+            return dict(rows)
+        except sqlite3.Error:
+            return {}
+
+    def save_watermark(self, watermark: Dict[str, int], name: str = 'training') -> None:
+        """Збереження watermark джерел взаємодій у БД"""
+        with self.connections.writer() as conn:
+            conn.execute(WATERMARKS_TABLE_SQL)
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO MLDataWatermarks (Name, SourceTable, LastRowId, UpdatedAt)
+                VALUES (?, ?, ?, ?)
+                """,
+                [(name, table, int(row_id), datetime.now().isoformat()) for table, row_id in watermark.items()]
+            )
+        logger.info(f"Збережено watermark '{name}': {watermark}")
+
+    def load_interactions_since(self, watermark: Dict[str, int],
+                                until: Optional[Dict[str, int]] = None) -> pd.DataFrame:
+        """
+        Агреговані взаємодії лише з рядків, доданих після watermark
+        (і не пізніше until, щоб дельта відповідала збереженому новому watermark).
+        Зміни на місці (UPDATE) та видалення старіших рядків сюди не потрапляють -
+        їх виявляє порівняння interaction_checksums до watermark.
+        """
+        try:
+            with self.connect_db() as conn:
+                sources = self._existing_sources(conn)
+                if not sources:
+                    return pd.DataFrame()
+
+                row_filters = {}
+                for table in sources:
+                    condition = f"rowid > {int(watermark.get(table, 0))}"
+                    if until is not None and table in until:
+                        condition += f" AND rowid <= {int(until[table])}"
+                    row_filters[table] = condition
+
+                query = self._aggregated_interactions_query(sources, row_filters=row_filters)
+                df = pd.read_sql_query(query, conn)
+        except Exception as e:
+            logger.error(f"Помилка завантаження нових взаємодій: {e}")
+            return pd.DataFrame()
+
+        logger.info(f"Завантажено {len(df)} нових взаємодій після watermark {watermark}")
+        return df
+
+    def load_implicit_signals(self) -> pd.DataFrame:
+        """
+        Неявні сигнали на (UserId, SpotifyTrackId) для implicit ALS:
+        кількість прослуховувань, пропусків, повторів, лайк та найдовше прослуховування (с)
+        """
+        try:
+            with self.connect_db() as conn:
+                sources = self._existing_sources(conn)
+                if not sources:
+                    return pd.DataFrame(columns=IMPLICIT_SIGNAL_COLUMNS)
+                query = self._aggregated_interactions_query(sources, aggregates=[
+                    "SUM(IsPlay) AS PlayCount",
+                    "COALESCE(MAX(IsLiked), 0) AS IsLiked",
+                    "COALESCE(SUM(IsSkipped), 0) AS SkipCount",
+                    "COALESCE(SUM(IsRepeat), 0) AS RepeatCount",
+                    "MAX(PlayDuration) AS PlayDuration",
+                ])
+                df = pd.read_sql_query(query, conn)
+        except Exception as e:
+            logger.error(f"Помилка завантаження неявних сигналів: {e}")
+            return pd.DataFrame(columns=IMPLICIT_SIGNAL_COLUMNS)
+
+        logger.info(f"Завантажено неявні сигнали для {len(df)} пар користувач-трек")
+        return df
+
+    def load_interaction_arrays(self, chunk_size: int = 50000) -> InteractionArrays:
+        """
+        Швидкий шлях без pandas: рядки курсора потоково пишуться в типізовані масиви,
+        треки кодуються словником по ходу читання. Кількість агрегованих пар наперед
+        невідома (History має багато прослуховувань на пару), тож масиви починаються
+        з chunk_size і подвоюються - виділено не більше ніж удвічі від записаного.
+        """
+        capacity = chunk_size
+        users = np.empty(capacity, dtype=np.int64)
+        item_codes = np.empty(capacity, dtype=np.int32)
+        ratings = np.empty(capacity, dtype=np.float32)
+        track_codes: Dict[str, int] = {}
+
+        n = 0
+        for rows in self.iter_interaction_chunks(chunk_size):
+            end = n + len(rows)
+            if end > capacity:
+                capacity = max(end, capacity * 2)
+                users = np.resize(users, capacity)
+                item_codes = np.resize(item_codes, capacity)
+                ratings = np.resize(ratings, capacity)
+            chunk_users, chunk_tracks, chunk_ratings = zip(*rows)
+            users[n:end] = chunk_users
+            item_codes[n:end] = [track_codes.setdefault(t, len(track_codes)) for t in chunk_tracks]
+            ratings[n:end] = chunk_ratings
+            n = end
+
+        if n == 0:
+            return self._empty_interaction_arrays()
+
+        # Відсортовані словники (як і раніше в мапінгах моделей)
+        user_ids, user_codes = np.unique(users[:n], return_inverse=True)
+        track_ids = np.empty(len(track_codes), dtype=object)
+        track_ids[list(track_codes.values())] = list(track_codes.keys())
+        order, rank = _sorting_permutation(track_ids)
+
+        arrays = InteractionArrays(
+            user_codes=user_codes.astype(np.int32),
+            item_codes=rank[item_codes[:n]],
+            ratings=ratings[:n].copy(),
+            user_ids=user_ids,
+            track_ids=track_ids[order],
+        )
+        logger.info(f"Завантажено {n} взаємодій у масиви ({len(user_ids)} користувачів, {len(order)} треків)")
+        return arrays
+
+    def training_data_fingerprint(self, feature_columns: list, catalog: Optional[TrackCatalog] = None) -> Dict:
+        """
+        Стійкий між перезапусками відбиток даних для тренування:
+        - MAX(rowid), COUNT(*) та контрольна сума колонок UserId/SpotifyTrackId/Rating
+          джерел взаємодій (один прохід по таблиці на джерело)
+        - відбиток каталогу (ідентифікатори треків + матриця фічей) замість лічильників SongFeatures
+        - набір фічей
+        Додавання, видалення та зміни на місці (UPDATE, напр. fix_spotify_ids.py) змінюють відбиток.
+        Контрольна сума тексту неповна (довжина та три символи), але перейменування треку,
+        що є в каталозі, змінює й відбиток каталогу.
+        """
+        with self.connect_db() as conn:
+            tables = {}
+            for table in self._existing_sources(conn):
+                checksum = _content_checksum_sql(**TRAINING_SOURCE_COLUMNS[table])
+                tables[table] = list(conn.execute(
+                    f"SELECT COALESCE(MAX(rowid), 0), COUNT(*), {checksum} FROM {table}"
+                ).fetchone())
+        return {
+            'db_path': os.path.abspath(self.db_path),
+            'tables': tables,
+            'catalog': (catalog or self.get_track_catalog()).fingerprint,
+            'feature_columns': list(feature_columns),
+        }
+
+    def prepare_training_set(self, feature_columns: list, chunk_size: int = 50000,
+                             catalog: Optional[TrackCatalog] = None) -> TrainingSet:
+        """
+        Дані для тренування. Якщо увімкнене сховище знімків і дані не змінились
+        з минулого разу - масиви читаються з диска (memory-map) без запитів до БД,
+        інакше будуються з SQLite і зберігаються для наступних запусків.
+        catalog - каталог, прочитаний з того ж знімка БД (інакше читається тут).
+        """
+        # Каталог читається один раз: і для відбитка, і для побудови (у знімку тренування він не кешується)
+        catalog = catalog or self.get_track_catalog()
+        if self.snapshot_store is None:
+            return self._build_training_set(feature_columns, chunk_size, catalog)
+
+        fingerprint = self.training_data_fingerprint(feature_columns, catalog)
+        arrays = self.snapshot_store.load(fingerprint)
+        if arrays is not None:
+            # Словник треків - невеликий, тримаємо як object для сумісності з рештою коду
+            arrays['track_ids'] = arrays['track_ids'].astype(object)
+            return TrainingSet(**arrays, feature_columns=list(feature_columns))
+
+        training_set = self._build_training_set(feature_columns, chunk_size, catalog)
+        if len(training_set):
+            try:
+                arrays = training_set._asdict()
+                del arrays['feature_columns']
+                arrays['track_ids'] = arrays['track_ids'].astype(str)
+                self.snapshot_store.save(fingerprint, arrays)
+            except OSError as e:
+                logger.warning(f"Не вдалося зберегти знімок даних для тренування: {e}")
+        return training_set
+
+    def _build_training_set(self, feature_columns: list, chunk_size: int,
+                            catalog: Optional[TrackCatalog] = None) -> TrainingSet:
+        """
+        Потокова підготовка даних для тренування без злиття взаємодій з фічами:
+        - взаємодії читаються порціями по chunk_size і одразу кодуються в COO масиви
+        - фічі зберігаються один раз на трек (item_features), а не на кожну взаємодію
+        - як і prepare_training_data, лишаються лише треки з каталогу без NaN у фічах
+        """
+        catalog = catalog or self.get_track_catalog()
+        valid_rows = catalog.valid_rows_mask(feature_columns)
+
+        user_chunks, row_chunks, rating_chunks = [], [], []
+        for rows in self.iter_interaction_chunks(chunk_size):
+            chunk_users, chunk_tracks, chunk_ratings = zip(*rows)
+            catalog_rows = np.fromiter(
+                (catalog.row_index.get(t, -1) for t in chunk_tracks), dtype=np.int64, count=len(rows)
+            )
+            ratings = np.array(chunk_ratings, dtype=np.float32)
+
+            keep = (catalog_rows >= 0) & ~np.isnan(ratings)
+            keep[keep] = valid_rows[catalog_rows[keep]]
+
+            user_chunks.append(np.array(chunk_users, dtype=np.int64)[keep])
+            row_chunks.append(catalog_rows[keep])
+            rating_chunks.append(ratings[keep])
+
+        if not rating_chunks or not sum(len(chunk) for chunk in rating_chunks):
+            logger.warning("Немає даних для тренування")
+            return TrainingSet(*self._empty_interaction_arrays(),
+                               item_features=np.empty((0, len(feature_columns)), dtype=np.float32),
+                               feature_columns=list(feature_columns))
+
+        user_ids, user_codes = np.unique(np.concatenate(user_chunks), return_inverse=True)
+        item_rows, item_codes = np.unique(np.concatenate(row_chunks), return_inverse=True)
+
+        # Словник треків відсортований за SpotifyTrackId
+        order, rank = _sorting_permutation(catalog.track_ids[item_rows])
+        item_rows = item_rows[order]
+
+        training_set = TrainingSet(
+            user_codes=user_codes.astype(np.int32),
+            item_codes=rank[item_codes],
+            ratings=np.concatenate(rating_chunks),
+            user_ids=user_ids,
+            track_ids=catalog.track_ids[item_rows],
+            item_features=catalog.feature_matrix(feature_columns, item_rows),
+            feature_columns=list(feature_columns),
+        )
+        logger.info(f"Підготовлено {len(training_set)} взаємодій для тренування "
+                    f"({len(user_ids)} користувачів, {len(item_rows)} треків)")
+        return training_set
+
+    @staticmethod
+    def _empty_interaction_arrays() -> InteractionArrays:
+        return InteractionArrays(
+            user_codes=np.empty(0, dtype=np.int32),
+            item_codes=np.empty(0, dtype=np.int32),
+            ratings=np.empty(0, dtype=np.float32),
+            user_ids=np.empty(0, dtype=np.int64),
+            track_ids=np.empty(0, dtype=object),
+        )
+
     def load_song_features(self) -> pd.DataFrame:
+        """
+        Аудіо фічі пісень з каталогу треків.
+        Повертає спільний кешований фрейм - не модифікуйте його.
+        """
+        return self.get_track_catalog().frame
+
+    def _read_song_features(self) -> pd.DataFrame:
         """Завантаження аудіо фічей пісень"""
         query = """
         SELECT 
@@ -182,13 +833,15 @@ class DataLoader:
             Popularity
         FROM History
         """
+        params = ()
         
         if user_id:
-            query += f" WHERE UserId = {user_id}"
+            query += " WHERE UserId = ?"
+            params = (int(user_id),)
         
         try:
             with self.connect_db() as conn:
-                df = pd.read_sql_query(query, conn)
+                df = pd.read_sql_query(query, conn, params=params)
                 
                 # Очищення даних від спецсимволів
                 if not df.empty:
@@ -252,43 +905,81 @@ class DataLoader:
         return training_data, features
     
     def get_user_profile(self, user_id: int) -> dict:
-        """Створення профілю користувача на основі його історії"""
-        interactions = self.load_user_interactions()
-        features = self.load_song_features()
-        
-        if interactions.empty or features.empty:
-            return {}
-        
-        user_interactions = interactions[interactions['UserId'] == user_id]
-        if user_interactions.empty:
-            return {}
-        
-        # Об'єднуємо з фічами
-        user_data = user_interactions.merge(features, on='SpotifyTrackId', how='inner')
-        
-        if user_data.empty:
-            return {}
-        
-        # Обчислюємо середні значення фічей для улюблених треків
-        liked_tracks = user_data[user_data['IsLiked'] == True]
-        
-        if liked_tracks.empty:
-            # Якщо немає лайків, беремо треки з високим рейтингом
-            liked_tracks = user_data[user_data['Rating'] >= 4]
-        
-        if liked_tracks.empty:
+        """
+        Профіль смаку користувача: середні фічі улюблених треків (лайки,
+        або рейтинг >= 4 якщо лайків немає), жанри та кількість взаємодій.
+        Якщо профілі всіх користувачів актуальні - відповідаємо з пам'яті,
+        інакше один індексований запит WHERE UserId = ?.
+        """
+        profiles = _user_profiles.get(self.db_path)
+        if profiles is not None and profiles.data_version == self.get_data_version():
+            return profiles.profile(user_id)
+
+        rows = self._read_user_profile_rows(user_id)
+        if rows.empty:
             return {}
-        
-        profile = {
-            'avg_danceability': liked_tracks['Danceability'].mean(),
-            'avg_energy': liked_tracks['Energy'].mean(),
-            'avg_valence': liked_tracks['Valence'].mean(),
-            'avg_tempo': liked_tracks['Tempo'].mean(),
-            'avg_acousticness': liked_tracks['Acousticness'].mean(),
-            'preferred_genres': liked_tracks['Genre'].value_counts().to_dict(),
-            'total_interactions': len(user_interactions),
-            'liked_count': len(liked_tracks)
-        }
-        
+
+        profile = UserProfiles(rows).profile(user_id)
         logger.info(f"Створено профіль для користувача {user_id}")
-        return profile 
\ No newline at end of file
+        return profile
+
+    def get_all_user_profiles(self) -> UserProfiles:
+        """Профілі всіх користувачів для поточної версії БД (один прохід по даних)"""
+        def build(version):
+            profiles = UserProfiles(self._read_user_profile_rows(), version)
+            logger.info(f"Побудовано профілі {len(profiles)} користувачів")
+            return profiles
+
+        return self._get_versioned(_user_profiles, build)
+
+    def _user_profile_query(self, sources: list, per_user: bool) -> str:
+        """
+        Згрупований запит профілів: агреговані взаємодії + SongFeatures,
+        відбір улюблених треків та SUM/COUNT фічей на (UserId, Genre)
+        """
+        row_filters = {table: "UserId = ?" for table in sources} if per_user else None
+        interactions_sql = self._aggregated_interactions_query(
+            sources, aggregates=["MAX(Rating) AS Rating", "MAX(IsLiked) AS IsLiked"], row_filters=row_filters
+        )
+        feature_columns = ", ".join(f"f.{column}" for column in PROFILE_FEATURES)
+        feature_sums = ",\n            ".join(
+            f"SUM(t.{column}) AS Sum{column}, COUNT(t.{column}) AS Count{column}" for column in PROFILE_FEATURES
+        )
+        return f"""
+        WITH Interactions AS ({interactions_sql}),
+        Totals AS (
+            SELECT UserId, COUNT(*) AS TotalInteractions FROM Interactions GROUP BY UserId
+        ),
+        UserTracks AS (
+            SELECT i.UserId, i.Rating, COALESCE(i.IsLiked, 0) AS IsLiked,
+                   MAX(COALESCE(i.IsLiked, 0)) OVER (PARTITION BY i.UserId) AS HasLiked,
+                   {_clean_text_sql('f.Genre')} AS Genre, {feature_columns}
+            FROM Interactions i
+            JOIN SongFeatures f ON f.SpotifyTrackId = i.SpotifyTrackId
+            WHERE COALESCE({_clean_text_sql('f.Title')}, 'None') NOT IN ('', 'nan')
+              AND COALESCE({_clean_text_sql('f.Artist')}, 'None') NOT IN ('', 'nan')
+        )
+        SELECT
+            t.UserId,
+            t.Genre,
+            COUNT(*) AS LikedCount,
+            {feature_sums},
+            Totals.TotalInteractions
+        FROM UserTracks t
+        JOIN Totals ON Totals.UserId = t.UserId
+        WHERE (t.HasLiked = 1 AND t.IsLiked = 1) OR (t.HasLiked = 0 AND t.Rating >= 4)
+        GROUP BY t.UserId, t.Genre
+        """
+
+    def _read_user_profile_rows(self, user_id: Optional[int] = None) -> pd.DataFrame:
+        """Рядки запиту профілів одного або всіх користувачів"""
+        try:
+            with self.connect_db() as conn:
+                sources = self._existing_sources(conn)
+                if sources:
+                    query = self._user_profile_query(sources, per_user=user_id is not None)
+                    params = (user_id,) * len(sources) if user_id is not None else ()
+                    return pd.read_sql_query(query, conn, params=params)
+        except Exception as e:
+            logger.error(f"Помилка обчислення профілів користувачів: {e}")
+        return pd.DataFrame(columns=PROFILE_ROW_COLUMNS) 
\ No newline at end of file
@@ -0,0 +1,186 @@
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple
+from urllib.request import pathname2url
+
+logger = logging.getLogger(__name__)
+
+# Налаштування з'єднань за замовчуванням
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024   # 256 MB memory-mapped I/O
+DEFAULT_CACHE_SIZE_KIB = 64 * 1024      # 64 MB кешу сторінок на з'єднання
+DEFAULT_BUSY_TIMEOUT = 30.0             # секунд очікування блокування для запису
+
+
+class ConnectionManager:
+    """
+    Менеджер з'єднань SQLite для однієї БД:
+    - reader(): перевикористовуване read-only з'єднання на потік (URI mode=ro)
+    - writer(): окреме з'єднання на потік для запису (індекси, метрики, watermarks)
+    - snapshot(): ізольоване з'єднання з відкритою транзакцією для тренування
+    - data_version(): дешеве визначення змін через PRAGMA data_version
+    Лічильники відкриттів та запитів показують рівень перевикористання.
+    """
+
+    def __init__(self, db_path: str,
+                 mmap_size: int = DEFAULT_MMAP_SIZE,
+                 cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+                 busy_timeout: float = DEFAULT_BUSY_TIMEOUT):
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout = busy_timeout
+
+        self._stats_lock = threading.Lock()
+        self._watcher_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Скидання стану (також після fork - з'єднання не можна ділити між процесами)"""
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._watcher = None
+        self._watcher_inode = None
+        self._opened = {'reader': 0, 'writer': 0, 'snapshot': 0}
+        self._requests = 0
+        self._queries = 0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _count_query(self, statement: str):
+        with self._stats_lock:
+            self._queries += 1
+
+    def _open(self, kind: str) -> sqlite3.Connection:
+        """Відкриття та налаштування нового з'єднання"""
+        if not os.path.exists(self.db_path):
+            logger.error(f"База даних не знайдена: {self.db_path}")
+            raise FileNotFoundError(f"Database file not found: {self.db_path}")
+
+        if kind == 'reader':
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+            # WAL - читачі не блокують запис і навпаки (налаштування зберігається в БД)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        if kind == 'reader':
+            # Короткі запити сервісу: тимчасові b-tree (GROUP BY, DISTINCT) у пам'яті.
+            # Знімок тренування та запис (масове завантаження, індекси) можуть сортувати
+            # всю таблицю - для них лишається temp_store за замовчуванням (файл)
+            conn.execute("PRAGMA temp_store=MEMORY")
+        conn.set_trace_callback(self._count_query)
+
+        with self._stats_lock:
+            self._opened[kind] += 1
+        logger.debug(f"Відкрито {kind} з'єднання з {self.db_path}")
+        return conn
+
+    def _thread_connection(self, kind: str) -> sqlite3.Connection:
+        self._check_pid()
+        with self._stats_lock:
+            self._requests += 1
+        conn = getattr(self._local, kind, None)
+        if conn is None:
+            conn = self._open(kind)
+            setattr(self._local, kind, conn)
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        """Read-only з'єднання поточного потоку (або закріплене знімкове)"""
+        pinned = getattr(self._local, 'pinned', None)
+        if pinned is not None and self._pid == os.getpid():
+            with self._stats_lock:
+                self._requests += 1
+            return pinned
+        return self._thread_connection('reader')
+
+    def writer(self) -> sqlite3.Connection:
+        """З'єднання для запису поточного потоку"""
+        return self._thread_connection('writer')
+
+    @contextmanager
+    def snapshot(self):
+        """
+        Узгоджений знімок БД для тренування: окреме з'єднання з відкритою
+        read-транзакцією. Поки блок активний, reader() у цьому потоці
+        повертає це ж з'єднання, тож усі запити бачать ту саму версію даних.
+        """
+        self._check_pid()
+        conn = self._open('snapshot')
+        previous = getattr(self._local, 'pinned', None)
+        try:
+            conn.execute("BEGIN")
+            # Транзакція фіксує знімок лише після першого читання
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            self._local.pinned = conn
+            yield conn
+        finally:
+            self._local.pinned = previous
+            conn.rollback()
+            conn.close()
+
+    def is_pinned(self) -> bool:
+        """Чи активний знімок тренування в поточному потоці"""
+        return getattr(self._local, 'pinned', None) is not None
+
+    def close(self):
+        """Закриття з'єднань поточного потоку"""
+        for kind in ('reader', 'writer'):
+            conn = getattr(self._local, kind, None)
+            if conn is not None:
+                conn.close()
+                setattr(self._local, kind, None)
+
+    def data_version(self) -> Tuple:
+        """
+        Версія даних: (inode файлу, PRAGMA data_version).
+        data_version змінюється лише після коміту з іншого з'єднання, тому
+        використовуємо окреме довгоживуче з'єднання, яке нічого не пише.
+        """
+        self._check_pid()
+        stat = os.stat(self.db_path)
+        with self._watcher_lock:
+            # Файл БД замінили - старе з'єднання дивиться на інший inode
+            if self._watcher is None or self._watcher_inode != stat.st_ino:
+                if self._watcher is not None:
+                    self._watcher.close()
+                self._watcher = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._watcher_inode = stat.st_ino
+            version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+        return (stat.st_ino, version)
+
+    def stats(self) -> Dict:
+        """Лічильники відкриттів з'єднань та запитів"""
+        with self._stats_lock:
+            opened = sum(self._opened.values())
+            return {
+                'db_path': self.db_path,
+                'connections_opened': dict(self._opened),
+                'connection_requests': self._requests,
+                'queries': self._queries,
+                'reuse_rate': 1 - opened / self._requests if self._requests else 0.0,
+            }
+
+
+# Менеджери на рівні процесу, по одному на файл БД
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """Спільний менеджер з'єднань для БД"""
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ConnectionManager(db_path)
+        return manager
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Індекси SQLite, потрібні запитам ML сервісу
+
+Використання:
+    python db_indexes.py                  # БД проекту
+    python db_indexes.py --db path/to.db
+    python db_indexes.py --check          # лише показати відсутні індекси
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Індекс -> (таблиця, колонки). З міграціями .NET додатку (EF) збігається лише
+# IX_MLModelMetrics_ModelType_TrainingDate - для нього IF NOT EXISTS нічого не створює,
+# решта індексів додаються ML сервісом.
+
+# Per-user запити до джерел взаємодій (прослухані треки, профілі).
+# Міграції EF вже мають IX_UserSongInteractions_UserId, IX_History_UserId та
+# IX_Favorites_UserId (індекси зовнішніх ключів UserId), і кожен з них - префікс складеного
+# індексу нижче. Обидва лишаються навмисно: (UserId, SpotifyTrackId) покриває вибір
+# прослуханих треків та групування по треку без читання рядків таблиці, а одноколонкові
+# індекси належать схемі EF - якщо видалити їх з ML сервісу, БД розійдеться зі знімком
+# моделі EF (ApplicationDbContextModelSnapshot), і наступна міграція створить їх знову.
+# Ціна - ще один індекс на кожен запис .NET додатку в ці три таблиці.
+USER_TRACK_INDEXES: Dict[str, Tuple[str, List[str]]] = {
+    f"IX_{table}_UserId_SpotifyTrackId": (table, ['UserId', 'SpotifyTrackId'])
+    for table in ['UserSongInteractions', 'Favorites', 'History']
+}
+
+# Запити EnhancedDataLoader:
+# групування по UserId з фільтрами часу/рейтингу читає лише індекс,
+# метадані треку з History шукаються по SpotifyTrackId
+ENHANCED_LOADER_INDEXES: Dict[str, Tuple[str, List[str]]] = {
+    'IX_MLTrainingData_UserId_Timestamp_Rating': ('MLTrainingData', ['UserId', 'Timestamp', 'Rating']),
+    'IX_MLTrainingData_Rating': ('MLTrainingData', ['Rating']),
+    'IX_History_SpotifyTrackId': ('History', ['SpotifyTrackId']),
+}
+
+# Останні метрики моделі за типом
+METRICS_INDEXES: Dict[str, Tuple[str, List[str]]] = {
+    'IX_MLModelMetrics_ModelType_TrainingDate': ('MLModelMetrics', ['ModelType', 'TrainingDate']),
+}
+
+REQUIRED_INDEXES: Dict[str, Tuple[str, List[str]]] = {
+    **USER_TRACK_INDEXES,
+    **ENHANCED_LOADER_INDEXES,
+    **METRICS_INDEXES,
+}
+
+
+def create_indexes(conn: sqlite3.Connection, indexes: Dict[str, Tuple[str, List[str]]]) -> int:
+    """CREATE INDEX IF NOT EXISTS для кожного індексу (кількість наявних після виклику)"""
+    created = 0
+    for name, (table, columns) in indexes.items():
+        try:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+            created += 1
+        except sqlite3.Error as e:
+            logger.info(f"Індекс {name} не створено: {e}")
+    conn.commit()
+    return created
+
+
+def missing_indexes(conn: sqlite3.Connection) -> Dict[str, Tuple[str, List[str]]]:
+    """Потрібні індекси, яких немає в БД (для існуючих таблиць)"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return {
+        name: (table, columns) for name, (table, columns) in REQUIRED_INDEXES.items()
+        if table in tables and name not in existing
+    }
+
+
+def provision_indexes(db_path: str) -> List[str]:
+    """
+    Створення відсутніх індексів та оновлення статистики планувальника.
+    Повертає імена створених індексів.
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database file not found: {db_path}")
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        missing = missing_indexes(conn)
+        if missing:
+            create_indexes(conn, missing)
+            # Статистика для нових індексів, щоб планувальник їх обирав
+            conn.execute("PRAGMA optimize")
+            conn.commit()
+            logger.info(f"Створено індекси: {', '.join(missing)}")
+        else:
+            logger.info("Всі потрібні індекси вже існують")
+        return list(missing)
+    finally:
+        conn.close()
+
+
+def default_db_path() -> str:
+    """Шлях до БД проекту (як у DataLoader за замовчуванням)"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, "MusicRecommender.db")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Індекси БД для ML сервісу")
+    parser.add_argument("--db", default=default_db_path(), help="Шлях до SQLite БД")
+    parser.add_argument("--check", action="store_true", help="Лише перевірити, без створення")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.check:
+        conn = sqlite3.connect(args.db)
+        try:
+            missing = missing_indexes(conn)
+        finally:
+            conn.close()
+        for name, (table, columns) in missing.items():
+            print(f"❌ {name} ON {table} ({', '.join(columns)})")
+        print("✅ Всі індекси на місці" if not missing else f"Відсутніх індексів: {len(missing)}")
+        return
+
+    created = provision_indexes(args.db)
+    print(f"✅ Створено індексів: {len(created)}")
+
+
+if __name__ == "__main__":
+    main()
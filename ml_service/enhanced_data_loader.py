@@ -5,26 +5,48 @@ import logging
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 import json
+import copy
+import os
+import time
+from db_connections import get_connection_manager
+from db_indexes import ENHANCED_LOADER_INDEXES, create_indexes
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_DB_PATH = "../MusicRecommender.db"
+
+# Типи взаємодій у MLTrainingData: Like, Skip, Play, Save
+INTERACTION_TYPES = [1, 2, 3, 4]
+
+# Кеш статистики на рівні процесу: db_path -> (версія БД, час закінчення, статистика)
+_training_stats_cache: Dict[str, Tuple] = {}
+
+# Максимум id в одному IN (...) - з запасом нижче ліміту змінних SQLite
+TRACK_ID_CHUNK_SIZE = 500
+
 class EnhancedDataLoader:
     """
     Покращений завантажувач даних для ML тренування
     Працює з новою структурою БД MLTrainingData
     """
     
-    def __init__(self, db_path: str = "../MusicRecommender.db"):
+    stats_ttl_seconds = 30.0  # Час життя кешу статистики
+    
+    def __init__(self, db_path: str = DEFAULT_DB_PATH,
+                 connection: Optional[sqlite3.Connection] = None):
         self.db_path = db_path
-        self.connection = None
+        # Передане з'єднання належить викликачу (наприклад, пулу AsyncDatabase) і не закривається
+        self.connection = connection
+        self._owns_connection = connection is None
         
     def __enter__(self):
-        self.connection = sqlite3.connect(self.db_path)
+        # З'єднання відкривається при першому запиті (кешована статистика його не потребує)
         return self
         
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.connection:
+        if self.connection and self._owns_connection:
             self.connection.close()
+            self.connection = None
     
     def get_connection(self) -> sqlite3.Connection:
         """Отримання з'єднання з БД"""
@@ -77,31 +99,39 @@ class EnhancedDataLoader:
             conditions.append("Timestamp >= ?")
             params.append(cutoff_date)
         
-        # Збираємо запит
-        if conditions:
-            query = base_query + " AND " + " AND ".join(conditions)
-        else:
-            query = base_query
-            
-        query += " ORDER BY Timestamp DESC"
+        where_sql = " AND ".join(conditions) if conditions else "1=1"
+        
+        # Мінімум взаємодій на користувача рахується в SQL з тими ж фільтрами
+        # (покриваючий індекс UserId, Timestamp, Rating) - передаються лише потрібні рядки
+        query = f"""{base_query}
+          AND {where_sql}
+          AND UserId IN (
+              SELECT UserId
+              FROM MLTrainingData
+              WHERE {where_sql}
+              GROUP BY UserId
+              HAVING COUNT(*) >= ?
+          )
+        ORDER BY Timestamp DESC
+        """
         
-        df = pd.read_sql_query(query, conn, params=params)
+        df = pd.read_sql_query(query, conn, params=params + params + [min_interactions_per_user])
         
         if df.empty:
             logger.warning("⚠️ Не знайдено тренувальних даних!")
             return df
         
         logger.info(f"📈 Завантажено {len(df)} записів тренувальних даних")
+        logger.info(f"👥 Користувачів після фільтрації: {df['UserId'].nunique()}")
+        logger.info(f"🎵 Унікальних треків: {df['SpotifyTrackId'].nunique()}")
         
-        # Фільтрація користувачів з мінімальною кількістю взаємодій
-        user_counts = df['UserId'].value_counts()
-        valid_users = user_counts[user_counts >= min_interactions_per_user].index
-        df_filtered = df[df['UserId'].isin(valid_users)]
-        
-        logger.info(f"👥 Користувачів після фільтрації: {df_filtered['UserId'].nunique()}")
-        logger.info(f"🎵 Унікальних треків: {df_filtered['SpotifyTrackId'].nunique()}")
-        
-        return df_filtered
+        return df
+    
+    def ensure_indexes(self) -> int:
+        """Створення індексів для запитів тренувальних даних та метаданих треків"""
+        created = create_indexes(self.get_connection(), ENHANCED_LOADER_INDEXES)
+        logger.info(f"Перевірено {created} індексів EnhancedDataLoader")
+        return created
     
     def load_user_profiles(self) -> pd.DataFrame:
         """Завантаження ML профілів користувачів"""
@@ -214,8 +244,7 @@ class EnhancedDataLoader:
                 context_features['release_year_norm'] = [0.5] * len(df)
         
         # Тип взаємодії (one-hot)
-        interaction_types = [1, 2, 3, 4]  # Like, Skip, Play, Save
-        for int_type in interaction_types:
+        for int_type in INTERACTION_TYPES:
             context_features[f'interaction_type_{int_type}'] = (df['InteractionType'] == int_type).astype(int)
         
         return context_features
@@ -235,28 +264,42 @@ class EnhancedDataLoader:
         return df
     
     def get_track_features_for_prediction(self, track_ids: List[str]) -> pd.DataFrame:
-        """Отримання фічей треків для предикції"""
+        """
+        Отримання фічей треків для предикції.
+        Один рядок на трек: Artist/ReleaseYear беруться з останнього запису History
+        через індекс по SpotifyTrackId, тож вартість залежить від кількості треків,
+        а не від кількості прослуховувань. Великі списки id читаються порціями.
+        """
+        track_ids = list(dict.fromkeys(track_ids))
         if not track_ids:
             return pd.DataFrame()
             
         conn = self.get_connection()
         
-        # Створюємо плейсхолдери для SQL запиту
-        placeholders = ','.join(['?' for _ in track_ids])
-        
-        query = f"""
-        SELECT DISTINCT
-            sf.SpotifyTrackId,
-            sf.Danceability, sf.Energy, sf.Valence, sf.Tempo, sf.Acousticness,
-            sf.Instrumentalness, sf.Speechiness, sf.Loudness, sf.Popularity,
-            sf.DurationMs, sf.[Key], sf.Mode, sf.TimeSignature,
-            h.Artist, sf.Genre, h.ReleaseYear, sf.ArtistPopularity
-        FROM SongFeatures sf
-        LEFT JOIN History h ON sf.SpotifyTrackId = h.SpotifyTrackId
-        WHERE sf.SpotifyTrackId IN ({placeholders})
-        """
-        
-        df = pd.read_sql_query(query, conn, params=track_ids)
+        chunks = []
+        for start in range(0, len(track_ids), TRACK_ID_CHUNK_SIZE):
+            chunk = track_ids[start:start + TRACK_ID_CHUNK_SIZE]
+            placeholders = ','.join(['?' for _ in chunk])
+            
+            query = f"""
+            SELECT
+                sf.SpotifyTrackId,
+                sf.Danceability, sf.Energy, sf.Valence, sf.Tempo, sf.Acousticness,
+                sf.Instrumentalness, sf.Speechiness, sf.Loudness, sf.Popularity,
+                sf.DurationMs, sf.[Key], sf.Mode, sf.TimeSignature,
+                h.Artist, sf.Genre, h.ReleaseYear, sf.ArtistPopularity
+            FROM SongFeatures sf
+            LEFT JOIN History h ON h.rowid = (
+                SELECT rowid FROM History
+                WHERE SpotifyTrackId = sf.SpotifyTrackId
+                ORDER BY rowid DESC
+                LIMIT 1
+            )
+            WHERE sf.SpotifyTrackId IN ({placeholders})
+            """
+            chunks.append(pd.read_sql_query(query, conn, params=chunk))
+        
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
         
         # Нормалізація
         if not df.empty:
@@ -353,42 +396,63 @@ class EnhancedDataLoader:
         return len(ids_to_delete)
     
     def get_training_data_stats(self) -> Dict:
-        """Отримання статистики тренувальних даних"""
-        conn = self.get_connection()
-        
-        stats = {}
-        
-        # Загальна статистика
-        cursor = conn.execute("SELECT COUNT(*) FROM MLTrainingData")
-        stats['total_interactions'] = cursor.fetchone()[0]
-        
-        cursor = conn.execute("SELECT COUNT(DISTINCT UserId) FROM MLTrainingData")
-        stats['unique_users'] = cursor.fetchone()[0]
+        """
+        Статистика тренувальних даних.
+        Кешується на рівні процесу на stats_ttl_seconds і поки не змінилась версія БД,
+        тож часті health-check запити не звертаються до MLTrainingData.
+        """
+        key = os.path.abspath(self.db_path)
+        version = get_connection_manager(self.db_path).data_version()
+        now = time.monotonic()
         
-        cursor = conn.execute("SELECT COUNT(DISTINCT SpotifyTrackId) FROM MLTrainingData")
-        stats['unique_tracks'] = cursor.fetchone()[0]
+        cached = _training_stats_cache.get(key)
+        if cached is not None and cached[0] == version and now < cached[1]:
+            return copy.deepcopy(cached[2])
         
-        # Статистика по типах взаємодій
-        cursor = conn.execute("""
-            SELECT InteractionType, COUNT(*) 
-            FROM MLTrainingData 
-            GROUP BY InteractionType
-        """)
-        stats['interaction_types'] = dict(cursor.fetchall())
+        stats = self._read_training_data_stats()
+        _training_stats_cache[key] = (version, now + self.stats_ttl_seconds, stats)
+        return copy.deepcopy(stats)
+    
+    def _read_training_data_stats(self) -> Dict:
+        """Вся статистика одним проходом по MLTrainingData"""
+        conn = self.get_connection()
         
-        # Статистика по рейтингах
-        cursor = conn.execute("""
-            SELECT 
-                AVG(Rating) as avg_rating,
-                MIN(Rating) as min_rating,
-                MAX(Rating) as max_rating
+        type_counts = ",\n            ".join(
+            f"SUM(CASE WHEN InteractionType = {int_type} THEN 1 ELSE 0 END)" for int_type in INTERACTION_TYPES
+        )
+        row = conn.execute(f"""
+            SELECT
+                COUNT(*),
+                COUNT(DISTINCT UserId),
+                COUNT(DISTINCT SpotifyTrackId),
+                AVG(Rating),
+                MIN(Rating),
+                MAX(Rating),
+                {type_counts}
             FROM MLTrainingData
-        """)
-        rating_stats = cursor.fetchone()
-        stats['rating_stats'] = {
-            'avg': rating_stats[0],
-            'min': rating_stats[1],
-            'max': rating_stats[2]
-        }
+        """).fetchone()
         
-        return stats 
\ No newline at end of file
+        total = row[0]
+        interaction_types = {
+            int_type: count for int_type, count in zip(INTERACTION_TYPES, row[6:]) if count
+        }
+        if sum(interaction_types.values()) != total:
+            # Є нестандартні типи взаємодій - рахуємо їх окремим групуванням
+            cursor = conn.execute("""
+                SELECT InteractionType, COUNT(*)
+                FROM MLTrainingData
+                GROUP BY InteractionType
+            """)
+            interaction_types = dict(cursor.fetchall())
+        
+        return {
+            'total_interactions': total,
+            'unique_users': row[1],
+            'unique_tracks': row[2],
+            'interaction_types': interaction_types,
+            'rating_stats': {
+                'avg': row[3],
+                'min': row[4],
+                'max': row[5]
+            }
+        }
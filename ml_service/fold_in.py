@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class FoldedUser(NamedTuple):
+    """
+    Поточні рейтинги користувача в кодах тренувальних словників та його
+    fold-in представлення. changed=False - рейтинги збігаються з тими, на яких
+    тренувались моделі, тож використовуються натреновані рядки.
+    """
+    data_version: Optional[Tuple]
+    signature: str
+    item_codes: np.ndarray   # відсортовані коди треків
+    ratings: np.ndarray      # float64, у порядку item_codes
+    changed: bool
+    factors: Optional[np.ndarray]  # латентний вектор SVD (None якщо SVD немає)
+    bias: float                    # bᵤ у прогнозі SVD
+
+    @property
+    def user_mean(self) -> float:
+        return float(self.ratings.mean()) if len(self.ratings) else 3.0
+
+
+def ratings_signature(item_codes: np.ndarray, ratings: np.ndarray) -> str:
+    """Відбиток історії користувача - змінюється при будь-якій зміні рейтингів"""
+    digest = hashlib.sha1(np.ascontiguousarray(item_codes, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(ratings, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def fold_in_user(item_factors: np.ndarray, targets: np.ndarray, regularization: float,
+                 bias_regularization: float) -> Tuple[np.ndarray, float]:
+    """
+    Латентний вектор pᵤ та bias bᵤ користувача при заморожених факторах треків:
+    min ||targets - Q pᵤ - bᵤ||² + reg ||pᵤ||² + bias_reg bᵤ²,
+    де targets = r - μ - bᵢ. Система розміром (factors + 1) - мікросекунди.
+    """
+    n_factors = item_factors.shape[1]
+    design = np.hstack([item_factors, np.ones((len(targets), 1))])
+    penalty = np.diag(np.append(np.full(n_factors, regularization), bias_regularization))
+    solution = np.linalg.solve(design.T @ design + penalty, design.T @ targets)
+    return solution[:n_factors], float(solution[n_factors])
+
+
+class FoldInCache:
+    """LRU кеш fold-in станів користувачів (спільний для запитів, потокобезпечний)"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._items: "OrderedDict[int, FoldedUser]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # Знімок моделі переноситься без кешу та блокування
+        return FoldInCache, (self.max_size,)
+
+    def get(self, user_id: int) -> Optional[FoldedUser]:
+        with self._lock:
+            folded = self._items.get(user_id)
+            if folded is not None:
+                self._items.move_to_end(user_id)
+            return folded
+
+    def put(self, user_id: int, folded: FoldedUser):
+        with self._lock:
+            self._items[user_id] = folded
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -0,0 +1,190 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+logger = logging.getLogger(__name__)
+
+# Ваги неявних сигналів у силі вподобання пари (користувач, трек)
+LIKE_WEIGHT = 3.0
+REPEAT_WEIGHT = 1.0
+SKIP_WEIGHT = 1.0
+COMPLETION_WEIGHT = 1.0
+
+
+def implicit_signal_strength(play_count: np.ndarray, liked: np.ndarray, skip_count: np.ndarray,
+                             repeat_count: np.ndarray, completion: np.ndarray) -> np.ndarray:
+    """
+    Сила неявного сигналу: прослуховування, повтори, лайки та частка прослуханого
+    треку додають, пропуски віднімають. <= 0 - лише негативні сигнали.
+    """
+    strength = (
+        play_count
+        + REPEAT_WEIGHT * repeat_count
+        + LIKE_WEIGHT * liked
+        + COMPLETION_WEIGHT * np.clip(np.nan_to_num(completion), 0.0, 1.0)
+        - SKIP_WEIGHT * skip_count
+    )
+    return strength.astype(np.float32)
+
+
+def implicit_matrices(user_codes: np.ndarray, item_codes: np.ndarray, strength: np.ndarray,
+                      shape: Tuple[int, int], alpha: float, epsilon: float = 1.0) -> Tuple[csr_matrix, csr_matrix]:
+    """
+    Матриці впевненості та вподобань (Hu, Koren, Volinsky) з однаковою структурою:
+    confidence = 1 + alpha * log(1 + |strength| / epsilon), preference = strength > 0.
+    Пари лише з пропусками лишаються в матриці з preference 0 - це явний негатив.
+    """
+    # Пари (користувач, трек) унікальні - CSR будується напряму з відсортованих масивів,
+    # тож обидві матриці гарантовано мають однакові indices/indptr (включно з нулями preference)
+    order = np.lexsort((item_codes, user_codes))
+    indices = np.asarray(item_codes, dtype=np.int32)[order]
+    indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(user_codes, minlength=shape[0]), out=indptr[1:])
+    strength = strength[order]
+
+    confidence = (1.0 + alpha * np.log1p(np.abs(strength) / epsilon)).astype(np.float32)
+    preference = (strength > 0).astype(np.float32)
+    return (csr_matrix((confidence, indices, indptr), shape=shape),
+            csr_matrix((preference, indices.copy(), indptr.copy()), shape=shape))
+
+
+class ImplicitALS:
+    """
+    Weighted ALS для неявного зворотного зв'язку.
+    Кожен напівкрок розв'язує системи всіх користувачів (або треків) разом
+    пакетним методом спряжених градієнтів: множення на матрицю системи -
+    щільний добуток X @ YtY (багатопотоковий BLAS) плюс розріджена поправка
+    по ненульових, тож вартість ітерації лінійна за кількістю взаємодій.
+    """
+
+    def __init__(self, factors: int = 32, regularization: float = 0.1, iterations: int = 10,
+                 cg_steps: int = 3, block_nnz: int = 250_000, n_threads: Optional[int] = None,
+                 random_state: int = 42):
+        self.factors = factors
+        self.regularization = regularization
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.block_nnz = block_nnz  # Ненульових на блок розв'язку (обмежує пам'ять на зібрані фактори)
+        self.n_threads = n_threads or os.cpu_count() or 1  # Блоки розв'язуються паралельно
+        self.random_state = random_state
+        self.user_factors: Optional[np.ndarray] = None
+        self.item_factors: Optional[np.ndarray] = None
+
+    def fit(self, confidence: csr_matrix, preference: csr_matrix) -> Dict[str, float]:
+        """Тренування факторів; confidence та preference - CSR users x items з однаковою структурою"""
+        start = time.time()
+        n_users, n_items = confidence.shape
+        rng = np.random.default_rng(self.random_state)
+        self.user_factors = (rng.standard_normal((n_users, self.factors)) * 0.01).astype(np.float32)
+        self.item_factors = (rng.standard_normal((n_items, self.factors)) * 0.01).astype(np.float32)
+
+        # Транспоновані матриці для напівкроку по треках будуються один раз
+        confidence_t = confidence.T.tocsr()
+        preference_t = preference.T.tocsr()
+        confidence_t.sort_indices()
+        preference_t.sort_indices()
+
+        for _ in range(self.iterations):
+            self.user_factors = self._solve(confidence, preference, self.user_factors, self.item_factors)
+            self.item_factors = self._solve(confidence_t, preference_t, self.item_factors, self.user_factors)
+
+        loss = self.observed_loss(confidence, preference)
+        elapsed = time.time() - start
+        logger.info(f"🎧 ALS: {self.factors} факторів, {self.iterations} ітерацій, "
+                    f"loss {loss:.4f}, {elapsed:.2f}с")
+        return {
+            "als_factors": self.factors,
+            "als_iterations": self.iterations,
+            "als_observed_loss": loss,
+            "als_training_seconds": elapsed,
+        }
+
+    def _solve(self, confidence: csr_matrix, preference: csr_matrix,
+               X: np.ndarray, Y: np.ndarray) -> np.ndarray:
+        """
+        Пакетний CG для (YtY + Yt (C_u - I) Y + reg I) x_u = Yt C_u p_u всіх рядків,
+        з теплим стартом від поточних X. Системи рядків незалежні, тож розв'язуються
+        блоками по ~block_nnz ненульових: фактори Y для блоку збираються один раз.
+        """
+        YtY = Y.T @ Y + self.regularization * np.eye(Y.shape[1], dtype=Y.dtype)
+        X = X.copy()
+        indptr = confidence.indptr
+        bounds = np.unique(np.searchsorted(indptr, np.arange(0, indptr[-1], self.block_nnz), side='right') - 1)
+        bounds = np.append(bounds, confidence.shape[0])
+
+        def solve_rows(start: int, end: int):
+            lo, hi = indptr[start], indptr[end]
+            block_indptr = indptr[start:end + 1] - lo
+            block_cols = confidence.indices[lo:hi]
+            shape = (end - start, Y.shape[0])
+            X[start:end] = self._solve_block(
+                X[start:end], Y, YtY, Y[block_cols], block_cols, block_indptr, shape,
+                weights=confidence.data[lo:hi] - 1.0,
+                rhs_weights=confidence.data[lo:hi] * preference.data[lo:hi],
+                cg_steps=self.cg_steps
+            )
+
+        # numpy/scipy ядра відпускають GIL, тож незалежні блоки рахуються в потоках
+        blocks = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        if self.n_threads > 1 and len(blocks) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.n_threads, len(blocks))) as executor:
+                list(executor.map(lambda block: solve_rows(*block), blocks))
+        else:
+            for block in blocks:
+                solve_rows(*block)
+
+        return X
+
+    @staticmethod
+    def _solve_block(X: np.ndarray, Y: np.ndarray, YtY: np.ndarray, block_Y: np.ndarray, cols: np.ndarray,
+                     indptr: np.ndarray, shape: Tuple[int, int], weights: np.ndarray,
+                     rhs_weights: np.ndarray, cg_steps: int) -> np.ndarray:
+        """CG для рядків блоку; block_Y - фактори Y для кожного ненульового блоку (Y[cols])"""
+        counts = np.diff(indptr)
+
+        def weighted_sum(values: np.ndarray) -> np.ndarray:
+            # sum_i values_ui * y_i для кожного рядка - розріджений добуток на Y
+            return csr_matrix((values, cols, indptr), shape=shape) @ Y
+
+        def apply_system(P: np.ndarray) -> np.ndarray:
+            # (C_u - I) по ненульових: скалярні добутки рядків P з відповідними факторами Y
+            scaled = weights * np.einsum('ij,ij->i', np.repeat(P, counts, axis=0), block_Y)
+            return P @ YtY + weighted_sum(scaled)
+
+        R = weighted_sum(rhs_weights) - apply_system(X)
+        P = R.copy()
+        rs_old = np.einsum('ij,ij->i', R, R)
+
+        for _ in range(cg_steps):
+            AP = apply_system(P)
+            denominator = np.einsum('ij,ij->i', P, AP)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                step = np.where(denominator > 0, rs_old / denominator, 0.0)
+            X += step[:, None] * P
+            R -= step[:, None] * AP
+            rs_new = np.einsum('ij,ij->i', R, R)
+            if not rs_new.any():
+                break
+            with np.errstate(invalid='ignore', divide='ignore'):
+                beta = np.where(rs_old > 0, rs_new / rs_old, 0.0)
+            P = R + beta[:, None] * P
+            rs_old = rs_new
+
+        return X.astype(np.float32, copy=False)
+
+    def observed_loss(self, confidence: csr_matrix, preference: csr_matrix) -> float:
+        """Зважена квадратична помилка по спостережених парах"""
+        if confidence.nnz == 0:
+            return 0.0
+        rows = np.repeat(np.arange(confidence.shape[0]), np.diff(confidence.indptr))
+        predicted = np.einsum('ij,ij->i', self.user_factors[rows], self.item_factors[confidence.indices])
+        return float(np.average((preference.data - predicted) ** 2, weights=confidence.data))
+
+    def scores(self, user_code: int) -> np.ndarray:
+        """Скори всіх треків для користувача (один матрично-векторний добуток)"""
+        return self.item_factors @ self.user_factors[user_code]
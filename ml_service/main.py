@@ -4,11 +4,13 @@ from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 import logging
 import asyncio
+import os
 import time
-from datetime import datetime
 from ml_models import MusicRecommenderML
+from training_jobs import COMPLETED, FULL, INCREMENTAL, ModelHolder, TrainingJob, TrainingJobManager
 from enhanced_data_loader import EnhancedDataLoader
-import pandas as pd
+from async_db import AsyncDatabase
+from db_indexes import provision_indexes
 
 # Налаштування логування
 logging.basicConfig(
@@ -26,6 +28,7 @@ app = FastAPI(
     ### 🎯 Алгоритми:
     - **Content-Based**: Random Forest на аудіо характеристиках + контекст
     - **Collaborative**: KNN на матриці user-item з покращеними даними
+    - **Implicit ALS**: weighted ALS на неявних сигналах прослуховування
     - **Hybrid**: Адаптивна комбінація обох підходів
     
     ### 📊 Нова система даних:
@@ -53,9 +56,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Ініціалізація ML рекомендера та покращеного завантажувача
-ml_recommender = MusicRecommenderML()
-enhanced_loader = EnhancedDataLoader()
+# Пул з'єднань для EnhancedDataLoader
+enhanced_db = AsyncDatabase()
+
+def save_training_metrics(job: TrainingJob):
+    """Метрики завершеного повного тренування в MLModelMetrics (потік задачі)"""
+    if job.kind != FULL:
+        return
+    with EnhancedDataLoader(enhanced_db.db_path) as loader:
+        loader.save_model_metrics("Hybrid", f"v{job.finished_at.strftime('%Y%m%d_%H%M%S')}", job.metrics)
+
+# Поточний знімок ML моделей: запит бере посилання один раз, фонове тренування
+# будує новий знімок в окремому процесі та підміняє посилання після завершення
+model_holder = ModelHolder(MusicRecommenderML())
+training_jobs = TrainingJobManager(model_holder, on_complete=save_training_metrics)
 
 # Pydantic моделі
 class TrainModelsRequest(BaseModel):
@@ -89,6 +103,21 @@ class TrainingResponse(BaseModel):
     metrics: Optional[Dict[str, Any]] = None
     training_time: Optional[float] = None
     model_version: Optional[str] = None
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+
+class TrainingJobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    stage: Optional[str] = None
+    progress: float
+    metrics: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    model_version: Optional[int] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
 
 class HealthResponse(BaseModel):
     status: str
@@ -105,12 +134,28 @@ class StatusResponse(BaseModel):
     last_training: Optional[str] = None
     training_data_count: Optional[int] = None
 
+@app.on_event("startup")
+async def ensure_database_indexes():
+    """Створення індексів, потрібних запитам ML сервісу (db_indexes.py)"""
+    ml_recommender = model_holder.current
+    db_paths = {os.path.abspath(path) for path in (ml_recommender.data_loader.db_path, enhanced_db.db_path)}
+    for db_path in db_paths:
+        try:
+            await asyncio.to_thread(provision_indexes, db_path)
+        except Exception as e:
+            logger.warning(f"Не вдалося перевірити індекси БД {db_path}: {e}")
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    """Закриття пулу з'єднань"""
+    enhanced_db.close()
+
 @app.get("/", response_model=HealthResponse)
 async def root():
     """Головна сторінка API з розширеною інформацією"""
+    ml_recommender = model_holder.current
     try:
-        with enhanced_loader:
-            stats = enhanced_loader.get_training_data_stats()
+        stats = await enhanced_db.run(EnhancedDataLoader.get_training_data_stats)
         
         return HealthResponse(
             status="healthy",
@@ -131,9 +176,9 @@ async def root():
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Розширена перевірка здоров'я сервісу"""
+    ml_recommender = model_holder.current
     try:
-        with enhanced_loader:
-            stats = enhanced_loader.get_training_data_stats()
+        stats = await enhanced_db.run(EnhancedDataLoader.get_training_data_stats)
         
         return HealthResponse(
             status="healthy",
@@ -154,10 +199,12 @@ async def health_check():
 @app.get("/status", response_model=StatusResponse)
 async def get_status():
     """Детальний статус сервісу для інтеграції з .NET"""
+    ml_recommender = model_holder.current
     try:
-        with enhanced_loader:
-            stats = enhanced_loader.get_training_data_stats()
-            latest_metrics = enhanced_loader.get_latest_model_metrics("Hybrid")
+        def read_status(loader: EnhancedDataLoader):
+            return loader.get_training_data_stats(), loader.get_latest_model_metrics("Hybrid")
+        
+        stats, latest_metrics = await enhanced_db.run(read_status)
         
         return StatusResponse(
             service_status="online",
@@ -181,76 +228,61 @@ async def get_status():
 @app.post("/train", response_model=TrainingResponse)
 async def train_models(request: TrainModelsRequest = TrainModelsRequest()):
     """
-    Покращене тренування ML моделей з новою системою даних
+    Покращене тренування ML моделей з новою системою даних (фонова задача)
     
     🎯 Що тренується:
     - Content-Based: Random Forest на аудіо фічах + контекст + користувацькі фічі
     - Collaborative: KNN на покращеній матриці user-item з рейтингами
-    - SVD: TruncatedSVD для матричної факторизації
+    - SVD: biased MF для матричної факторизації
+    - Implicit ALS: weighted ALS на неявних сигналах
     - Hybrid: Адаптивна комбінація з врахуванням профілів користувачів
     
     📊 Використовуємо звичайні дані з History, Favorites, UserSongInteractions
-    """
-    start_time = time.time()
     
+    Тренування виконується в окремому процесі, запити обслуговуються поточними
+    моделями до завершення. Стан задачі - GET /train/jobs/{job_id}.
+    """
+    return start_training_job(FULL)
+
+@app.post("/train/incremental", response_model=TrainingResponse)
+async def train_models_incremental():
+    """
+    Інкрементальне оновлення моделей взаємодіями, доданими після останнього тренування
+    (за збереженим watermark). Без натренованих моделей виконується повне тренування.
+    Оновлюється копія поточного знімка у фоновій задачі.
+    """
+    return start_training_job(INCREMENTAL)
+
+def start_training_job(kind: str) -> TrainingResponse:
+    """Запуск фонової задачі (або повернення вже активної)"""
     try:
-        logger.info("🚀 Початок покращеного тренування ML моделей...")
-        
-        # Використовуємо звичайний data_loader для отримання даних
-        training_data, song_features = ml_recommender.data_loader.prepare_training_data()
-        
-        if training_data.empty:
-            logger.warning("⚠️ Немає даних для тренування! Використовуємо мок-дані...")
-            # Створюємо мінімальні тестові дані
-            training_data = pd.DataFrame({
-                'UserId': [1, 1, 2, 2, 3, 3] * 5,
-                'SpotifyTrackId': ['track1', 'track2', 'track3', 'track4', 'track5', 'track6'] * 5,
-                'Rating': [5, 4, 3, 5, 2, 4] * 5,
-                'Danceability': [0.8, 0.6, 0.4, 0.9, 0.3, 0.7] * 5,
-                'Energy': [0.7, 0.5, 0.6, 0.8, 0.4, 0.6] * 5,
-                'Valence': [0.9, 0.6, 0.5, 0.8, 0.3, 0.7] * 5,
-                'Tempo_norm': [0.7, 0.5, 0.4, 0.8, 0.3, 0.6] * 5,
-                'Acousticness': [0.2, 0.4, 0.6, 0.1, 0.8, 0.3] * 5,
-                'Instrumentalness': [0.1, 0.0, 0.2, 0.0, 0.5, 0.1] * 5,
-                'Speechiness': [0.1, 0.2, 0.1, 0.1, 0.3, 0.2] * 5,
-                'Loudness_norm': [0.6, 0.5, 0.4, 0.7, 0.3, 0.5] * 5,
-                'Popularity': [80, 60, 40, 90, 30, 70] * 5
-            })
-            logger.info(f"📊 Створено {len(training_data)} тестових записів")
-        
-        # Тренування моделей через основний клас
-        metrics = ml_recommender.train_models()
-        
-        training_time = time.time() - start_time
-        
-        # Збереження метрик в базу даних (якщо можливо)
-        try:
-            model_version = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            with enhanced_loader:
-                enhanced_loader.save_model_metrics("Hybrid", model_version, metrics)
-        except Exception as e:
-            logger.warning(f"Не вдалося зберегти метрики: {e}")
-        
-        logger.info(f"✅ Тренування завершено за {training_time:.2f} секунд")
-        
+        job = training_jobs.start(kind)
         return TrainingResponse(
             success=True,
-            message=f"🎯 Всі ML моделі успішно натреновані! Content + Collaborative + SVD + Hybrid готові",
-            metrics=metrics,
-            training_time=training_time,
-            model_version=f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            message=f"🚀 Тренування ({job.kind}) виконується у фоні: GET /train/jobs/{job.job_id}",
+            job_id=job.job_id,
+            status=job.status
         )
-        
     except Exception as e:
-        logger.error(f"❌ Помилка тренування: {e}")
-        training_time = time.time() - start_time
-        
+        logger.error(f"❌ Помилка запуску тренування: {e}")
         return TrainingResponse(
             success=False,
-            message=f"❌ Помилка тренування: {str(e)}",
-            training_time=training_time
+            message=f"❌ Помилка запуску тренування: {str(e)}"
         )
 
+@app.get("/train/jobs", response_model=List[TrainingJobResponse])
+async def list_training_jobs():
+    """Останні задачі тренування (новіші першими)"""
+    return [TrainingJobResponse(**job.to_dict()) for job in training_jobs.jobs()]
+
+@app.get("/train/jobs/{job_id}", response_model=TrainingJobResponse)
+async def get_training_job(job_id: str):
+    """Стан, етап та прогрес задачі тренування; метрики - після завершення"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задачу тренування {job_id} не знайдено")
+    return TrainingJobResponse(**job.to_dict())
+
 @app.post("/recommend")
 async def get_recommendations(request: RecommendationRequest):
     """
@@ -261,13 +293,16 @@ async def get_recommendations(request: RecommendationRequest):
     - 30% Collaborative KNN (схожі користувачі)  
     - 30% SVD (латентні фактори)
     """
+    ml_recommender = model_holder.current
     start_time = time.time()
     
     try:
         if not ml_recommender.is_trained:
             logger.warning("⚠️ Моделі не натреновані, тренуємо автоматично...")
-            train_result = await train_models()
-            if not train_result.success:
+            job = training_jobs.start(FULL)
+            await asyncio.to_thread(job.wait)
+            ml_recommender = model_holder.current
+            if job.status != COMPLETED:
                 return RecommendationResponse(
                     success=False,
                     message="❌ Не вдалося натренувати моделі",
@@ -330,6 +365,7 @@ async def get_content_recommendations(request: RecommendationRequest):
     - Acousticness, Instrumentalness, Speechiness
     - Використовує Random Forest для предикції рейтингу
     """
+    ml_recommender = model_holder.current
     start_time = time.time()
     
     try:
@@ -393,6 +429,7 @@ async def get_collaborative_recommendations(request: RecommendationRequest):
     - Використовує KNN (k-nearest neighbors)
     - Рекомендує треки що подобались схожим користувачам
     """
+    ml_recommender = model_holder.current
     start_time = time.time()
     
     try:
@@ -456,6 +493,7 @@ async def get_svd_recommendations(request: RecommendationRequest):
     - Знаходить латентні фактори в даних
     - Рекомендує на основі схожості в латентному просторі
     """
+    ml_recommender = model_holder.current
     start_time = time.time()
     
     try:
@@ -510,33 +548,98 @@ async def get_svd_recommendations(request: RecommendationRequest):
             processing_time=time.time() - start_time
         )
 
+@app.post("/recommend/als")
+async def get_als_recommendations(request: RecommendationRequest):
+    """
+    🎧 Implicit ALS рекомендації
+    
+    Рекомендації на основі неявних сигналів:
+    - кількість прослуховувань, повтори, пропуски, лайки та частка прослуханого треку
+    - weighted ALS з матрицею впевненості замість явних рейтингів
+    """
+    ml_recommender = model_holder.current
+    start_time = time.time()
+    
+    try:
+        if not ml_recommender.is_trained:
+            logger.warning("⚠️ Моделі не натреновані")
+            return RecommendationResponse(
+                success=False,
+                message="❌ Моделі не натреновані. Виконайте /train спочатку",
+                recommendations=[],
+                processing_time=time.time() - start_time
+            )
+        
+        raw_recommendations = ml_recommender.get_als_recommendations(
+            user_id=request.user_id,
+            limit=request.limit
+        )
+        
+        recommendations = []
+        for rec in raw_recommendations:
+            recommendations.append(SingleRecommendation(
+                track_id=rec['track_id'],
+                artist=rec.get('artist', rec.get('Artist', 'Unknown Artist')),
+                predicted_rating=rec['predicted_rating'],
+                reason=rec.get('reason', 'ALS recommendation'),
+                features={
+                    'title': rec.get('title', rec.get('Title', 'Unknown Track')),
+                    'artist': rec.get('artist', rec.get('Artist', 'Unknown Artist')),
+                    'genre': rec.get('genre', rec.get('Genre', 'Unknown Genre')),
+                    'algorithm': rec.get('algorithm', 'Implicit_ALS'),
+                    'confidence': rec.get('confidence', 0.5),
+                    'preference_score': rec.get('preference_score', 0.0)
+                }
+            ))
+        
+        processing_time = time.time() - start_time
+        
+        return RecommendationResponse(
+            success=True,
+            message=f"✅ {len(recommendations)} ALS рекомендацій",
+            recommendations=recommendations,
+            processing_time=processing_time,
+            algorithm_used="Implicit ALS"
+        )
+        
+    except Exception as e:
+        logger.error(f"❌ Помилка ALS рекомендацій: {e}")
+        return RecommendationResponse(
+            success=False,
+            message=f"❌ Помилка: {str(e)}",
+            recommendations=[],
+            processing_time=time.time() - start_time
+        )
+
 @app.get("/models/info")
 async def get_models_info():
     """Інформація про натреновані моделі"""
+    ml_recommender = model_holder.current
     try:
-        with enhanced_loader:
-            content_metrics = enhanced_loader.get_latest_model_metrics("Content")
-            collaborative_metrics = enhanced_loader.get_latest_model_metrics("Collaborative") 
-            hybrid_metrics = enhanced_loader.get_latest_model_metrics("Hybrid")
-            
-            return {
-                "models_trained": ml_recommender.is_trained,
-                "content_based": {
-                    "available": content_metrics is not None,
-                    "last_training": content_metrics.get("TrainingDate") if content_metrics else None,
-                    "mae": content_metrics.get("MAE") if content_metrics else None
-                },
-                "collaborative": {
-                    "available": collaborative_metrics is not None,
-                    "last_training": collaborative_metrics.get("TrainingDate") if collaborative_metrics else None,
-                    "sparsity": collaborative_metrics.get("collaborative_sparsity") if collaborative_metrics else None
-                },
-                "hybrid": {
-                    "available": hybrid_metrics is not None,
-                    "last_training": hybrid_metrics.get("TrainingDate") if hybrid_metrics else None,
-                    "total_samples": hybrid_metrics.get("TrainingSamples") if hybrid_metrics else None
-                }
+        def read_metrics(loader: EnhancedDataLoader):
+            return tuple(loader.get_latest_model_metrics(model_type)
+                         for model_type in ("Content", "Collaborative", "Hybrid"))
+        
+        content_metrics, collaborative_metrics, hybrid_metrics = await enhanced_db.run(read_metrics)
+        
+        return {
+            "models_trained": ml_recommender.is_trained,
+            "content_based": {
+                "available": content_metrics is not None,
+                "last_training": content_metrics.get("TrainingDate") if content_metrics else None,
+                "mae": content_metrics.get("MAE") if content_metrics else None
+            },
+            "collaborative": {
+                "available": collaborative_metrics is not None,
+                "last_training": collaborative_metrics.get("TrainingDate") if collaborative_metrics else None,
+                "sparsity": collaborative_metrics.get("collaborative_sparsity") if collaborative_metrics else None
+            },
+            "hybrid": {
+                "available": hybrid_metrics is not None,
+                "last_training": hybrid_metrics.get("TrainingDate") if hybrid_metrics else None,
+                "total_samples": hybrid_metrics.get("TrainingSamples") if hybrid_metrics else None
             }
+        }
     except Exception as e:
         logger.error(f"Error getting models info: {e}")
         return {
@@ -547,13 +650,14 @@ async def get_models_info():
 @app.get("/data/stats")
 async def get_data_stats():
     """Статистика тренувальних даних"""
+    ml_recommender = model_holder.current
     try:
-        with enhanced_loader:
-            stats = enhanced_loader.get_training_data_stats()
-            return {
-                "success": True,
-                "stats": stats
-            }
+        stats = await enhanced_db.run(EnhancedDataLoader.get_training_data_stats)
+        return {
+            "success": True,
+            "stats": stats,
+            "connections": ml_recommender.data_loader.connection_stats()
+        }
     except Exception as e:
         logger.error(f"Error getting data stats: {e}")
         return {
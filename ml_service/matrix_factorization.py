@@ -0,0 +1,197 @@
+import logging
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BiasedMF:
+    """
+    Biased matrix factorization (Funk-SVD): r̂ᵤᵢ = μ + bᵤ + bᵢ + pᵤᵀqᵢ
+    лише по спостережених рейтингах. Тренування - mini-batch Adam по
+    перемішаних COO масивах (оновлюються лише рядки з батчу), рання зупинка
+    за RMSE на відкладеній вибірці та обмеження часу тренування.
+    """
+
+    def __init__(self, n_components: int = 32, learning_rate: float = 0.01, regularization: float = 0.05,
+                 bias_regularization: float = 0.01, batch_size: int = 4096, max_epochs: int = 100,
+                 patience: int = 3, validation_fraction: float = 0.1, time_budget_seconds: float = 120.0,
+                 random_state: int = 42):
+        self.n_components = n_components
+        self.learning_rate = learning_rate
+        self.regularization = regularization
+        self.bias_regularization = bias_regularization
+        self.batch_size = batch_size
+        self.max_epochs = max_epochs
+        self.patience = patience
+        self.validation_fraction = validation_fraction
+        self.time_budget_seconds = time_budget_seconds
+        self.random_state = random_state
+
+        self.global_mean = 0.0
+        self.user_bias: Optional[np.ndarray] = None
+        self.item_bias: Optional[np.ndarray] = None
+        self.user_factors: Optional[np.ndarray] = None
+        self.item_factors: Optional[np.ndarray] = None
+
+    def fit(self, user_codes: np.ndarray, item_codes: np.ndarray, ratings: np.ndarray,
+            n_users: int, n_items: int, global_mean: Optional[float] = None) -> Dict[str, float]:
+        """Тренування на COO масивах рейтингів; global_mean фіксується (за замовчуванням - середній рейтинг)"""
+        start = time.monotonic()
+        rng = np.random.default_rng(self.random_state)
+        ratings = np.asarray(ratings, dtype=np.float32)
+        self.global_mean = float(np.mean(ratings)) if global_mean is None else float(global_mean)
+
+        self.user_bias = np.zeros(n_users, dtype=np.float32)
+        self.item_bias = np.zeros(n_items, dtype=np.float32)
+        self.user_factors = (rng.standard_normal((n_users, self.n_components)) * 0.1).astype(np.float32)
+        self.item_factors = (rng.standard_normal((n_items, self.n_components)) * 0.1).astype(np.float32)
+
+        # Відкладена вибірка для ранньої зупинки (якщо рейтингів достатньо)
+        order = rng.permutation(len(ratings))
+        n_validation = int(len(ratings) * self.validation_fraction) if len(ratings) >= 100 else 0
+        validation, train = order[:n_validation], order[n_validation:]
+
+        params = [self.user_bias, self.item_bias, self.user_factors, self.item_factors]
+        moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+        best_rmse, best_epoch, best_params = np.inf, 0, None
+        epochs_without_improvement = 0
+        step = 0
+        epoch = 0
+        stop_reason = "max_epochs"
+
+        batch_size = self._batch_size(len(train))
+
+        for epoch in range(1, self.max_epochs + 1):
+            step = self._epoch(rng.permutation(train), batch_size, user_codes, item_codes, ratings,
+                               params, moments, step)
+
+            if n_validation:
+                rmse = self.rmse(user_codes[validation], item_codes[validation], ratings[validation])
+                if rmse < best_rmse - 1e-4:
+                    best_rmse, best_epoch = rmse, epoch
+                    best_params = [p.copy() for p in params]
+                    epochs_without_improvement = 0
+                else:
+                    epochs_without_improvement += 1
+                    if epochs_without_improvement >= self.patience:
+                        stop_reason = "early_stopping"
+                        break
+
+            if time.monotonic() - start > self.time_budget_seconds:
+                stop_reason = "time_budget"
+                break
+
+        if best_params is not None:
+            for param, best in zip(params, best_params):
+                param[:] = best
+
+        train_rmse = self.rmse(user_codes[train], item_codes[train], ratings[train]) if len(train) else 0.0
+        elapsed = time.monotonic() - start
+        logger.info(f"🔧 Biased MF: {epoch} епох ({stop_reason}), train RMSE {train_rmse:.4f}"
+                    + (f", validation RMSE {best_rmse:.4f} (епоха {best_epoch})" if n_validation else "")
+                    + f", {elapsed:.2f}с")
+        return {
+            "svd_epochs": epoch,
+            "svd_best_epoch": best_epoch if n_validation else epoch,
+            "svd_stop_reason": stop_reason,
+            "svd_train_rmse": train_rmse,
+            "svd_validation_rmse": float(best_rmse) if n_validation else None,
+            "svd_training_seconds": elapsed,
+        }
+
+    def partial_fit(self, user_codes: np.ndarray, item_codes: np.ndarray, ratings: np.ndarray,
+                    n_users: int, n_items: int, epochs: int = 3) -> Dict[str, float]:
+        """
+        Теплий старт від поточних параметрів: кілька епох mini-batch Adam лише по
+        переданих рейтингах (зазвичай - всі рейтинги зачеплених дельтою користувачів
+        та треків), global_mean не змінюється. Нові користувачі/треки отримують рядки
+        з ініціалізацією як у fit. Параметри замінюються новими масивами, тож попередні
+        масиви, які ще читають запити, не змінюються.
+        """
+        start = time.monotonic()
+        rng = np.random.default_rng(self.random_state)
+        ratings = np.asarray(ratings, dtype=np.float32)
+
+        self.user_bias = np.pad(self.user_bias, (0, n_users - len(self.user_bias))).astype(np.float32)
+        self.item_bias = np.pad(self.item_bias, (0, n_items - len(self.item_bias))).astype(np.float32)
+        self.user_factors = self._grow_factors(self.user_factors, n_users, rng)
+        self.item_factors = self._grow_factors(self.item_factors, n_items, rng)
+
+        params = [self.user_bias, self.item_bias, self.user_factors, self.item_factors]
+        moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+        batch_size = self._batch_size(len(ratings))
+        order = np.arange(len(ratings))
+        step = 0
+        for _ in range(epochs):
+            step = self._epoch(rng.permutation(order), batch_size, user_codes, item_codes, ratings,
+                               params, moments, step)
+
+        rmse = self.rmse(user_codes, item_codes, ratings)
+        elapsed = time.monotonic() - start
+        logger.info(f"🔧 Biased MF теплий старт: {epochs} епох по {len(ratings)} рейтингах, "
+                    f"RMSE {rmse:.4f}, {elapsed:.2f}с")
+        return {
+            "svd_warm_start_epochs": epochs,
+            "svd_warm_start_ratings": len(ratings),
+            "svd_warm_start_rmse": rmse,
+            "svd_warm_start_seconds": elapsed,
+        }
+
+    def _grow_factors(self, factors: np.ndarray, n_rows: int, rng: np.random.Generator) -> np.ndarray:
+        """Копія факторів з новими рядками (ініціалізація як у fit)"""
+        new_rows = rng.standard_normal((n_rows - len(factors), self.n_components)) * 0.1
+        return np.vstack([factors, new_rows]).astype(np.float32)
+
+    def _batch_size(self, n_ratings: int) -> int:
+        # На малих даних батч зменшується, щоб епоха мала достатньо кроків Adam
+        return max(1, min(self.batch_size, max(64, n_ratings // 20)))
+
+    def _epoch(self, order: np.ndarray, batch_size: int, user_codes: np.ndarray, item_codes: np.ndarray,
+               ratings: np.ndarray, params: list, moments: list, step: int) -> int:
+        """Одна епоха Adam по рейтингах у порядку order; повертає лічильник кроків"""
+        for batch_start in range(0, len(order), batch_size):
+            batch = order[batch_start:batch_start + batch_size]
+            step += 1
+            self._adam_step(user_codes[batch], item_codes[batch], ratings[batch], params, moments, step)
+        return step
+
+    def _adam_step(self, users: np.ndarray, items: np.ndarray, ratings: np.ndarray,
+                   params: list, moments: list, step: int, beta1: float = 0.9, beta2: float = 0.999,
+                   epsilon: float = 1e-8):
+        """Один крок Adam по батчу: градієнти агрегуються по унікальних рядках, решта параметрів не змінюється"""
+        user_bias, item_bias, user_factors, item_factors = params
+        P, Q = user_factors[users], item_factors[items]
+        errors = (self.global_mean + user_bias[users] + item_bias[items]
+                  + np.einsum('ij,ij->i', P, Q) - ratings)
+
+        user_rows = np.unique(users, return_inverse=True)
+        item_rows = np.unique(items, return_inverse=True)
+        gradients = [
+            (user_rows, errors + self.bias_regularization * user_bias[users]),
+            (item_rows, errors + self.bias_regularization * item_bias[items]),
+            (user_rows, errors[:, None] * Q + self.regularization * P),
+            (item_rows, errors[:, None] * P + self.regularization * Q),
+        ]
+        correction1 = 1.0 - beta1 ** step
+        correction2 = 1.0 - beta2 ** step
+
+        for param, (m, v), ((rows, inverse), gradient) in zip(params, moments, gradients):
+            grad = np.zeros((len(rows),) + gradient.shape[1:], dtype=np.float32)
+            np.add.at(grad, inverse, gradient)
+
+            m[rows] = beta1 * m[rows] + (1.0 - beta1) * grad
+            v[rows] = beta2 * v[rows] + (1.0 - beta2) * grad ** 2
+            param[rows] -= self.learning_rate * (m[rows] / correction1) / (np.sqrt(v[rows] / correction2) + epsilon)
+
+    def predict(self, user_codes: np.ndarray, item_codes: np.ndarray) -> np.ndarray:
+        """Передбачені рейтинги для пар (користувач, трек)"""
+        return (self.global_mean + self.user_bias[user_codes] + self.item_bias[item_codes]
+                + np.einsum('ij,ij->i', self.user_factors[user_codes], self.item_factors[item_codes]))
+
+    def rmse(self, user_codes: np.ndarray, item_codes: np.ndarray, ratings: np.ndarray) -> float:
+        if len(ratings) == 0:
+            return 0.0
+        return float(np.sqrt(np.mean((self.predict(user_codes, item_codes) - ratings) ** 2)))
@@ -9,20 +9,48 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 import joblib
 import logging
-from typing import List, Dict, Tuple
-from data_loader import DataLoader
+import time
+from typing import Callable, List, Dict, NamedTuple, Optional, Tuple
+from data_loader import DataLoader, TrainingSet
+from track_catalog import TrackCatalog
+from implicit_als import ImplicitALS, implicit_matrices, implicit_signal_strength
+from matrix_factorization import BiasedMF
+from fold_in import FoldedUser, FoldInCache, fold_in_user, ratings_signature
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threadpoolctl import threadpool_limits
 from scipy.sparse import csr_matrix
 from scipy.spatial.distance import cosine
 
 logger = logging.getLogger(__name__)
 
+# Знімки підготовлених даних для тренування (поряд зі збереженими моделями)
+TRAINING_SNAPSHOT_DIR = os.path.join("models", "training_sets")
+
+# Тривалість треку (с), якщо DurationMs невідома - як у MLDataCollectionService
+DEFAULT_TRACK_DURATION_SECONDS = 180.0
+
+class ContentRanking(NamedTuple):
+    """
+    Треки каталогу за спаданням content-скору. Content модель бачить лише аудіо
+    фічі треку, тож ранжування не залежить від користувача.
+    """
+    catalog_fingerprint: str
+    catalog_version: Optional[Tuple]  # Версія БД, для якої відбиток вже перевірено
+    rows: np.ndarray    # Рядки каталогу, відсортовані за спаданням скору
+    scores: np.ndarray  # Передбачені рейтинги в тому ж порядку
+
 class MusicRecommenderML:
     def __init__(self):
-        self.data_loader = DataLoader()
+        self.data_loader = DataLoader(snapshot_dir=TRAINING_SNAPSHOT_DIR)
         self.content_model = None  # Content-based модель
+        self.content_ranking: Optional[ContentRanking] = None  # Раз на тренування та вміст каталогу
         self.collaborative_model = None  # Collaborative filtering модель
         self.svd_model = None  # SVD модель
+        self.svd_algorithm = "biased_mf"  # "biased_mf" (mini-batch Adam) або "truncated_svd"
+        self.svd_time_budget_seconds = 120.0  # Обмеження часу тренування biased MF
+        self.als_model = None  # Implicit ALS модель (неявні сигнали)
+        self.als_alpha = 10.0  # Масштаб впевненості неявних сигналів
         self.scaler = StandardScaler()
         self.feature_columns = [
             'Danceability', 'Energy', 'Valence', 'Tempo_norm',
@@ -30,6 +58,7 @@ class MusicRecommenderML:
             'Loudness_norm', 'Popularity'
         ]
         self.is_trained = False
+        self.training_chunk_size = 50000  # Рядків взаємодій на порцію при підготовці даних
         
         # Додаткові атрибути для покращених алгоритмів
         self.user_item_matrix = None
@@ -39,74 +68,491 @@ class MusicRecommenderML:
         self.global_mean = None
         self.svd_user_factors = None
         self.svd_item_factors = None
-        self.user_id_to_idx = {}
-        self.item_id_to_idx = {}
-        self.idx_to_user_id = {}
-        self.idx_to_item_id = {}
-        
-    def train_models(self) -> Dict[str, float]:
+        self.svd_user_bias = None  # bᵤ у прогнозі SVD (для truncated_svd - user_mean - global_mean)
+        # Словники кодів: user_ids[код] / track_ids[код], зворотний пошук через pd.Index
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.track_ids = np.empty(0, dtype=object)
+        self.user_index = pd.Index(self.user_ids)
+        self.track_index = pd.Index(self.track_ids)
+        self.training_watermark = {}  # MAX(rowid) джерел взаємодій, врахованих моделями
+        self.training_data_state = {}  # COUNT(*) та контрольні суми рядків джерел до training_watermark
+        
+        # Fold-in нових та змінених користувачів без перетренування
+        self.model_data_version = None  # Версія БД, на якій побудовані матриці моделей
+        self.fold_in_regularization = 0.1
+        self.fold_in_bias_regularization = 0.01
+        self.fold_in_cache = FoldInCache(max_size=10000)
+        
+        # Інкрементальне оновлення SVD факторів та поріг дрейфу для повного перенавчання
+        self.svd_incremental_epochs = 3
+        self.svd_rebuild_growth = 0.25  # Частка рейтингів, доданих після повного тренування
+        self.svd_rebuild_error_ratio = 1.5  # RMSE на нових рейтингах / RMSE тренування
+        self.svd_drift_baseline = {}  # RMSE та кількість рейтингів повного тренування SVD
+        
+        # Під-моделі тренуються паралельно: кількість одночасних під-моделей та потоків
+        # для під-моделей з власним паралелізмом (None - ядра порівну між ними)
+        self.training_workers = 4
+        self.training_cpu_budget: Dict[str, Optional[int]] = {"content": None, "als": None}
+        self._sub_model_workers = 1  # Під-моделей, що тренуються одночасно (задає _train_sub_models)
+        
+    def train_models(self, progress: Optional[Callable[[str, float], None]] = None) -> Dict[str, float]:
         """
         Тренування всіх моделей з покращеними алгоритмами:
         1. Content-Based: Random Forest для предикції рейтингу на основі аудіо фічей
         2. Collaborative: покращений KNN з нормалізацією та weighted similarities
         3. SVD: правильна матрична факторизація з bias terms
+        4. ALS: weighted ALS на неявних сигналах (прослуховування, пропуски, повтори, лайки)
+        Під-моделі незалежні (читають спільні словники та матрицю рейтингів,
+        пишуть власні атрибути), тож тренуються паралельно в пулі потоків.
+        progress(stage, fraction) викликається на кожному етапі (для фонових задач).
         """
+        report = progress or (lambda stage, fraction: None)
         logger.info("🎯 Початок тренування покращених ML моделей...")
+        report("data", 0.0)
+        training_start = time.time()
+        stage_durations = {}
+        
+        # Завантажуємо дані потоково (COO масиви + фічі один раз на трек)
+        # з узгодженого знімка БД. Версія береться до знімка: запис між ними
+        # лише змусить fold-in перевірити користувачів зайвий раз.
+        # Каталог теж читається зі знімка і передається під-моделям: потоки пулу
+        # не бачать закріпленого з'єднання, а запис під час тренування не має
+        # розвести набір треків ALS та решти під-моделей.
+        data_version = self.data_loader.get_data_version()
+        with self.data_loader.training_snapshot():
+            watermark = self.data_loader.get_current_watermark()
+            data_state = self.data_loader.interaction_checksums(watermark)
+            catalog = self.data_loader.get_track_catalog()
+            training_set = self.data_loader.prepare_training_set(
+                self.feature_columns, chunk_size=self.training_chunk_size, catalog=catalog
+            )
+            implicit_signals = self.data_loader.load_implicit_signals()
+        stage_durations["data"] = time.time() - training_start
         
-        # Завантажуємо дані
-        training_data, all_features = self.data_loader.prepare_training_data()
-        
-        if training_data.empty:
+        if len(training_set) == 0:
             logger.error("❌ Немає даних для тренування!")
             return {"error": "Немає даних для тренування"}
         
-        logger.info(f"📊 Дані для тренування: {len(training_data)} записів")
+        logger.info(f"📊 Дані для тренування: {len(training_set)} записів")
+        
+        # Підготовка спільних структур даних (лише читаються під-моделями)
+        stage_start = time.time()
+        self._prepare_user_item_mappings(training_set)
+        self._build_rating_matrix(training_set)
+        stage_durations["rating_matrix"] = time.time() - stage_start
+        
+        # 1. Content-Based, 2. Collaborative, 3. SVD, 4. implicit ALS - одночасно
+        report("sub_models", 0.2)
+        sub_models_start = time.time()
+        sub_model_metrics, sub_model_durations = self._train_sub_models({
+            "content": lambda: self._train_content_based_model(training_set),
+            "collaborative": self._train_improved_collaborative_model,
+            "svd": lambda: self._train_improved_svd_model(training_set),
+            "als": lambda: self._train_implicit_als_model(implicit_signals, catalog),
+        }, report)
+        stage_durations.update(sub_model_durations)
+        stage_durations["sub_models_wall"] = time.time() - sub_models_start
         
-        # Підготовка базових структур даних
-        self._prepare_user_item_mappings(training_data)
+        self.is_trained = True
+        self._advance_watermark(watermark, data_state)
+        self._reset_fold_in(data_version, rebind=True)
         
-        # 1. Тренування Content-Based моделі
-        content_metrics = self._train_content_based_model(training_data)
+        # Профілі користувачів та content-ранжування - запити рекомендацій беруть їх з пам'яті
+        report("serving_caches", 0.9)
+        stage_start = time.time()
+        self.warm_serving_caches()
+        stage_durations["serving_caches"] = time.time() - stage_start
         
-        # 2. Тренування покращеної Collaborative Filtering моделі
-        collaborative_metrics = self._train_improved_collaborative_model(training_data)
+        training_duration = time.time() - training_start
+        metrics = {
+            **sub_model_metrics,
+            "total_training_samples": len(training_set),
+            "unique_users": len(training_set.user_ids),
+            "unique_tracks": len(training_set.track_ids),
+            "stage_durations": stage_durations,
+            "training_duration": training_duration
+        }
         
-        # 3. Тренування покращеної SVD моделі
-        svd_metrics = self._train_improved_svd_model(training_data)
+        logger.info("⏱️ Етапи тренування: " + ", ".join(f"{name} {seconds:.2f}с" for name, seconds in stage_durations.items()))
+        logger.info(f"✅ Тренування покращених моделей завершено успішно за {training_duration:.2f}с!")
+        return metrics
+    
+    def warm_serving_caches(self):
+        """Профілі всіх користувачів одним запитом та content-ранжування для поточного каталогу"""
+        self.data_loader.get_all_user_profiles()
+        if self.content_model is not None:
+            self._content_ranking(self.data_loader.get_track_catalog())
+    
+    def _train_sub_models(self, sub_models: Dict[str, Callable[[], Dict]],
+                          report: Callable[[str, float], None]) -> Tuple[Dict, Dict[str, float]]:
+        """
+        Тренування незалежних під-моделей у пулі потоків. Важкі частини (побудова
+        дерев Random Forest, BLAS та розріджені добутки ALS) відпускають GIL, тож
+        загальний час наближається до найповільнішої під-моделі, а не до суми.
+        Поки під-моделі тренуються одночасно, BLAS/OpenMP однопотокові (threadpool_limits
+        діє на весь процес), а ядра ділять під-моделі з власним паралелізмом (_cpu_budget) -
+        разом потоків не більше os.cpu_count(), без переповнення ядер пулами BLAS.
+        Повертає об'єднані метрики (у порядку sub_models) та тривалості під-моделей.
+        """
+        def timed(train: Callable[[], Dict]) -> Tuple[Dict, float]:
+            start = time.time()
+            return train(), time.time() - start
+        
+        workers = max(1, min(self.training_workers, len(sub_models)))
+        self._sub_model_workers = workers
+        results, durations = {}, {}
+        with threadpool_limits(limits=1 if workers > 1 else None), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ml-train") as executor:
+            futures = {executor.submit(timed, train): name for name, train in sub_models.items()}
+            for completed, future in enumerate(as_completed(futures), start=1):
+                name = futures[future]
+                results[name], durations[name] = future.result()
+                report(name, 0.2 + 0.7 * completed / len(futures))
+        
+        metrics = {}
+        for name in sub_models:
+            metrics.update(results[name])
+        return metrics, durations
+    
+    def _cpu_budget(self, sub_model: str) -> int:
+        """
+        Потоки для під-моделі: з training_cpu_budget або ядра порівну між усіма
+        під-моделями, що тренуються одночасно (решта займає по одному ядру)
+        """
+        budget = self.training_cpu_budget.get(sub_model)
+        if budget:
+            return budget
+        return max(1, (os.cpu_count() or 1) // self._sub_model_workers)
+    
+    def update_incremental(self) -> Dict[str, float]:
+        """
+        Інкрементальне оновлення за взаємодіями, доданими після останнього тренування:
+        нові користувачі/треки отримують рядки та колонки, змінені рядки
+        перераховуються, KNN перефітовується, SVD фактори зачеплених користувачів
+        та треків оновлюються кількома епохами Adam від попередніх значень.
+        Якщо дрейф SVD перевищує пороги - виконується повне тренування.
+        Content модель не перенавчається, ALS отримує нульові фактори для нових рядків.
+        
+        Дельта - лише рядки з rowid після watermark, а злиття через maximum не може
+        знизити рейтинг. Для вставок цього достатньо (рейтинг пари - MAX по всіх рядках,
+        як і в повному завантаженні), тож UPDATE та DELETE вже врахованих рядків
+        виявляються окремо: COUNT(*) та контрольні суми рядків до watermark
+        порівнюються з training_data_state (один прохід по джерелах). Якщо вони змінились
+        або стан невідомий (моделі збережені до його появи) - виконується повне тренування.
+        """
+        if not self.is_trained or self.user_item_matrix is None:
+            logger.info("ℹ️ Моделі ще не натреновані - виконуємо повне тренування")
+            return self.train_models()
+        
+        watermark = self.training_watermark or self.data_loader.load_watermark()
+        if not watermark:
+            logger.info("ℹ️ Watermark відсутній - виконуємо повне тренування")
+            return self.train_models()
+        
+        # Перевірка врахованих рядків, дельта та її контрольні суми - з одного знімка БД
+        data_version = self.data_loader.get_data_version()
+        with self.data_loader.training_snapshot():
+            trained_state = self.data_loader.interaction_checksums(watermark)
+            new_watermark = self.data_loader.get_current_watermark()
+            delta = self.data_loader.load_interactions_since(watermark, until=new_watermark)
+            delta_state = self.data_loader.interaction_checksums(new_watermark, since=watermark)
+        
+        if trained_state != self.training_data_state:
+            reason = "враховані рядки змінені або видалені" if self.training_data_state \
+                else "стан даних тренування невідомий"
+            logger.info(f"♻️ {reason} - виконуємо повне тренування")
+            return {**self.train_models(), "incremental_rebuild": reason}
+        
+        # Стан нових рядків додається до стану тренування
+        new_data_state = {
+            table: [old + added for old, added in zip(trained_state.get(table, [0, 0]), counts)]
+            for table, counts in delta_state.items()
+        }
         
-        self.is_trained = True
+        # Ті ж фільтри, що й у prepare_training_set: трек є в каталозі з валідними фічами
+        if not delta.empty:
+            catalog = self.data_loader.get_track_catalog()
+            rows = catalog.rows(delta['SpotifyTrackId'])
+            valid = catalog.valid_rows_mask(self.feature_columns)
+            keep = (rows >= 0) & delta['Rating'].notna().to_numpy()
+            keep[keep] &= valid[rows[keep]]
+            delta = delta[keep]
+        
+        if delta.empty:
+            self._advance_watermark(new_watermark, new_data_state)
+            self._reset_fold_in(data_version, rebind=True)
+            logger.info("ℹ️ Нових взаємодій немає")
+            return {"incremental_interactions": 0, "incremental_new_users": 0, "incremental_new_tracks": 0}
+        
+        logger.info(f"🔁 Інкрементальне оновлення: {len(delta)} нових взаємодій")
+        
+        drift = self._svd_drift(delta)
+        rebuild_reason = self._svd_rebuild_reason(drift)
+        if rebuild_reason:
+            logger.info(f"♻️ Дрейф SVD ({rebuild_reason}) - виконуємо повне тренування")
+            return {**self.train_models(), **drift, "incremental_rebuild": rebuild_reason}
+        
+        # Нові користувачі та треки отримують коди в кінці словників
+        delta_users = delta['UserId'].to_numpy(dtype=np.int64)
+        delta_tracks = delta['SpotifyTrackId'].to_numpy(dtype=object)
+        new_users = pd.unique(delta_users[self.user_index.get_indexer(delta_users) < 0])
+        new_items = pd.unique(delta_tracks[self.track_index.get_indexer(delta_tracks) < 0])
+        self._set_id_vocabularies(
+            np.concatenate([self.user_ids, new_users]),
+            np.concatenate([self.track_ids, new_items])
+        )
         
-        metrics = {
-            **content_metrics,
-            **collaborative_metrics,
+        shape = (len(self.user_ids), len(self.track_ids))
+        self.user_item_matrix.resize(shape)
+        
+        # Агрегація як у повному завантаженні: рейтинг пари - максимум по всіх джерелах
+        u_idx = self.user_index.get_indexer(delta_users)
+        i_idx = self.track_index.get_indexer(delta_tracks)
+        delta_matrix = csr_matrix((delta['Rating'].to_numpy(dtype=float), (u_idx, i_idx)), shape=shape)
+        self.user_item_matrix = self.user_item_matrix.maximum(delta_matrix).tocsr()
+        self.user_item_matrix.sort_indices()
+        
+        # Перерахунок середніх та нормалізації - O(кількість рейтингів)
+        self._center_user_ratings()
+        self.global_mean = float(np.mean(self.user_item_matrix.data)) \
+            if self.user_item_matrix.nnz else self.global_mean
+        
+        self._fit_collaborative_knn()
+        
+        # SVD: теплий старт від попередніх факторів по рядках, зачеплених дельтою
+        svd_metrics = {}
+        if self.svd_user_factors is not None:
+            svd_metrics = self._warm_start_svd(u_idx, i_idx, delta['Rating'].to_numpy(dtype=float))
+        
+        # ALS: нульові фактори - для нових користувачів працює fallback на популярні треки
+        if self.als_model is not None:
+            self.als_model.user_factors = np.pad(self.als_model.user_factors, ((0, len(new_users)), (0, 0)))
+            self.als_model.item_factors = np.pad(self.als_model.item_factors, ((0, len(new_items)), (0, 0)))
+        
+        self._advance_watermark(new_watermark, new_data_state)
+        self._reset_fold_in(data_version, rebind=True)
+        
+        logger.info(f"✅ Інкрементальне оновлення: +{len(new_users)} користувачів, +{len(new_items)} треків")
+        return {
+            "incremental_interactions": len(delta),
+            "incremental_new_users": len(new_users),
+            "incremental_new_tracks": len(new_items),
+            **drift,
             **svd_metrics,
-            "total_training_samples": len(training_data),
-            "unique_users": training_data['UserId'].nunique(),
-            "unique_tracks": training_data['SpotifyTrackId'].nunique()
+            "unique_users": len(self.user_ids),
+            "unique_tracks": len(self.track_ids)
         }
-        
-        logger.info("✅ Тренування покращених моделей завершено успішно!")
-        return metrics
     
-    def _prepare_user_item_mappings(self, data: pd.DataFrame):
-        """Підготовка індексних мапінгів для користувачів та елементів"""
-        unique_users = sorted(data['UserId'].unique())
-        unique_items = sorted(data['SpotifyTrackId'].unique())
+    def _svd_rmse(self, users: np.ndarray, items: np.ndarray, ratings: np.ndarray) -> float:
+        """RMSE прогнозу SVD (bᵤ + μ + bᵢ + pᵤᵀqᵢ) для пар у кодах словників"""
+        if len(ratings) == 0:
+            return 0.0
+        predicted = (self.svd_user_bias[users] + self.item_means[items]
+                     + np.einsum('ij,ij->i', self.svd_user_factors[users], self.svd_item_factors[items]))
+        return float(np.sqrt(np.mean((predicted - ratings) ** 2)))
+    
+    def _set_svd_drift_baseline(self):
+        """Точка відліку дрейфу: RMSE та кількість рейтингів на момент повного тренування SVD"""
+        ratings = self.user_item_matrix.tocoo()
+        self.svd_drift_baseline = {
+            "rmse": self._svd_rmse(ratings.row, ratings.col, ratings.data),
+            "interactions": int(ratings.nnz),
+            "appended": 0
+        }
+    
+    def _svd_drift(self, delta: pd.DataFrame) -> Dict[str, float]:
+        """
+        Дрейф SVD відносно повного тренування: частка доданих рейтингів та відношення
+        RMSE поточних факторів на нових рейтингах відомих пар до RMSE тренування
+        """
+        baseline = self.svd_drift_baseline
+        if self.svd_user_factors is None or not baseline:
+            return {}
+        
+        growth = (baseline["appended"] + len(delta)) / max(baseline["interactions"], 1)
+        users = self.user_index.get_indexer(delta['UserId'].to_numpy(dtype=np.int64))
+        items = self.track_index.get_indexer(delta['SpotifyTrackId'].to_numpy(dtype=object))
+        known = (users >= 0) & (items >= 0)
+        error_ratio = 0.0
+        if known.any() and baseline["rmse"] > 0:
+            rmse = self._svd_rmse(users[known], items[known], delta['Rating'].to_numpy(dtype=float)[known])
+            error_ratio = rmse / baseline["rmse"]
+        
+        return {"svd_drift_growth": growth, "svd_drift_error_ratio": error_ratio}
+    
+    def _svd_rebuild_reason(self, drift: Dict[str, float]) -> Optional[str]:
+        """Причина повного перенавчання SVD або None, якщо достатньо теплого старту"""
+        if not drift:
+            return None
+        if drift["svd_drift_growth"] > self.svd_rebuild_growth:
+            return f"додано {drift['svd_drift_growth']:.0%} рейтингів"
+        if drift["svd_drift_error_ratio"] > self.svd_rebuild_error_ratio:
+            return f"RMSE на нових рейтингах x{drift['svd_drift_error_ratio']:.2f}"
+        return None
+    
+    def _warm_start_svd(self, users: np.ndarray, items: np.ndarray, ratings: np.ndarray) -> Dict[str, float]:
+        """
+        Теплий старт SVD після дельти: кілька епох Adam від попередніх факторів по всіх
+        рейтингах зачеплених користувачів та треків. Нові рядки з'являються тут же.
+        """
+        n_users, n_items = self.user_item_matrix.shape
+        affected_users = np.zeros(n_users, dtype=bool)
+        affected_items = np.zeros(n_items, dtype=bool)
+        affected_users[users] = True
+        affected_items[items] = True
+        
+        # Повна історія зачеплених рядків, а не лише дельта - інакше фактори перенавчаються на ній
+        matrix = self.user_item_matrix.tocoo()
+        mask = affected_users[matrix.row] | affected_items[matrix.col]
+        
+        if isinstance(self.svd_model, BiasedMF):
+            model = self.svd_model
+        else:
+            # truncated_svd: прогноз має ту ж форму μ + bᵤ + bᵢ + pᵤᵀqᵢ - дотреновуємо як biased MF
+            model = BiasedMF(n_components=self.svd_user_factors.shape[1])
+            model.global_mean = self.global_mean
+            model.user_bias = np.asarray(self.svd_user_bias, dtype=np.float32)
+            model.item_bias = np.asarray(self.item_means - self.global_mean, dtype=np.float32)
+            model.user_factors = np.asarray(self.svd_user_factors, dtype=np.float32)
+            model.item_factors = np.asarray(self.svd_item_factors, dtype=np.float32)
+        
+        metrics = model.partial_fit(matrix.row[mask], matrix.col[mask], matrix.data[mask],
+                                    n_users, n_items, epochs=self.svd_incremental_epochs)
+        
+        self.svd_user_factors = model.user_factors
+        self.svd_item_factors = model.item_factors
+        self.svd_user_bias = model.user_bias
+        self.item_means = model.global_mean + model.item_bias
+        
+        if self.svd_drift_baseline:
+            self.svd_drift_baseline = {
+                **self.svd_drift_baseline,
+                "appended": self.svd_drift_baseline["appended"] + len(ratings)
+            }
         
-        self.user_id_to_idx = {user_id: idx for idx, user_id in enumerate(unique_users)}
-        self.item_id_to_idx = {item_id: idx for idx, item_id in enumerate(unique_items)}
-        self.idx_to_user_id = {idx: user_id for user_id, idx in self.user_id_to_idx.items()}
-        self.idx_to_item_id = {idx: item_id for item_id, idx in self.item_id_to_idx.items()}
+        return {
+            **metrics,
+            "svd_warm_start_users": int(affected_users.sum()),
+            "svd_warm_start_items": int(affected_items.sum()),
+            "svd_delta_rmse": self._svd_rmse(users, items, ratings)
+        }
+    
+    def _advance_watermark(self, watermark: Dict[str, int], data_state: Dict[str, list]):
+        """Запам'ятовування та збереження watermark, до якого враховані взаємодії"""
+        self.training_watermark = dict(watermark)
+        self.training_data_state = dict(data_state)
+        try:
+            self.data_loader.save_watermark(watermark)
+        except Exception as e:
+            logger.warning(f"⚠️ Не вдалося зберегти watermark: {e}")
+    
+    def _reset_fold_in(self, data_version, rebind: bool = False):
+        """
+        Матриці моделей відповідають data_version (версії БД до знімка даних тренування) -
+        попередні fold-in стани застарілі. З rebind поточна версія БД береться лише тоді,
+        коли вміст джерел не змінився з тренування: watermark той самий, а COUNT(*) та
+        контрольні суми рядків до нього збігаються з training_data_state. Тоді після
+        тренування були лише службові записи (watermark) або версія належить іншому
+        процесу (фонова задача). Інакше лишається data_version і fold-in перевіряє користувачів.
+        """
+        self.model_data_version = data_version
+        self.fold_in_cache.clear()
+        if not rebind or not self.training_data_state:
+            return
+        try:
+            # Версія читається до перевірки вмісту: запис між ними лише залишить перевірку користувачів
+            current_version = self.data_loader.get_data_version()
+            if current_version == data_version:
+                return
+            with self.data_loader.training_snapshot():
+                unchanged = (self.data_loader.get_current_watermark() == self.training_watermark
+                             and self.data_loader.interaction_checksums(self.training_watermark)
+                             == self.training_data_state)
+            if unchanged:
+                self.model_data_version = current_version
+        except Exception as e:
+            logger.warning(f"⚠️ Не вдалося перевірити стан даних тренування: {e}")
+    
+    def _folded_user(self, user_id: int, user_idx: int) -> Optional[FoldedUser]:
+        """
+        Поточний стан користувача відносно моделей. None - БД не змінювалась після
+        тренування, тож натреновані рядки актуальні. Інакше рейтинги користувача
+        (індексований запит) порівнюються з рядком матриці; для нових та змінених
+        користувачів латентний вектор і bias рахуються fold-in при заморожених
+        факторах треків. Результат кешується до зміни історії користувача.
+        """
+        version = self.data_loader.get_data_version()
+        if user_idx >= 0 and version is not None and version == self.model_data_version:
+            return None
+        
+        cached = self.fold_in_cache.get(user_id)
+        if cached is not None and version is not None and cached.data_version == version:
+            return cached
+        
+        ratings = self.data_loader.get_user_ratings(user_id)
+        item_codes = self.track_index.get_indexer(ratings['SpotifyTrackId'].to_numpy(dtype=object))
+        values = ratings['Rating'].to_numpy(dtype=float, na_value=0.0)
+        known = (item_codes >= 0) & (values > 0)
+        order = np.argsort(item_codes[known], kind='stable')
+        item_codes, values = item_codes[known][order], values[known][order]
+        signature = ratings_signature(item_codes, values)
+        
+        if cached is not None and cached.signature == signature:
+            folded = cached._replace(data_version=version)
+        else:
+            changed = len(item_codes) > 0 and not (
+                user_idx >= 0 and self._matches_trained_row(user_idx, item_codes, values)
+            )
+            factors, bias = None, 0.0
+            if changed and self.svd_item_factors is not None:
+                factors, bias = fold_in_user(
+                    self.svd_item_factors[item_codes],
+                    values - self.item_means[item_codes],
+                    self.fold_in_regularization,
+                    self.fold_in_bias_regularization
+                )
+                logger.info(f"🧩 Fold-in користувача {user_id}: {len(item_codes)} рейтингів")
+            folded = FoldedUser(version, signature, item_codes, values, changed, factors, bias)
         
-        logger.info(f"📋 Мапінги створені: {len(unique_users)} користувачів, {len(unique_items)} треків")
+        self.fold_in_cache.put(user_id, folded)
+        return folded
+    
+    def _matches_trained_row(self, user_idx: int, item_codes: np.ndarray, ratings: np.ndarray) -> bool:
+        """
+        Чи збігаються рейтинги користувача з його рядком у user-item матриці.
+        Порівнюються поточні агреговані рейтинги з БД, тож UPDATE, DELETE і знижені
+        рейтинги теж дають fold-in (поки model_data_version не збігається з версією БД).
+        """
+        if self.user_item_matrix is None or user_idx >= self.user_item_matrix.shape[0]:
+            return False
+        row_start, row_end = self.user_item_matrix.indptr[user_idx:user_idx + 2]
+        return (np.array_equal(self.user_item_matrix.indices[row_start:row_end], item_codes)
+                and np.allclose(self.user_item_matrix.data[row_start:row_end], ratings))
+    
+    def _prepare_user_item_mappings(self, training_set: TrainingSet):
+        """Словники кодів користувачів та треків (коди вже закодовані завантажувачем)"""
+        self._set_id_vocabularies(training_set.user_ids, training_set.track_ids)
+        logger.info(f"📋 Мапінги створені: {len(self.user_ids)} користувачів, {len(self.track_ids)} треків")
+    
+    def _set_id_vocabularies(self, user_ids: np.ndarray, track_ids: np.ndarray):
+        """Масиви id за кодом та хеш-індекси для векторизованого зворотного пошуку"""
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.track_ids = np.asarray(track_ids, dtype=object)
+        self.user_index = pd.Index(self.user_ids)
+        self.track_index = pd.Index(self.track_ids)
+    
+    def _user_code(self, user_id: int) -> int:
+        """Код користувача (-1 якщо користувача немає в моделях)"""
+        return int(self.user_index.get_indexer([user_id])[0])
 
-    def _train_content_based_model(self, data: pd.DataFrame) -> Dict[str, float]:
+    def _train_content_based_model(self, training_set: TrainingSet) -> Dict[str, float]:
         """Тренування Content-Based моделі"""
         logger.info("🎵 Тренування Content-Based моделі...")
+        self.content_ranking = None
         
-        # Підготовка фічей
-        X = data[self.feature_columns].fillna(0)
-        y = data['Rating'].values
+        # Підготовка фічей (рядок фічей треку для кожної взаємодії)
+        X = np.nan_to_num(training_set.item_features[training_set.item_codes])
+        y = training_set.ratings
         
         # Нормалізація фічей
         X_scaled = self.scaler.fit_transform(X)
@@ -121,7 +567,7 @@ class MusicRecommenderML:
             n_estimators=100,
             max_depth=10,
             random_state=42,
-            n_jobs=-1
+            n_jobs=self._cpu_budget("content")
         )
         
         self.content_model.fit(X_train, y_train)
@@ -146,131 +592,156 @@ class MusicRecommenderML:
             "content_feature_importance": feature_importance
         }
     
-    def _train_improved_collaborative_model(self, data: pd.DataFrame) -> Dict[str, float]:
+    def _build_rating_matrix(self, training_set: TrainingSet):
+        """Спільна для collaborative та SVD user-item матриця рейтингів, середні та нормалізація"""
+        # Коди користувачів та треків вже підготовлені завантажувачем
+        user_indices = training_set.user_codes
+        item_indices = training_set.item_codes
+        ratings = training_set.ratings
+        
+        # Розріджена CSR матриця: пам'ять O(кількість рейтингів), а не users x items
+        rated = ratings > 0
+        self.user_item_matrix = csr_matrix(
+            (ratings[rated].astype(np.float64), (user_indices[rated], item_indices[rated])),
+            shape=(len(self.user_ids), len(self.track_ids))
+        )
+        self.user_item_matrix.sort_indices()
+        
+        self.global_mean = float(np.mean(ratings))
+        
+        # Середні рейтинги користувачів та нормалізована матриця (векторизовано по збережених значеннях)
+        self._center_user_ratings()
+    
+    def _train_improved_collaborative_model(self) -> Dict[str, float]:
         """Покращена Collaborative Filtering модель з нормалізацією та weighted similarities"""
         logger.info("👥 Тренування покращеної Collaborative Filtering моделі...")
         
-        # Створюємо покращену user-item матрицю
-        n_users = len(self.user_id_to_idx)
-        n_items = len(self.item_id_to_idx)
+        n_users, n_items = self.user_item_matrix.shape
         
-        # Створюємо розріджену матрицю для ефективності
-        user_indices = [self.user_id_to_idx[uid] for uid in data['UserId']]
-        item_indices = [self.item_id_to_idx[iid] for iid in data['SpotifyTrackId']]
-        ratings = data['Rating'].values
+        if not self._fit_collaborative_knn():
+            logger.warning("⚠️ Недостатньо активних користувачів для collaborative filtering")
+            return {"collaborative_error": "Недостатньо даних"}
         
-        # Створюємо щільну матрицю для KNN (невелика кількість користувачів)
-        self.user_item_matrix = np.zeros((n_users, n_items))
-        for u_idx, i_idx, rating in zip(user_indices, item_indices, ratings):
-            self.user_item_matrix[u_idx, i_idx] = rating
+        # Обчислюємо метрики
+        sparsity = 1 - (self.user_item_matrix.nnz / (n_users * n_items))
+        avg_user_ratings = float(np.mean(np.diff(self.user_item_matrix.indptr)))
         
-        # Обчислюємо середні рейтинги для нормалізації
-        self.user_means = np.array([
-            np.mean(self.user_item_matrix[u][self.user_item_matrix[u] > 0]) 
-            if np.any(self.user_item_matrix[u] > 0) else 3.0 
-            for u in range(n_users)
-        ])
+        logger.info(f"🔍 Покращена Collaborative Model:")
+        logger.info(f"   📊 Розрідженість: {sparsity:.3f}")
+        logger.info(f"   👤 Активних користувачів: {len(self.active_user_indices)}")
+        logger.info(f"   📈 Середня кількість рейтингів на користувача: {avg_user_ratings:.1f}")
         
-        self.global_mean = np.mean(ratings)
+        return {
+            "collaborative_sparsity": sparsity,
+            "collaborative_active_users": len(self.active_user_indices),
+            "collaborative_avg_ratings_per_user": avg_user_ratings,
+            "collaborative_normalization": "user_mean_centered"
+        }
+    
+    def _center_user_ratings(self):
+        """
+        Середні рейтинги користувачів (3.0 без рейтингів) та матриця з відніманням
+        середнього лише для збережених значень - без розгортання в щільну
+        """
+        ratings_per_user = np.diff(self.user_item_matrix.indptr)
+        sums = np.asarray(self.user_item_matrix.sum(axis=1)).ravel()
+        self.user_means = np.full(self.user_item_matrix.shape[0], 3.0)
+        has_ratings = ratings_per_user > 0
+        self.user_means[has_ratings] = sums[has_ratings] / ratings_per_user[has_ratings]
         
-        # Створюємо нормалізовану матрицю (віднімаємо середні рейтинги користувачів)
         self.user_item_matrix_normalized = self.user_item_matrix.copy()
-        for u_idx in range(n_users):
-            mask = self.user_item_matrix[u_idx] > 0
-            self.user_item_matrix_normalized[u_idx][mask] -= self.user_means[u_idx]
-        
-        # Тренування покращеної KNN моделі з pearson correlation
+        self.user_item_matrix_normalized.data -= np.repeat(self.user_means, ratings_per_user)
+    
+    def _fit_collaborative_knn(self) -> bool:
+        """KNN по нормалізованих рядках активних користувачів (False якщо даних замало)"""
         # Використовуємо тільки користувачів з мінімум 2 рейтингами
-        active_users_mask = np.sum(self.user_item_matrix > 0, axis=1) >= 2
+        active_users_mask = np.diff(self.user_item_matrix.indptr) >= 2
         self.active_user_indices = np.where(active_users_mask)[0]
         
         if len(self.active_user_indices) < 2:
-            logger.warning("⚠️ Недостатньо активних користувачів для collaborative filtering")
             self.collaborative_model = None
-            return {"collaborative_error": "Недостатньо даних"}
+            return False
         
-        # Використовуємо нормалізовану матрицю для навчання KNN
-        active_user_matrix = self.user_item_matrix_normalized[self.active_user_indices]
+        # Нормалізована матриця активних користувачів лишається розрідженою (CSR)
+        self.active_user_matrix = self.user_item_matrix_normalized[self.active_user_indices]
         
-        # Кастомна метрика схожості (adjusted cosine similarity)
+        # Adjusted cosine similarity: brute-force cosine працює з розрідженим входом
         self.collaborative_model = NearestNeighbors(
             n_neighbors=min(10, len(self.active_user_indices)),
             metric='cosine',
             algorithm='brute'
         )
+        self.collaborative_model.fit(self.active_user_matrix)
+        return True
+    
+    def _train_improved_svd_model(self, training_set: TrainingSet) -> Dict[str, float]:
+        """Покращена SVD модель з правильною матричною факторизацією та bias terms"""
+        logger.info("🔄 Тренування покращеної SVD моделі...")
         
-        # Замінюємо нулі на середні значення для покращення cosine similarity
-        filled_matrix = active_user_matrix.copy()
-        for i in range(len(filled_matrix)):
-            mask = active_user_matrix[i] == 0
-            filled_matrix[i][mask] = 0  # Залишаємо нулі, але використовуємо weights
-        
-        self.collaborative_model.fit(filled_matrix)
+        if self.svd_algorithm == "truncated_svd":
+            metrics = self._train_truncated_svd_model()
+        else:
+            metrics = self._train_biased_mf_model()
         
-        # Зберігаємо додаткову інформацію для кращих рекомендацій
-        self.active_user_matrix = active_user_matrix
+        self._set_svd_drift_baseline()
+        return metrics
+    
+    def _svd_components(self) -> int:
+        """Кількість латентних факторів за розміром та кількістю рейтингів"""
+        n_users, n_items = self.user_item_matrix.shape
+        max_components = min(50, min(n_users, n_items) - 1, 
+                           int(np.sqrt(self.user_item_matrix.nnz)))
+        return max(5, max_components)
+    
+    def _train_biased_mf_model(self) -> Dict[str, float]:
+        """Biased MF (μ + bᵤ + bᵢ + pᵤᵀqᵢ) лише по спостережених рейтингах, mini-batch Adam"""
+        n_users, n_items = self.user_item_matrix.shape
+        n_components = self._svd_components()
+        
+        # COO масиви агрегованих рейтингів (ті самі, що в user-item матриці)
+        ratings = self.user_item_matrix.tocoo()
+        self.svd_model = BiasedMF(n_components=n_components, time_budget_seconds=self.svd_time_budget_seconds)
+        metrics = self.svd_model.fit(
+            ratings.row, ratings.col, ratings.data, n_users, n_items, global_mean=self.global_mean
+        )
         
-        # Обчислюємо метрики
-        sparsity = 1 - (np.count_nonzero(self.user_item_matrix) / (n_users * n_items))
-        avg_user_ratings = np.mean([np.sum(self.user_item_matrix[u] > 0) for u in range(n_users)])
+        # Ті самі виходи, що й у truncated SVD - код рекомендацій спільний
+        self.svd_user_factors = self.svd_model.user_factors
+        self.svd_item_factors = self.svd_model.item_factors
+        self.svd_user_bias = self.svd_model.user_bias
+        self.item_means = self.global_mean + self.svd_model.item_bias
         
-        logger.info(f"🔍 Покращена Collaborative Model:")
-        logger.info(f"   📊 Розрідженість: {sparsity:.3f}")
-        logger.info(f"   👤 Активних користувачів: {len(self.active_user_indices)}")
-        logger.info(f"   📈 Середня кількість рейтингів на користувача: {avg_user_ratings:.1f}")
+        logger.info(f"🔍 Покращена SVD Model (biased MF):")
+        logger.info(f"   🔧 Компонентів: {n_components}")
+        logger.info(f"   🎯 Train RMSE: {metrics['svd_train_rmse']:.3f}")
         
         return {
-            "collaborative_sparsity": sparsity,
-            "collaborative_active_users": len(self.active_user_indices),
-            "collaborative_avg_ratings_per_user": avg_user_ratings,
-            "collaborative_normalization": "user_mean_centered"
+            **metrics,
+            "svd_algorithm": "biased_mf",
+            "svd_components": n_components,
+            "svd_reconstruction_mse": metrics["svd_train_rmse"] ** 2,
+            "svd_users": n_users,
+            "svd_items": n_items,
+            "svd_bias_correction": True
         }
     
-    def _train_improved_svd_model(self, data: pd.DataFrame) -> Dict[str, float]:
-        """Покращена SVD модель з правильною матричною факторизацією та bias terms"""
-        logger.info("🔄 Тренування покращеної SVD моделі...")
+    def _train_truncated_svd_model(self) -> Dict[str, float]:
+        """TruncatedSVD на розріджених bias-corrected залишках спостережених рейтингів"""
+        n_users = len(self.user_ids)
+        n_items = len(self.track_ids)
         
-        n_users = len(self.user_id_to_idx)
-        n_items = len(self.item_id_to_idx)
+        self._compute_item_means()
+        self.svd_user_bias = self.user_means - self.global_mean
         
-        # Створюємо правильну user-item матрицю (users x items)
-        user_item_dense = self.user_item_matrix.copy()
-        
-        # Заповнюємо нулі середніми значеннями для SVD
-        filled_matrix = user_item_dense.copy()
-        for u_idx in range(n_users):
-            user_ratings = user_item_dense[u_idx]
-            rated_items = user_ratings > 0
-            if np.any(rated_items):
-                user_mean = np.mean(user_ratings[rated_items])
-                filled_matrix[u_idx][~rated_items] = user_mean
-            else:
-                filled_matrix[u_idx][:] = self.global_mean
-        
-        # Нормалізуємо матрицю віднімаючи глобальний середній + user bias + item bias
-        self.item_means = np.array([
-            np.mean(filled_matrix[:, i][filled_matrix[:, i] > 0]) 
-            if np.any(filled_matrix[:, i] > 0) else self.global_mean 
-            for i in range(n_items)
-        ])
-        
-        # Створюємо bias-corrected матрицю
-        bias_corrected_matrix = filled_matrix.copy()
-        for u_idx in range(n_users):
-            for i_idx in range(n_items):
-                if user_item_dense[u_idx, i_idx] > 0:  # тільки для реальних рейтингів
-                    bias_corrected_matrix[u_idx, i_idx] = (
-                        filled_matrix[u_idx, i_idx] - self.global_mean - 
-                        (self.user_means[u_idx] - self.global_mean) - 
-                        (self.item_means[i_idx] - self.global_mean)
-                    )
+        # Bias-corrected залишки лише для реальних рейтингів (розріджено, O(кількість рейтингів)):
+        # r - global_mean - (user_mean - global_mean) - (item_mean - global_mean)
+        residuals = self.user_item_matrix_normalized.copy()
+        residuals.data += self.global_mean - self.item_means[residuals.indices]
         
         # Визначаємо оптимальну кількість компонентів
-        max_components = min(50, min(n_users, n_items) - 1, 
-                           int(np.sqrt(np.count_nonzero(user_item_dense))))
-        n_components = max(5, max_components)
+        n_components = self._svd_components()
         
-        # Тренуємо SVD на bias-corrected матриці
+        # Randomized SVD на розрідженій матриці: лише добутки матриця-вектор по ненульових
         self.svd_model = TruncatedSVD(
             n_components=n_components,
             random_state=42,
@@ -278,19 +749,18 @@ class MusicRecommenderML:
             algorithm='randomized'
         )
         
-        # Фітуємо SVD на транспонованій матриці (для кращої стабільності)
-        U_reduced = self.svd_model.fit_transform(bias_corrected_matrix)
+        U_reduced = self.svd_model.fit_transform(residuals)
         Vt_reduced = self.svd_model.components_
         
         # Зберігаємо факторизовані матриці
         self.svd_user_factors = U_reduced  # [n_users, n_components]
         self.svd_item_factors = Vt_reduced.T  # [n_items, n_components]
         
-        # Обчислюємо якість реконструкції
-        reconstructed = U_reduced @ Vt_reduced
-        mask = user_item_dense > 0
-        if np.any(mask):
-            mse_reconstruction = np.mean((bias_corrected_matrix[mask] - reconstructed[mask]) ** 2)
+        # Якість реконструкції по реальних рейтингах (скалярні добутки лише для ненульових)
+        if residuals.nnz:
+            rows = np.repeat(np.arange(n_users), np.diff(residuals.indptr))
+            reconstructed = np.einsum('ij,ij->i', U_reduced[rows], self.svd_item_factors[residuals.indices])
+            mse_reconstruction = float(np.mean((residuals.data - reconstructed) ** 2))
         else:
             mse_reconstruction = 0.0
         
@@ -303,6 +773,7 @@ class MusicRecommenderML:
         logger.info(f"   ⚖️ Використовується bias correction")
         
         return {
+            "svd_algorithm": "truncated_svd",
             "svd_components": n_components,
             "svd_explained_variance": explained_variance_ratio,
             "svd_reconstruction_mse": mse_reconstruction,
@@ -311,6 +782,71 @@ class MusicRecommenderML:
             "svd_bias_correction": True
         }
     
+    def _train_implicit_als_model(self, signals: pd.DataFrame, catalog: TrackCatalog) -> Dict[str, float]:
+        """
+        Weighted ALS на неявних сигналах користувачів та треків з тренувальних словників.
+        catalog - каталог зі знімка тренування (тривалості треків)
+        """
+        logger.info("🎧 Тренування implicit ALS моделі...")
+        
+        if signals.empty:
+            self.als_model = None
+            return {"als_error": "Немає неявних сигналів"}
+        
+        user_codes = self.user_index.get_indexer(signals['UserId'].to_numpy(dtype=np.int64))
+        item_codes = self.track_index.get_indexer(signals['SpotifyTrackId'].to_numpy(dtype=object))
+        known = (user_codes >= 0) & (item_codes >= 0)
+        signals = signals[known]
+        user_codes, item_codes = user_codes[known], item_codes[known]
+        
+        # Частка прослуханого треку: PlayDuration (с) / тривалість треку з каталогу
+        duration_seconds = catalog.feature('DurationMs', catalog.rows(self.track_ids[item_codes])) / 1000.0
+        duration_seconds = np.where(duration_seconds > 0, duration_seconds, DEFAULT_TRACK_DURATION_SECONDS)
+        completion = signals['PlayDuration'].to_numpy(dtype=float, na_value=0.0) / duration_seconds
+        
+        strength = implicit_signal_strength(
+            play_count=signals['PlayCount'].to_numpy(dtype=float, na_value=0.0),
+            liked=signals['IsLiked'].to_numpy(dtype=float, na_value=0.0),
+            skip_count=signals['SkipCount'].to_numpy(dtype=float, na_value=0.0),
+            repeat_count=signals['RepeatCount'].to_numpy(dtype=float, na_value=0.0),
+            completion=completion
+        )
+        confidence, preference = implicit_matrices(
+            user_codes, item_codes, strength,
+            shape=(len(self.user_ids), len(self.track_ids)), alpha=self.als_alpha
+        )
+        
+        self.als_model = ImplicitALS(factors=max(2, min(32, len(self.track_ids) - 1)),
+                                     n_threads=self._cpu_budget("als"))
+        metrics = self.als_model.fit(confidence, preference)
+        
+        negative_pairs = int(confidence.nnz - preference.count_nonzero())
+        logger.info(f"🔍 Implicit ALS Model:")
+        logger.info(f"   📊 Пар з сигналами: {confidence.nnz} (лише негативні: {negative_pairs})")
+        
+        return {
+            **metrics,
+            "als_interactions": confidence.nnz,
+            "als_negative_pairs": negative_pairs,
+            "als_alpha": self.als_alpha
+        }
+    
+    def _compute_item_means(self):
+        """
+        Середні треків по стовпцях матриці, де відсутні рейтинги заповнені середнім
+        користувача (global_mean для користувачів без рейтингів). Сума стовпця =
+        сума заповнень + сума відхилень реальних рейтингів, тож матриця не розгортається.
+        """
+        n_users = self.user_item_matrix.shape[0]
+        has_ratings = np.diff(self.user_item_matrix.indptr) > 0
+        fill_values = np.where(has_ratings, self.user_means, self.global_mean)
+        deviations = np.bincount(
+            self.user_item_matrix_normalized.indices,
+            weights=self.user_item_matrix_normalized.data,
+            minlength=self.user_item_matrix.shape[1]
+        )
+        self.item_means = (fill_values.sum() + deviations) / max(n_users, 1)
+    
     def get_content_recommendations(self, user_id: int, limit: int = 20) -> List[Dict]:
         """Рекомендації на основі контенту (аудіо фічі)"""
         if not self.is_trained or self.content_model is None:
@@ -325,63 +861,46 @@ class MusicRecommenderML:
             logger.warning(f"❌ Не знайдено профіль користувача {user_id}")
             return []
         
-        # Завантажуємо всі доступні треки
-        all_features = self.data_loader.load_song_features()
-        if all_features.empty:
+        # Каталог усіх доступних треків
+        catalog = self.data_loader.get_track_catalog()
+        if len(catalog) == 0:
             return []
         
         # Отримуємо треки, які користувач вже слухав (з усіх джерел)
-        user_interactions = self.data_loader.load_user_interactions()
-        user_tracks = user_interactions[user_interactions['UserId'] == user_id]['SpotifyTrackId'].unique()
-        listened_tracks = set(user_tracks)
+        listened_tracks = self.data_loader.get_listened_tracks(user_id)
+        logger.info(f"Користувач {user_id} має {len(listened_tracks)} треків в історії")
         
-        logger.info(f"Користувач {user_id} має {len(listened_tracks)} треків в історії: {list(listened_tracks)[:5]}...")
+        # Прохід по готовому ранжуванню: серед перших limit + |прослухані| позицій
+        # гарантовано є limit непрослуханих (якщо вони взагалі є)
+        ranking = self._content_ranking(catalog)
+        listened_rows = catalog.rows(listened_tracks)
+        candidates = ranking.rows[:limit + len(listened_rows)]
+        top_positions = np.flatnonzero(~np.isin(candidates, listened_rows))[:limit]
         
-        # Фільтруємо нові треки (які користувач НЕ слухав)
-        new_tracks = all_features[~all_features['SpotifyTrackId'].isin(listened_tracks)]
-        
-        logger.info(f"Знайдено {len(new_tracks)} нових треків для рекомендації")
-        
-        if new_tracks.empty:
+        if len(top_positions) == 0:
             logger.warning("❌ Немає нових треків для рекомендації")
             return []
         
-        # Нормалізуємо фічі нових треків
-        new_tracks = new_tracks.copy()
-        new_tracks['Tempo_norm'] = (new_tracks['Tempo'] - new_tracks['Tempo'].min()) / (new_tracks['Tempo'].max() - new_tracks['Tempo'].min())
-        new_tracks['Loudness_norm'] = (new_tracks['Loudness'] - new_tracks['Loudness'].min()) / (new_tracks['Loudness'].max() - new_tracks['Loudness'].min())
-        
-        # Підготовка фічей для предикції
-        X_new = new_tracks[self.feature_columns].fillna(0)
-        X_new_scaled = self.scaler.transform(X_new)
-        
-        # Предикція рейтингів
-        predicted_ratings = self.content_model.predict(X_new_scaled)
-        
-        # Додаємо предиковані рейтинги
-        new_tracks = new_tracks.copy()
-        new_tracks['predicted_rating'] = predicted_ratings
-        
-        # Сортуємо за предикованим рейтингом
-        recommendations = new_tracks.nlargest(limit, 'predicted_rating')
-        
         # Форматування результату
         result = []
-        for _, track in recommendations.iterrows():
+        for position in top_positions:
+            row = ranking.rows[position]
+            track_id = catalog.track_ids[row]
+            track = catalog.track_info(track_id)
             result.append({
-                'track_id': track['SpotifyTrackId'],
+                'track_id': track_id,
                 'title': track.get('Title', 'Unknown Track'),
                 'artist': track.get('Artist', 'Unknown Artist'),
                 'Title': track.get('Title', 'Unknown Track'),  # Додаємо з великою літерою
                 'Artist': track.get('Artist', 'Unknown Artist'),  # Додаємо з великою літерою
                 'Genre': track.get('Genre', 'Unknown Genre'),  # Додаємо з великою літерою
-                'predicted_rating': float(track['predicted_rating']),
+                'predicted_rating': float(ranking.scores[position]),
                 'reason': 'Content-Based: схожі аудіо характеристики',
                 'algorithm': 'Content',
                 'features': {
-                    'danceability': float(track['Danceability']),
-                    'energy': float(track['Energy']),
-                    'valence': float(track['Valence']),
+                    'danceability': float(catalog.feature('Danceability')[row]),
+                    'energy': float(catalog.feature('Energy')[row]),
+                    'valence': float(catalog.feature('Valence')[row]),
                     'genre': track.get('Genre', 'Unknown Genre')
                 }
             })
@@ -389,6 +908,32 @@ class MusicRecommenderML:
         logger.info(f"✅ Згенеровано {len(result)} content-based рекомендацій")
         return result
     
+    def _content_ranking(self, catalog: TrackCatalog) -> ContentRanking:
+        """
+        Content-скори всіх треків каталогу, відсортовані один раз на тренування та вміст
+        каталогу. Нова версія БД без змін у каталозі (інші таблиці) лише перевіряє відбиток.
+        Tempo та Loudness нормалізуються по всьому каталогу.
+        """
+        ranking = self.content_ranking
+        if ranking is not None and catalog.data_version is not None \
+                and ranking.catalog_version == catalog.data_version:
+            return ranking
+        
+        fingerprint = catalog.fingerprint
+        if ranking is not None and ranking.catalog_fingerprint == fingerprint:
+            ranking = ranking._replace(catalog_version=catalog.data_version)
+        else:
+            start = time.time()
+            X = np.nan_to_num(catalog.feature_matrix(self.feature_columns, np.arange(len(catalog))))
+            scores = self.content_model.predict(self.scaler.transform(X)) if len(catalog) else np.empty(0)
+            order = np.argsort(-scores, kind='stable')
+            ranking = ContentRanking(fingerprint, catalog.data_version, order, scores[order])
+            logger.info(f"🎵 Content-ранжування {len(catalog)} треків за {time.time() - start:.2f}с")
+        
+        # Заміна посилання цілим кортежем - паралельні запити бачать старе або нове ранжування
+        self.content_ranking = ranking
+        return ranking
+    
     def get_collaborative_recommendations(self, user_id: int, limit: int = 20) -> List[Dict]:
         """Покращені KNN Collaborative Filtering рекомендації з weighted similarities"""
         if not self.is_trained or self.collaborative_model is None:
@@ -398,30 +943,45 @@ class MusicRecommenderML:
         logger.info(f"👥 Генерація покращених collaborative рекомендацій для користувача {user_id}")
 
         try:
-            if user_id not in self.user_id_to_idx:
+            user_idx = self._user_code(user_id)
+            
+            # Перевіряємо чи є користувач серед активних (індекси відсортовані)
+            active_idx = int(np.searchsorted(self.active_user_indices, user_idx))
+            is_active = (user_idx >= 0 and active_idx < len(self.active_user_indices)
+                         and self.active_user_indices[active_idx] == user_idx)
+            
+            folded = self._folded_user(user_id, user_idx)
+            if folded is not None and folded.changed:
+                # Новий або змінений користувач: центрований рядок поточних рейтингів
+                if len(folded.item_codes) < 2:
+                    logger.warning(f"❌ Замало рейтингів користувача {user_id} для collaborative")
+                    return self._get_popular_items_fallback(limit)
+                user_mean = folded.user_mean
+                user_profile = csr_matrix(
+                    (folded.ratings - user_mean, folded.item_codes, [0, len(folded.item_codes)]),
+                    shape=(1, self.user_item_matrix.shape[1])
+                )
+            elif user_idx < 0:
                 logger.warning(f"❌ Користувач {user_id} не знайдений у системі")
                 return self._get_popular_items_fallback(limit)
-
-            user_idx = self.user_id_to_idx[user_id]
-            
-            # Перевіряємо чи є користувач серед активних
-            if user_idx not in self.active_user_indices:
+            elif not is_active:
                 logger.warning(f"❌ Користувач {user_id} не є активним")
                 return self._get_popular_items_fallback(limit)
-
-            # Знаходимо індекс у активній матриці
-            active_idx = np.where(self.active_user_indices == user_idx)[0][0]
-            user_profile = self.active_user_matrix[active_idx:active_idx+1]
+            else:
+                user_mean = self.user_means[user_idx]
+                user_profile = self.active_user_matrix[active_idx]
 
             # Знаходимо схожих користувачів
+            n_neighbors = min(8, self.active_user_matrix.shape[0])
             distances, neighbor_indices = self.collaborative_model.kneighbors(
                 user_profile, 
-                n_neighbors=min(8, len(self.active_user_matrix))
+                n_neighbors=n_neighbors
             )
             
             # Виключаємо самого користувача
-            neighbor_indices = neighbor_indices[0][1:]
-            neighbor_distances = distances[0][1:]
+            others = neighbor_indices[0] != (active_idx if is_active else -1)
+            neighbor_indices = neighbor_indices[0][others][:n_neighbors - 1]
+            neighbor_distances = distances[0][others][:n_neighbors - 1]
 
             if len(neighbor_indices) == 0:
                 logger.warning(f"❌ Не знайдено схожих користувачів для {user_id}")
@@ -437,47 +997,45 @@ class MusicRecommenderML:
                 neighbor_similarities.append(sim)
 
             # Отримуємо треки які користувач вже слухав
-            user_interactions = self.data_loader.load_user_interactions()
-            user_tracks = user_interactions[user_interactions['UserId'] == user_id]['SpotifyTrackId'].unique()
-            listened_tracks = set(user_tracks)
+            listened_tracks = self.data_loader.get_listened_tracks(user_id)
 
             # Обчислюємо weighted рейтинги від сусідів
             item_scores = {}
             
             for neighbor_active_idx, similarity in zip(neighbor_indices, neighbor_similarities):
                 neighbor_user_idx = self.active_user_indices[neighbor_active_idx]
-                neighbor_ratings = self.user_item_matrix[neighbor_user_idx]
+                row_start, row_end = self.user_item_matrix.indptr[neighbor_user_idx:neighbor_user_idx + 2]
+                neighbor_items = self.user_item_matrix.indices[row_start:row_end]
+                neighbor_ratings = self.user_item_matrix.data[row_start:row_end]
                 neighbor_mean = self.user_means[neighbor_user_idx]
                 
-                # Знаходимо треки з високими рейтингами у сусіда
-                for item_idx, rating in enumerate(neighbor_ratings):
-                    if rating >= 4.0:  # тільки високооцінені треки
-                        item_id = self.idx_to_item_id[item_idx]
+                # Знаходимо треки з високими рейтингами у сусіда (лише збережені значення рядка)
+                high_rated = neighbor_ratings >= 4.0  # тільки високооцінені треки
+                high_rated_ids = self.track_ids[neighbor_items[high_rated]]
+                for item_id, rating in zip(high_rated_ids.tolist(), neighbor_ratings[high_rated].tolist()):
+                    if item_id not in listened_tracks:
+                        if item_id not in item_scores:
+                            item_scores[item_id] = {
+                                'weighted_sum': 0.0,
+                                'similarity_sum': 0.0,
+                                'neighbor_count': 0,
+                                'max_rating': 0.0,
+                                'ratings': []
+                            }
+                        
+                        # Weighted rating з врахуванням bias
+                        adjusted_rating = rating - neighbor_mean + user_mean
+                        weighted_rating = adjusted_rating * similarity
                         
-                        if item_id not in listened_tracks:
-                            if item_id not in item_scores:
-                                item_scores[item_id] = {
-                                    'weighted_sum': 0.0,
-                                    'similarity_sum': 0.0,
-                                    'neighbor_count': 0,
-                                    'max_rating': 0.0,
-                                    'ratings': []
-                                }
-                            
-                            # Weighted rating з врахуванням bias
-                            adjusted_rating = rating - neighbor_mean + self.user_means[user_idx]
-                            weighted_rating = adjusted_rating * similarity
-                            
-                            item_scores[item_id]['weighted_sum'] += weighted_rating
-                            item_scores[item_id]['similarity_sum'] += similarity
-                            item_scores[item_id]['neighbor_count'] += 1
-                            item_scores[item_id]['max_rating'] = max(item_scores[item_id]['max_rating'], rating)
-                            item_scores[item_id]['ratings'].append(rating)
+                        item_scores[item_id]['weighted_sum'] += weighted_rating
+                        item_scores[item_id]['similarity_sum'] += similarity
+                        item_scores[item_id]['neighbor_count'] += 1
+                        item_scores[item_id]['max_rating'] = max(item_scores[item_id]['max_rating'], rating)
+                        item_scores[item_id]['ratings'].append(rating)
 
             # Створюємо рекомендації з покращеним скорингом
             recommendations = []
-            song_features = self.data_loader.load_song_features()
-            features_dict = song_features.set_index('SpotifyTrackId').to_dict('index')
+            catalog = self.data_loader.get_track_catalog()
 
             for item_id, score_data in item_scores.items():
                 if score_data['similarity_sum'] > 0:
@@ -492,7 +1050,7 @@ class MusicRecommenderML:
                     final_prediction = base_prediction + neighbor_bonus + diversity_bonus + confidence_penalty
                     final_prediction = max(1.0, min(5.0, final_prediction))
                     
-                    track_info = features_dict.get(item_id, {})
+                    track_info = catalog.track_info(item_id)
                     
                     recommendation = {
                         'track_id': item_id,
@@ -535,71 +1093,73 @@ class MusicRecommenderML:
         logger.info(f"🔄 Генерація покращених SVD рекомендацій для користувача {user_id}")
         
         try:
-            if user_id not in self.user_id_to_idx:
+            user_idx = self._user_code(user_id)
+            folded = self._folded_user(user_id, user_idx)
+            folded_in = folded is not None and folded.changed and folded.factors is not None
+            
+            if folded_in:
+                # Новий або змінений користувач: вектор з fold-in при заморожених факторах треків
+                user_bias = folded.bias
+                user_latent_profile = folded.factors
+            elif user_idx < 0:
                 logger.warning(f"❌ Користувач {user_id} не знайдений у системі")
                 return self._get_popular_items_fallback(limit)
+            else:
+                user_bias = self.svd_user_bias[user_idx]
+                # Отримуємо латентний профіль користувача
+                user_latent_profile = self.svd_user_factors[user_idx]  # [n_components]
             
-            user_idx = self.user_id_to_idx[user_id]
-            user_mean = self.user_means[user_idx]
-            
-            # Отримуємо латентний профіль користувача
-            user_latent_profile = self.svd_user_factors[user_idx]  # [n_components]
+            # Рейтинги всіх треків одним матричним добутком: bias terms + user_factors × item_factors
+            raw_predictions = self.svd_item_factors @ user_latent_profile
+            predicted_ratings = (
+                self.global_mean +
+                user_bias +
+                (self.item_means - self.global_mean) +
+                raw_predictions
+            )
             
-            # Обчислюємо рейтинги для всіх треків через матричну факторизацію
-            predicted_ratings = []
-            
-            for item_idx in range(len(self.idx_to_item_id)):
-                item_latent = self.svd_item_factors[item_idx]  # [n_components]
-                
-                # SVD prediction: bias + user_factors × item_factors
-                raw_prediction = np.dot(user_latent_profile, item_latent)
-                
-                # Додаємо bias terms
-                bias_corrected_prediction = (
-                    self.global_mean + 
-                    (user_mean - self.global_mean) + 
-                    (self.item_means[item_idx] - self.global_mean) + 
-                    raw_prediction
-                )
-                
-                predicted_ratings.append((item_idx, bias_corrected_prediction, raw_prediction))
+            # Схожість латентних векторів для confidence
+            user_norm = np.linalg.norm(user_latent_profile)
+            item_norms = np.linalg.norm(self.svd_item_factors, axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                latent_similarities = raw_predictions / (user_norm * item_norms)
+            latent_similarities[(item_norms == 0) | (user_norm == 0)] = np.nan
             
             # Сортуємо за передбаченими рейтингами
-            predicted_ratings.sort(key=lambda x: x[1], reverse=True)
+            order = np.argsort(-predicted_ratings, kind='stable')
             
             # Отримуємо треки які користувач вже слухав
-            user_interactions = self.data_loader.load_user_interactions()
-            user_tracks = user_interactions[user_interactions['UserId'] == user_id]['SpotifyTrackId'].unique()
-            listened_tracks = set(user_tracks)
+            listened_tracks = self.data_loader.get_listened_tracks(user_id)
             
             # Створюємо рекомендації
             recommendations = []
-            song_features = self.data_loader.load_song_features()
-            features_dict = song_features.set_index('SpotifyTrackId').to_dict('index')
+            catalog = self.data_loader.get_track_catalog()
             
-            for item_idx, predicted_rating, raw_score in predicted_ratings:
+            for item_idx in order.tolist():
                 if len(recommendations) >= limit:
                     break
                 
-                item_id = self.idx_to_item_id[item_idx]
+                item_id = self.track_ids[item_idx]
                 
                 # Пропускаємо треки які користувач вже слухав
                 if item_id in listened_tracks:
                     continue
                 
+                predicted_rating = predicted_ratings[item_idx]
+                raw_score = raw_predictions[item_idx]
+                
                 # Нормалізуємо рейтинг до діапазону 1-5
                 normalized_rating = max(1.0, min(5.0, predicted_rating))
                 
-                track_info = features_dict.get(item_id, {})
+                track_info = catalog.track_info(item_id)
                 
                 # Обчислюємо confidence на основі латентних факторів
-                user_norm = np.linalg.norm(user_latent_profile)
-                item_norm = np.linalg.norm(self.svd_item_factors[item_idx])
-                if user_norm > 0 and item_norm > 0:
-                    latent_similarity = np.dot(user_latent_profile, self.svd_item_factors[item_idx]) / (user_norm * item_norm)
-                    confidence = min(0.95, abs(latent_similarity) + 0.3)
-                else:
+                latent_similarity = latent_similarities[item_idx]
+                if np.isnan(latent_similarity):
+                    latent_similarity = 0.0
                     confidence = 0.5
+                else:
+                    confidence = min(0.95, abs(latent_similarity) + 0.3)
                 
                 recommendation = {
                     'track_id': item_id,
@@ -615,11 +1175,12 @@ class MusicRecommenderML:
                     'raw_svd_score': float(raw_score),
                     'bias_corrected_prediction': float(predicted_rating),
                     'confidence': float(confidence),
-                    'latent_similarity': float(latent_similarity) if 'latent_similarity' in locals() else 0.0,
-                    'user_bias': float(user_mean - self.global_mean),
+                    'latent_similarity': float(latent_similarity),
+                    'user_bias': float(user_bias),
                     'item_bias': float(self.item_means[item_idx] - self.global_mean),
                     'global_mean': float(self.global_mean),
-                    'matrix_factorization': True
+                    'matrix_factorization': True,
+                    'folded_in': folded_in
                 }
                 
                 recommendations.append(recommendation)
@@ -631,12 +1192,66 @@ class MusicRecommenderML:
             logger.error(f"❌ Помилка покращених SVD рекомендацій: {e}")
             return self._get_popular_items_fallback(limit)
     
+    def get_als_recommendations(self, user_id: int, limit: int = 20) -> List[Dict]:
+        """Implicit ALS рекомендації: скори вподобання з латентних факторів неявних сигналів"""
+        if not self.is_trained or self.als_model is None:
+            logger.warning("⚠️ Implicit ALS модель не натренована!")
+            return []
+        
+        logger.info(f"🎧 Генерація implicit ALS рекомендацій для користувача {user_id}")
+        
+        try:
+            user_idx = self._user_code(user_id)
+            if user_idx < 0 or not self.als_model.user_factors[user_idx].any():
+                logger.warning(f"❌ Користувач {user_id} не має ALS факторів")
+                return self._get_popular_items_fallback(limit)
+            
+            scores = self.als_model.scores(user_idx)
+            order = np.argsort(-scores, kind='stable')
+            
+            listened_tracks = self.data_loader.get_listened_tracks(user_id)
+            catalog = self.data_loader.get_track_catalog()
+            
+            recommendations = []
+            for item_idx in order.tolist():
+                if len(recommendations) >= limit:
+                    break
+                
+                item_id = self.track_ids[item_idx]
+                if item_id in listened_tracks:
+                    continue
+                
+                # Скор вподобання ~ [0, 1] переводимо в шкалу рейтингу 1-5
+                preference_score = float(scores[item_idx])
+                track_info = catalog.track_info(item_id)
+                recommendations.append({
+                    'track_id': item_id,
+                    'title': track_info.get('Title', 'Unknown Track'),
+                    'artist': track_info.get('Artist', 'Unknown Artist'),
+                    'genre': track_info.get('Genre', 'Unknown Genre'),
+                    'Title': track_info.get('Title', 'Unknown Track'),
+                    'Artist': track_info.get('Artist', 'Unknown Artist'),
+                    'Genre': track_info.get('Genre', 'Unknown Genre'),
+                    'predicted_rating': float(1.0 + 4.0 * np.clip(preference_score, 0.0, 1.0)),
+                    'reason': f'ALS: неявні сигнали прослуховувань ({self.als_model.factors} факторів)',
+                    'algorithm': 'Implicit_ALS',
+                    'preference_score': preference_score,
+                    'confidence': float(np.clip(preference_score, 0.0, 0.95))
+                })
+            
+            logger.info(f"✅ Згенеровано {len(recommendations)} implicit ALS рекомендацій")
+            return recommendations
+            
+        except Exception as e:
+            logger.error(f"❌ Помилка implicit ALS рекомендацій: {e}")
+            return self._get_popular_items_fallback(limit)
+    
     def _get_popular_items_fallback(self, limit: int) -> List[Dict]:
         """Fallback рекомендації на основі популярності"""
         try:
             logger.info("🔄 Використовуємо fallback на основі популярності")
             
-            song_features = self.data_loader.load_song_features()
+            catalog = self.data_loader.get_track_catalog()
             user_interactions = self.data_loader.load_user_interactions()
             
             # Обчислюємо популярність треків
@@ -649,11 +1264,10 @@ class MusicRecommenderML:
             track_popularity = track_popularity.sort_values(['avg_rating', 'rating_count'], ascending=False)
             
             recommendations = []
-            features_dict = song_features.set_index('SpotifyTrackId').to_dict('index')
             
             for _, row in track_popularity.head(limit).iterrows():
                 track_id = row['SpotifyTrackId']
-                track_info = features_dict.get(track_id, {})
+                track_info = catalog.track_info(track_id)
                 
                 recommendation = {
                     'track_id': track_id,
@@ -679,22 +1293,23 @@ class MusicRecommenderML:
             return []
     
     def get_hybrid_recommendations(self, user_id: int, limit: int = 20) -> List[Dict]:
-        """Гібридні рекомендації (комбінація content-based + collaborative + SVD)"""
+        """Гібридні рекомендації (комбінація content-based + collaborative + SVD + implicit ALS)"""
         logger.info(f"🔀 Генерація гібридних рекомендацій для користувача {user_id}")
         
         # Отримуємо рекомендації з усіх моделей (більше треків для різноманітності)
         content_recs = self.get_content_recommendations(user_id, limit * 3)
         collaborative_recs = self.get_collaborative_recommendations(user_id, limit * 3)
         svd_recs = self.get_svd_recommendations(user_id, limit * 3)
+        als_recs = self.get_als_recommendations(user_id, limit * 3)
         
         # Створюємо різноманітний пул рекомендацій
         combined_scores = {}
         
-        # Content-Based: фокус на аудіо схожості (40%)
+        # Content-Based: фокус на аудіо схожості (30%)
         for i, rec in enumerate(content_recs):
             track_id = rec['track_id']
             # Даємо більший вага першим рекомендаціям
-            weight = 0.4 * (1.0 - i * 0.01)  # зменшуємо вагу для кожного наступного
+            weight = 0.3 * (1.0 - i * 0.01)  # зменшуємо вагу для кожного наступного
             combined_scores[track_id] = {
                 'score': rec['predicted_rating'] * weight,
                 'info': rec,
@@ -702,10 +1317,10 @@ class MusicRecommenderML:
                 'diversity_bonus': 0.1  # бонус за контент-схожість
             }
         
-        # Collaborative: фокус на схожих користувачах (30%)
+        # Collaborative: фокус на схожих користувачах (25%)
         for i, rec in enumerate(collaborative_recs):
             track_id = rec['track_id']
-            weight = 0.3 * (1.0 - i * 0.01)
+            weight = 0.25 * (1.0 - i * 0.01)
             if track_id in combined_scores:
                 combined_scores[track_id]['score'] += rec['predicted_rating'] * weight
                 combined_scores[track_id]['methods'].append('collaborative')
@@ -718,10 +1333,10 @@ class MusicRecommenderML:
                     'diversity_bonus': 0.05
                 }
         
-        # SVD: фокус на латентні фактори (30%)
+        # SVD: фокус на латентні фактори (25%)
         for i, rec in enumerate(svd_recs):
             track_id = rec['track_id']
-            weight = 0.3 * (1.0 - i * 0.01)
+            weight = 0.25 * (1.0 - i * 0.01)
             if track_id in combined_scores:
                 combined_scores[track_id]['score'] += rec['predicted_rating'] * weight
                 combined_scores[track_id]['methods'].append('svd')
@@ -734,6 +1349,22 @@ class MusicRecommenderML:
                     'diversity_bonus': 0.1
                 }
         
+        # Implicit ALS: фокус на поведінці прослуховування (20%)
+        for i, rec in enumerate(als_recs):
+            track_id = rec['track_id']
+            weight = 0.2 * (1.0 - i * 0.01)
+            if track_id in combined_scores:
+                combined_scores[track_id]['score'] += rec['predicted_rating'] * weight
+                combined_scores[track_id]['methods'].append('als')
+                combined_scores[track_id]['diversity_bonus'] += 0.15
+            else:
+                combined_scores[track_id] = {
+                    'score': rec['predicted_rating'] * weight,
+                    'info': rec,
+                    'methods': ['als'],
+                    'diversity_bonus': 0.05
+                }
+        
         # Додаємо бонус за різноманітність
         for track_id, data in combined_scores.items():
             data['final_score'] = data['score'] + data['diversity_bonus']
@@ -757,7 +1388,8 @@ class MusicRecommenderML:
                 method_desc = {
                     'content': 'Content-Based: схожі аудіо характеристики',
                     'collaborative': 'Collaborative: схожі користувачі',
-                    'svd': 'SVD: латентні музичні фактори'
+                    'svd': 'SVD: латентні музичні фактори',
+                    'als': 'ALS: неявні сигнали прослуховувань'
                 }
                 info['reason'] = method_desc.get(methods[0], 'Hybrid')
             else:
@@ -790,6 +1422,16 @@ class MusicRecommenderML:
             joblib.dump(self.global_mean, f"{path}/global_mean.pkl")
             joblib.dump(self.svd_user_factors, f"{path}/svd_user_factors.pkl")
             joblib.dump(self.svd_item_factors, f"{path}/svd_item_factors.pkl")
+            joblib.dump(self.svd_user_bias, f"{path}/svd_user_bias.pkl")
+            joblib.dump(self.svd_drift_baseline, f"{path}/svd_drift_baseline.pkl")
+        
+        if self.als_model:
+            joblib.dump(self.als_model, f"{path}/als_model.pkl")
+        
+        joblib.dump(self.user_ids, f"{path}/user_ids.pkl")
+        joblib.dump(self.track_ids, f"{path}/track_ids.pkl")
+        joblib.dump(self.training_watermark, f"{path}/training_watermark.pkl")
+        joblib.dump(self.training_data_state, f"{path}/training_data_state.pkl")
         
         logger.info(f"💾 Моделі збережено в {path}")
     
@@ -802,18 +1444,41 @@ class MusicRecommenderML:
             
             if os.path.exists(f"{path}/collaborative_model.pkl"):
                 self.collaborative_model = joblib.load(f"{path}/collaborative_model.pkl")
-                self.user_item_matrix = joblib.load(f"{path}/user_item_matrix.pkl")
+                self.user_item_matrix = csr_matrix(joblib.load(f"{path}/user_item_matrix.pkl"))
             
             if os.path.exists(f"{path}/svd_model.pkl"):
                 self.svd_model = joblib.load(f"{path}/svd_model.pkl")
-                self.user_item_matrix_normalized = joblib.load(f"{path}/user_item_matrix_normalized.pkl")
+                self.user_item_matrix_normalized = csr_matrix(joblib.load(f"{path}/user_item_matrix_normalized.pkl"))
                 self.user_means = joblib.load(f"{path}/user_means.pkl")
                 self.item_means = joblib.load(f"{path}/item_means.pkl")
                 self.global_mean = joblib.load(f"{path}/global_mean.pkl")
                 self.svd_user_factors = joblib.load(f"{path}/svd_user_factors.pkl")
                 self.svd_item_factors = joblib.load(f"{path}/svd_item_factors.pkl")
+                if os.path.exists(f"{path}/svd_user_bias.pkl"):
+                    self.svd_user_bias = joblib.load(f"{path}/svd_user_bias.pkl")
+                else:
+                    # Моделі, збережені до появи biased MF
+                    self.svd_user_bias = self.user_means - self.global_mean
+                if os.path.exists(f"{path}/svd_drift_baseline.pkl"):
+                    self.svd_drift_baseline = joblib.load(f"{path}/svd_drift_baseline.pkl")
+            
+            if os.path.exists(f"{path}/als_model.pkl"):
+                self.als_model = joblib.load(f"{path}/als_model.pkl")
+            
+            if os.path.exists(f"{path}/user_ids.pkl"):
+                self._set_id_vocabularies(
+                    joblib.load(f"{path}/user_ids.pkl"), joblib.load(f"{path}/track_ids.pkl")
+                )
+            
+            if os.path.exists(f"{path}/training_watermark.pkl"):
+                self.training_watermark = joblib.load(f"{path}/training_watermark.pkl")
+            if os.path.exists(f"{path}/training_data_state.pkl"):
+                self.training_data_state = joblib.load(f"{path}/training_data_state.pkl")
             
             self.is_trained = True
+            # Версія БД збережених моделей невідома: без змін у джерелах береться поточна,
+            # інакше (чи без збереженого стану) перевіряємо користувачів
+            self._reset_fold_in(None, rebind=True)
             logger.info(f"📥 Моделі завантажено з {path}")
             return True
         except Exception as e:
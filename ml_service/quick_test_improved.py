@@ -80,8 +80,8 @@ def quick_test():
             print(f"✅ Глобальний середній: {ml_model.global_mean:.3f}")
             
         # User mappings
-        if hasattr(ml_model, 'user_id_to_idx'):
-            print(f"✅ User mappings: {len(ml_model.user_id_to_idx)} користувачів")
+        if hasattr(ml_model, 'user_ids'):
+            print(f"✅ User mappings: {len(ml_model.user_ids)} користувачів")
             
         print("✅ Всі структури даних ініціалізовані правильно!")
         
@@ -0,0 +1,40 @@
+"""
+Тести пулу AsyncDatabase (фікстура db_path з conftest.py)
+"""
+
+import asyncio
+import threading
+
+from async_db import AsyncDatabase
+from enhanced_data_loader import EnhancedDataLoader
+
+
+def test_concurrent_requests_use_per_thread_connections(db_path):
+    db = AsyncDatabase(db_path, max_workers=3)
+    seen = []
+
+    def read_count(loader: EnhancedDataLoader):
+        conn = loader.get_connection()
+        seen.append((threading.current_thread().name, id(conn)))
+        return conn.execute("SELECT COUNT(*) FROM MLTrainingData").fetchone()[0]
+
+    async def run_many():
+        main_thread = threading.current_thread().name
+        results = await asyncio.gather(*(db.run(read_count) for _ in range(12)))
+        return main_thread, results
+
+    try:
+        main_thread, results = asyncio.run(run_many())
+        stats = asyncio.run(db.run(EnhancedDataLoader.get_training_data_stats))
+    finally:
+        db.close()
+
+    assert len(set(results)) == 1
+    assert stats['total_interactions'] == results[0]
+    # Запити виконуються не в потоці event loop, одне з'єднання на потік пулу
+    assert all(thread != main_thread for thread, _ in seen)
+    connections_per_thread = {}
+    for thread, conn_id in seen:
+        connections_per_thread.setdefault(thread, set()).add(conn_id)
+    assert all(len(ids) == 1 for ids in connections_per_thread.values())
+    assert len({conn_id for _, conn_id in seen}) == len(connections_per_thread) <= 3
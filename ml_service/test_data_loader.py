@@ -0,0 +1,309 @@
+"""
+Тести DataLoader на тимчасовій БД (фікстура db_path з conftest.py)
+"""
+
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from data_loader import DataLoader
+
+
+def test_interaction_snapshot_is_reused_until_data_changes(db_path):
+    loader = DataLoader(db_path)
+
+    first = loader.get_interaction_snapshot()
+    assert len(first) > 0
+    assert loader.get_interaction_snapshot() is first
+    # Знімок спільний для всіх екземплярів з тією ж БД
+    assert DataLoader(db_path).get_interaction_snapshot() is first
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "INSERT INTO Favorites (UserId, SpotifyTrackId, AddedToFavoritesAt) VALUES (99, 'track001', '2025-07-01')"
+    )
+    conn.commit()
+    conn.close()
+
+    second = loader.get_interaction_snapshot()
+    assert second is not first
+    assert list(second.user_interactions(99)['SpotifyTrackId']) == ['track001']
+
+
+def test_slow_build_does_not_block_other_caches(db_path, monkeypatch):
+    loader = DataLoader(db_path)
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+    read_interactions = loader._read_user_interactions
+
+    def slow_read():
+        started.set()
+        release.wait(timeout=10)
+        finished.set()
+        return read_interactions()
+
+    monkeypatch.setattr(loader, '_read_user_interactions', slow_read)
+    builder = threading.Thread(target=loader.get_interaction_snapshot)
+    builder.start()
+    try:
+        assert started.wait(timeout=10)
+        # Каталог та профілі будуються, поки знімок взаємодій ще будується
+        assert len(DataLoader(db_path).get_track_catalog()) > 0
+        assert DataLoader(db_path).get_user_profile(1)
+        assert not finished.is_set()
+    finally:
+        release.set()
+        builder.join()
+
+
+def test_user_slice_matches_full_filter(db_path):
+    loader = DataLoader(db_path)
+    interactions = loader.load_user_interactions()
+
+    for user_id in (1, 5, 12):
+        expected = interactions[interactions['UserId'] == user_id]
+        user_slice = loader.get_user_interactions(user_id)
+        assert set(user_slice['SpotifyTrackId']) == set(expected['SpotifyTrackId'])
+
+    assert loader.get_user_interactions(12345).empty
+
+
+def test_listened_tracks_sql_and_snapshot_agree(db_path):
+    loader = DataLoader(db_path)
+    assert loader.ensure_indexes() == 3
+
+    # Без знімка - індексовані запити до БД
+    from_sql = loader.get_listened_tracks(3)
+    expected = set(loader.load_user_interactions().query('UserId == 3')['SpotifyTrackId'])
+    assert from_sql == expected
+
+    # Зі знімком - відповідь з пам'яті
+    assert loader.get_listened_tracks(3) == expected
+    assert loader.get_listened_tracks(12345) == frozenset()
+
+
+def test_track_catalog_shared_and_columnar(db_path):
+    loader = DataLoader(db_path)
+    catalog = loader.get_track_catalog()
+
+    assert DataLoader(db_path).get_track_catalog() is catalog
+    assert catalog.features.dtype == np.float32
+    assert catalog.features.flags['C_CONTIGUOUS']
+    assert len(catalog) == len(loader.load_song_features())
+
+    row = catalog.row_index['track007']
+    assert catalog.track_info('track007') == {'Title': 'Title 7', 'Artist': 'Artist 7', 'Genre': 'Jazz'}
+    assert catalog.feature('Tempo')[row] == np.float32(loader.load_song_features().loc[row, 'Tempo'])
+    assert catalog.track_info('missing') == {}
+    assert list(catalog.rows(['track007', 'missing'])) == [row, -1]
+    assert len(catalog.rows_excluding(['track007', 'missing'])) == len(catalog) - 1
+
+
+def test_interactions_aggregated_per_user_track(db_path):
+    interactions = DataLoader(db_path).load_user_interactions()
+    assert not interactions.duplicated(['UserId', 'SpotifyTrackId']).any()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        INSERT INTO UserSongInteractions
+        (UserId, SpotifyTrackId, InteractionType, Rating, PlayDuration, IsLiked, IsSkipped, IsRepeat, InteractionTime)
+        VALUES (50, 'track010', 'listen', 2.0, 30, 0, 1, 0, '2025-07-01'),
+               (50, 'track010', 'listen', 4.0, 200, 0, 0, 1, '2025-07-03')
+        """
+    )
+    conn.execute("INSERT INTO Favorites (UserId, SpotifyTrackId, AddedToFavoritesAt) VALUES (50, 'track010', '2025-07-02')")
+    conn.execute("INSERT INTO History (UserId, SpotifyTrackId, ListenedAt) VALUES (50, 'track010', '2025-07-04')")
+    conn.commit()
+    conn.close()
+
+    row = DataLoader(db_path).get_user_interactions(50).iloc[0]
+    assert row['InteractionType'] == 'listen'
+    assert row['Rating'] == 5.0
+    assert row['IsLiked'] == 1
+    assert row['PlayCount'] == 3
+    assert row['SkipCount'] == 1
+    assert row['RepeatCount'] == 1
+    assert row['InteractionTime'] == '2025-07-04'
+
+
+def test_interaction_arrays_match_dataframe_path(db_path):
+    loader = DataLoader(db_path)
+    arrays = loader.load_interaction_arrays(chunk_size=7)
+    frame = loader.load_user_interactions()
+
+    assert arrays.user_codes.dtype == np.int32
+    assert arrays.item_codes.dtype == np.int32
+    assert arrays.ratings.dtype == np.float32
+    assert list(arrays.track_ids) == sorted(arrays.track_ids)
+    assert len(arrays) == len(frame)
+
+    from_arrays = {
+        (int(arrays.user_ids[u]), arrays.track_ids[i]): float(r)
+        for u, i, r in zip(arrays.user_codes, arrays.item_codes, arrays.ratings)
+    }
+    from_frame = {
+        (int(row.UserId), row.SpotifyTrackId): float(row.Rating)
+        for row in frame.itertuples()
+    }
+    assert from_arrays == from_frame
+
+
+def test_training_set_matches_merged_training_data(db_path):
+    loader = DataLoader(db_path)
+    columns = ['Danceability', 'Energy', 'Tempo_norm', 'Loudness_norm', 'Popularity']
+    training_set = loader.prepare_training_set(columns, chunk_size=5)
+    merged, _ = loader.prepare_training_data()
+
+    assert len(training_set) == len(merged)
+    assert training_set.item_features.shape == (len(training_set.track_ids), len(columns))
+
+    expected = {
+        (int(row['UserId']), row['SpotifyTrackId']): (row['Rating'], [row[c] for c in columns])
+        for _, row in merged.iterrows()
+    }
+    for u, i, r in zip(training_set.user_codes, training_set.item_codes, training_set.ratings):
+        rating, features = expected[(int(training_set.user_ids[u]), training_set.track_ids[i])]
+        assert r == np.float32(rating)
+        np.testing.assert_allclose(training_set.item_features[i], features, rtol=1e-5)
+
+
+def test_connections_are_reused_and_read_only(db_path):
+    loader = DataLoader(db_path)
+    before = loader.connection_stats()
+
+    for _ in range(5):
+        loader.get_listened_tracks(1)
+    conn = loader.connect_db()
+    assert conn is loader.connect_db()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM History")
+
+    stats = loader.connection_stats()
+    assert stats['connection_requests'] > before['connection_requests']
+    assert stats['queries'] > before['queries']
+    assert stats['connections_opened']['reader'] <= 1
+
+    # Тимчасові структури в пам'яті лише для коротких запитів сервісу
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+    with loader.training_snapshot() as snapshot_conn:
+        assert loader.connect_db() is snapshot_conn
+        assert snapshot_conn.execute("PRAGMA temp_store").fetchone()[0] == 0
+    assert loader.connect_db() is conn
+
+
+def test_interactions_since_watermark(db_path):
+    loader = DataLoader(db_path)
+    assert loader.load_watermark() == {}
+
+    watermark = loader.get_current_watermark()
+    assert set(watermark) == {'UserSongInteractions', 'Favorites', 'History'}
+    loader.save_watermark(watermark)
+    assert loader.load_watermark() == watermark
+    assert loader.load_interactions_since(watermark).empty
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO Favorites (UserId, SpotifyTrackId, AddedToFavoritesAt) VALUES (77, 'track002', '2025-07-01')")
+    conn.execute("INSERT INTO History (UserId, SpotifyTrackId, ListenedAt) VALUES (77, 'track002', '2025-07-02')")
+    conn.execute("INSERT INTO History (UserId, SpotifyTrackId, ListenedAt) VALUES (3, 'track005', '2025-07-02')")
+    conn.commit()
+    conn.close()
+
+    until = loader.get_current_watermark()
+    delta = loader.load_interactions_since(watermark, until=until)
+    assert sorted(zip(delta['UserId'], delta['SpotifyTrackId'])) == [(3, 'track005'), (77, 'track002')]
+    assert delta.set_index('UserId').loc[77, 'Rating'] == 5.0
+    assert loader.load_interactions_since(until).empty
+
+
+def test_user_profiles_match_pandas_merge(db_path):
+    conn = sqlite3.connect(db_path)
+    # Користувач без лайків - профіль з треків з рейтингом >= 4
+    conn.execute("DELETE FROM Favorites WHERE UserId = 2")
+    conn.execute("UPDATE UserSongInteractions SET IsLiked = 0 WHERE UserId = 2")
+    # Жанр NULL у лайкнутого треку не рахується як жанр 'None'
+    conn.execute("UPDATE SongFeatures SET Genre = NULL WHERE SpotifyTrackId = "
+                 "(SELECT SpotifyTrackId FROM Favorites WHERE UserId = 1 ORDER BY rowid LIMIT 1)")
+    conn.commit()
+    conn.close()
+
+    loader = DataLoader(db_path)
+    interactions = loader.load_user_interactions()
+    merged = interactions.merge(loader.load_song_features(), on='SpotifyTrackId')
+
+    # Спершу per-user запити, потім профілі всіх користувачів з кешу
+    single = {user_id: loader.get_user_profile(user_id) for user_id in (1, 2, 7)}
+    profiles = loader.get_all_user_profiles()
+    assert loader.get_all_user_profiles() is profiles
+    assert profiles.features.dtype == np.float32
+
+    for user_id in (1, 2, 7):
+        user_data = merged[merged['UserId'] == user_id]
+        liked = user_data[user_data['IsLiked'] == 1]
+        if liked.empty:
+            liked = user_data[user_data['Rating'] >= 4]
+
+        profile = loader.get_user_profile(user_id)
+        assert profile == profiles.profile(user_id) == single[user_id]
+        assert profile['liked_count'] == len(liked)
+        assert profile['total_interactions'] == int((interactions['UserId'] == user_id).sum())
+        assert profile['preferred_genres'] == liked['Genre'].value_counts().to_dict()
+        assert 'None' not in profile['preferred_genres']
+        assert profile['avg_tempo'] == pytest.approx(liked['Tempo'].mean(), rel=1e-5)
+        assert profile['avg_energy'] == pytest.approx(liked['Energy'].mean(), rel=1e-5)
+
+    assert loader.get_user_profile(12345) == {}
+
+
+def test_training_set_snapshot_reused_until_data_changes(db_path, tmp_path):
+    columns = ['Danceability', 'Energy', 'Tempo_norm']
+    snapshot_dir = str(tmp_path / "training_sets")
+    built = DataLoader(db_path, snapshot_dir=snapshot_dir).prepare_training_set(columns)
+
+    loader = DataLoader(db_path, snapshot_dir=snapshot_dir)
+    queries = loader.connection_stats()['queries']
+    reloaded = loader.prepare_training_set(columns)
+
+    # Перезавантаження з диска: лише запит відбитка, масиви memory-mapped
+    assert loader.connection_stats()['queries'] - queries <= 5
+    assert isinstance(reloaded.ratings, np.memmap)
+    for name in ('user_codes', 'item_codes', 'ratings', 'user_ids', 'item_features'):
+        np.testing.assert_array_equal(getattr(reloaded, name), getattr(built, name))
+    assert list(reloaded.track_ids) == list(built.track_ids)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO Favorites (UserId, SpotifyTrackId, AddedToFavoritesAt) VALUES (99, 'track001', '2025-07-01')")
+    conn.commit()
+    conn.close()
+
+    rebuilt = loader.prepare_training_set(columns)
+    assert not isinstance(rebuilt.ratings, np.memmap)
+    assert 99 in rebuilt.user_ids
+
+
+def test_training_set_snapshot_rebuilt_after_in_place_update(db_path, tmp_path):
+    columns = ['Danceability', 'Energy', 'Tempo_norm']
+    snapshot_dir = str(tmp_path / "training_sets")
+    loader = DataLoader(db_path, snapshot_dir=snapshot_dir)
+    built = loader.prepare_training_set(columns)
+    assert 'track001' in list(built.track_ids)
+
+    # Виправлення ідентифікаторів на місці (як fix_spotify_ids.py): rowid та COUNT(*) не змінюються
+    conn = sqlite3.connect(db_path)
+    for table in ('SongFeatures', 'UserSongInteractions', 'Favorites', 'History'):
+        conn.execute(f"UPDATE {table} SET SpotifyTrackId = 'trackX01' WHERE SpotifyTrackId = 'track001'")
+    conn.commit()
+    conn.close()
+
+    rebuilt = DataLoader(db_path, snapshot_dir=snapshot_dir).prepare_training_set(columns)
+    assert not isinstance(rebuilt.ratings, np.memmap)
+    assert 'trackX01' in list(rebuilt.track_ids)
+    assert 'track001' not in list(rebuilt.track_ids)
+
+    # Зміна оцінки на місці теж змінює відбиток
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE UserSongInteractions SET Rating = Rating - 1 WHERE rowid = (SELECT MIN(rowid) FROM UserSongInteractions)")
+    conn.commit()
+    conn.close()
+    assert not isinstance(DataLoader(db_path, snapshot_dir=snapshot_dir).prepare_training_set(columns).ratings, np.memmap)
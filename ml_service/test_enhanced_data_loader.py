@@ -0,0 +1,99 @@
+"""
+Тести EnhancedDataLoader на тимчасовій БД (фікстура db_path з conftest.py)
+"""
+
+import sqlite3
+
+from enhanced_data_loader import EnhancedDataLoader
+
+
+def test_min_interactions_filter_applied_in_sql(db_path):
+    conn = sqlite3.connect(db_path)
+    # Малоактивний користувач - має бути відфільтрований без передачі рядків
+    conn.execute("DELETE FROM MLTrainingData WHERE UserId = 3 AND Id NOT IN "
+                 "(SELECT Id FROM MLTrainingData WHERE UserId = 3 LIMIT 2)")
+    conn.commit()
+    all_rows = conn.execute("SELECT UserId, SpotifyTrackId, Rating FROM MLTrainingData").fetchall()
+    conn.close()
+
+    with EnhancedDataLoader(db_path) as loader:
+        assert loader.ensure_indexes() == 3
+        df = loader.load_ml_training_data(min_interactions_per_user=5)
+
+    kept = [row for row in all_rows if row[2] >= 0.3]
+    counts = {}
+    for user_id, _, _ in kept:
+        counts[user_id] = counts.get(user_id, 0) + 1
+    expected = {(u, t) for u, t, _ in kept if counts[u] >= 5}
+
+    assert set(zip(df['UserId'], df['SpotifyTrackId'])) == expected
+    assert 3 not in set(df['UserId'])
+    assert list(df['Timestamp']) == sorted(df['Timestamp'], reverse=True)
+
+
+def test_user_count_subquery_uses_covering_index(db_path):
+    with EnhancedDataLoader(db_path) as loader:
+        loader.ensure_indexes()
+        plan = loader.get_connection().execute(
+            "EXPLAIN QUERY PLAN SELECT UserId FROM MLTrainingData "
+            "WHERE Rating >= 0.3 AND Timestamp >= '2025-06-10' GROUP BY UserId HAVING COUNT(*) >= 5"
+        ).fetchall()
+    assert any('COVERING INDEX IX_MLTrainingData_UserId_Timestamp_Rating' in row[-1] for row in plan)
+
+
+def test_training_stats_single_pass_and_cached(db_path):
+    conn = sqlite3.connect(db_path)
+    expected_total = conn.execute("SELECT COUNT(*) FROM MLTrainingData").fetchone()[0]
+    expected_types = dict(conn.execute(
+        "SELECT InteractionType, COUNT(*) FROM MLTrainingData GROUP BY InteractionType"
+    ).fetchall())
+    expected_rating = conn.execute("SELECT AVG(Rating), MIN(Rating), MAX(Rating) FROM MLTrainingData").fetchone()
+    conn.close()
+
+    with EnhancedDataLoader(db_path) as loader:
+        stats = loader.get_training_data_stats()
+    assert stats['total_interactions'] == expected_total
+    assert stats['unique_users'] == 12
+    assert stats['interaction_types'] == expected_types
+    assert stats['rating_stats'] == dict(zip(['avg', 'min', 'max'], expected_rating))
+
+    # Повторний запит - з кешу, без з'єднання з БД
+    with EnhancedDataLoader(db_path) as loader:
+        assert loader.get_training_data_stats() == stats
+        assert loader.connection is None
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO MLTrainingData (UserId, SpotifyTrackId, Rating, InteractionType) VALUES (99, 'x', 1.0, 7)")
+    conn.commit()
+    conn.close()
+
+    with EnhancedDataLoader(db_path) as loader:
+        updated = loader.get_training_data_stats()
+    assert updated['total_interactions'] == expected_total + 1
+    assert updated['interaction_types'][7] == 1
+
+
+def test_track_features_one_row_per_track_in_chunks(db_path):
+    conn = sqlite3.connect(db_path)
+    listened = [row[0] for row in conn.execute(
+        "SELECT SpotifyTrackId FROM History GROUP BY SpotifyTrackId HAVING COUNT(*) > 1"
+    )]
+    latest_year = dict(conn.execute(
+        "SELECT SpotifyTrackId, ReleaseYear FROM History h "
+        "WHERE Id = (SELECT MAX(Id) FROM History WHERE SpotifyTrackId = h.SpotifyTrackId)"
+    ).fetchall())
+    conn.close()
+    assert listened
+
+    # Більше id, ніж у одній порції, з повторами та невідомими треками
+    requested = [f"track{t:03d}" for t in range(60)] * 2 + [f"missing{i}" for i in range(1200)]
+    with EnhancedDataLoader(db_path) as loader:
+        loader.ensure_indexes()
+        df = loader.get_track_features_for_prediction(requested)
+
+    assert len(df) == 60
+    assert df['SpotifyTrackId'].is_unique
+    by_track = df.set_index('SpotifyTrackId')
+    for track_id in listened:
+        assert by_track.loc[track_id, 'ReleaseYear'] == latest_year[track_id]
+    assert by_track['Tempo_norm'].between(0, 1).all()
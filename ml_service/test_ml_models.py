@@ -0,0 +1,334 @@
+"""
+Тести MusicRecommenderML на тимчасовій БД (фікстура db_path з conftest.py)
+"""
+
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from threadpoolctl import threadpool_info
+
+from data_loader import DataLoader
+from matrix_factorization import BiasedMF
+from ml_models import MusicRecommenderML
+
+
+@pytest.fixture
+def recommender(db_path):
+    model = MusicRecommenderML()
+    model.data_loader = DataLoader(db_path)
+    model.train_models()
+    return model
+
+
+def test_collaborative_matrices_stay_sparse(recommender):
+    matrix = recommender.user_item_matrix
+    assert sp.isspmatrix_csr(matrix)
+    assert sp.isspmatrix_csr(recommender.user_item_matrix_normalized)
+    assert sp.issparse(recommender.active_user_matrix)
+
+    dense = matrix.toarray()
+    for u in range(dense.shape[0]):
+        rated = dense[u] > 0
+        assert recommender.user_means[u] == pytest.approx(dense[u][rated].mean())
+        np.testing.assert_allclose(
+            recommender.user_item_matrix_normalized[u].toarray()[0][rated],
+            dense[u][rated] - recommender.user_means[u]
+        )
+
+    recommendations = recommender.get_collaborative_recommendations(1, limit=5)
+    assert recommendations
+    heard = recommender.data_loader.get_listened_tracks(1)
+    assert not heard & {r['track_id'] for r in recommendations}
+
+
+def test_id_vocabularies_round_trip(recommender, tmp_path):
+    assert recommender.user_ids.dtype == np.int64
+    assert recommender.track_ids.dtype == object
+    codes = recommender.track_index.get_indexer(recommender.track_ids)
+    np.testing.assert_array_equal(codes, np.arange(len(recommender.track_ids)))
+    assert recommender._user_code(-1) == -1
+
+    recommender.save_models(str(tmp_path))
+    loaded = MusicRecommenderML()
+    loaded.data_loader = recommender.data_loader
+    assert loaded.load_models(str(tmp_path))
+    np.testing.assert_array_equal(loaded.user_ids, recommender.user_ids)
+    np.testing.assert_array_equal(loaded.track_ids, recommender.track_ids)
+    assert loaded.get_svd_recommendations(1, limit=5) == recommender.get_svd_recommendations(1, limit=5)
+
+
+@pytest.fixture
+def truncated_recommender(db_path):
+    model = MusicRecommenderML()
+    model.data_loader = DataLoader(db_path)
+    model.svd_algorithm = "truncated_svd"
+    model.train_models()
+    return model
+
+
+def test_svd_bias_model_matches_dense_reference(truncated_recommender):
+    recommender = truncated_recommender
+    dense = recommender.user_item_matrix.toarray()
+    rated = dense > 0
+    filled = np.where(rated, dense, np.where(rated.any(axis=1), recommender.user_means, recommender.global_mean)[:, None])
+    np.testing.assert_allclose(recommender.item_means, filled.mean(axis=0))
+
+    # Фактори відтворюють лише залишки реальних рейтингів, незаповнені клітинки - нулі
+    residuals = dense - recommender.user_means[:, None] - recommender.item_means[None, :] + recommender.global_mean
+    reconstructed = recommender.svd_user_factors @ recommender.svd_item_factors.T
+    assert np.mean((residuals[rated] - reconstructed[rated]) ** 2) < np.mean(residuals[rated] ** 2)
+
+
+def test_implicit_als_uses_listening_signals(recommender):
+    from implicit_als import implicit_matrices
+
+    confidence, preference = implicit_matrices(
+        np.array([1, 0, 1]), np.array([2, 1, 0]), np.array([3.0, -1.0, 0.0], dtype=np.float32),
+        shape=(2, 3), alpha=10.0
+    )
+    np.testing.assert_array_equal(confidence.indptr, preference.indptr)
+    np.testing.assert_array_equal(preference.toarray(), [[0, 0, 0], [0, 0, 1]])
+    assert confidence[0, 1] > 1.0  # Лише пропуски - впевнений негатив
+
+    model = recommender.als_model
+    assert model.user_factors.shape == (len(recommender.user_ids), model.factors)
+    assert model.item_factors.shape == (len(recommender.track_ids), model.factors)
+
+    # Прослухані треки отримують вищі скори, ніж решта каталогу
+    user_idx = recommender._user_code(1)
+    heard = recommender.track_index.get_indexer(list(recommender.data_loader.get_listened_tracks(1)))
+    scores = model.scores(user_idx)
+    assert scores[heard[heard >= 0]].mean() > np.delete(scores, heard).mean()
+
+    recommendations = recommender.get_als_recommendations(1, limit=5)
+    assert len(recommendations) == 5
+    assert not recommender.data_loader.get_listened_tracks(1) & {r['track_id'] for r in recommendations}
+    assert any('als' in r.get('methods_used', []) for r in recommender.get_hybrid_recommendations(1, limit=20))
+
+
+def test_sub_models_read_catalog_from_training_snapshot(db_path, monkeypatch):
+    model = MusicRecommenderML()
+    model.data_loader = DataLoader(db_path)
+    reads = []
+    get_track_catalog = model.data_loader.get_track_catalog
+
+    def tracked():
+        reads.append(model.data_loader.connections.is_pinned())
+        return get_track_catalog()
+
+    monkeypatch.setattr(model.data_loader, 'get_track_catalog', tracked)
+    metrics = model.train_models()
+    assert 'als_interactions' in metrics
+    # Під час тренування каталог читається лише з закріпленого знімка (потоки пулу його не бачать);
+    # останнє читання - прогрів кешів обслуговування після тренування
+    assert reads[0] is True and reads[1:] == [False]
+
+
+def test_biased_mf_learns_from_observed_ratings():
+    from matrix_factorization import BiasedMF
+
+    rng = np.random.default_rng(0)
+    n_users, n_items = 150, 100
+    users = rng.integers(0, n_users, 4000)
+    items = rng.integers(0, n_items, 4000)
+    users, items = np.unique(np.stack([users, items]), axis=1)
+    item_bias = rng.normal(0, 0.8, n_items)
+    ratings = np.clip(3.5 + item_bias[items] + rng.normal(0, 0.2, len(users)), 1, 5)
+
+    model = BiasedMF(n_components=4)
+    metrics = model.fit(users, items, ratings, n_users, n_items)
+    assert metrics["svd_stop_reason"] in ("early_stopping", "max_epochs")
+    assert metrics["svd_validation_rmse"] < np.std(ratings)
+    assert np.corrcoef(model.item_bias, item_bias)[0, 1] > 0.9
+
+    budgeted = BiasedMF(n_components=4, time_budget_seconds=0.0).fit(users, items, ratings, n_users, n_items)
+    assert budgeted["svd_epochs"] == 1 and budgeted["svd_stop_reason"] == "time_budget"
+
+
+def test_svd_recommendations_use_biased_mf_outputs(recommender):
+    assert isinstance(recommender.svd_model, BiasedMF)
+    np.testing.assert_allclose(recommender.item_means, recommender.global_mean + recommender.svd_model.item_bias)
+
+    user_idx = recommender._user_code(1)
+    recommendation = recommender.get_svd_recommendations(1, limit=1)[0]
+    item_idx = recommender.track_index.get_loc(recommendation['track_id'])
+    expected = recommender.svd_model.predict(np.array([user_idx]), np.array([item_idx]))[0]
+    assert recommendation['bias_corrected_prediction'] == pytest.approx(expected, rel=1e-5)
+    assert recommendation['user_bias'] == pytest.approx(recommender.svd_model.user_bias[user_idx])
+
+
+def test_new_and_changed_users_are_folded_in(recommender, db_path):
+    # До змін у БД натреновані рядки актуальні - без запитів та fold-in
+    assert recommender._folded_user(1, recommender._user_code(1)) is None
+    heard = recommender.data_loader.get_listened_tracks(1)
+    new_track = next(t for t in recommender.track_ids if t not in heard)
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO Favorites (UserId, SpotifyTrackId, AddedToFavoritesAt) VALUES (?, ?, '2025-07-01')",
+        [(900, 'track001'), (900, 'track002'), (900, 'track003'), (1, new_track)]
+    )
+    conn.commit()
+    conn.close()
+
+    svd = recommender.get_svd_recommendations(900, limit=5)
+    assert svd and all(r['folded_in'] for r in svd)
+    assert not {'track001', 'track002', 'track003'} & {r['track_id'] for r in svd}
+    assert recommender.get_collaborative_recommendations(900, limit=5)
+
+    # Fold-in розв'язує ту саму задачу найменших квадратів, що й явна формула
+    folded = recommender.fold_in_cache.get(900)
+    Q = recommender.svd_item_factors[folded.item_codes]
+    A = np.hstack([Q, np.ones((len(Q), 1))])
+    penalty = np.diag([recommender.fold_in_regularization] * Q.shape[1] + [recommender.fold_in_bias_regularization])
+    expected = np.linalg.solve(A.T @ A + penalty, A.T @ (folded.ratings - recommender.item_means[folded.item_codes]))
+    np.testing.assert_allclose(np.append(folded.factors, folded.bias), expected, rtol=1e-5, atol=1e-8)
+
+    changed = recommender._folded_user(1, recommender._user_code(1))
+    assert changed.changed and changed.factors is not None
+    assert any(r['folded_in'] for r in recommender.get_svd_recommendations(1, limit=1))
+    unchanged = recommender._folded_user(2, recommender._user_code(2))
+    assert not unchanged.changed
+
+    # Повторний запит - з кешу, поки історія не змінилась
+    assert recommender._folded_user(900, -1) is folded
+
+
+def test_fold_in_rebinds_only_to_unchanged_data(recommender, db_path):
+    # Версія з іншого процесу невідома: без змін у джерелах береться поточна
+    recommender._reset_fold_in(None, rebind=True)
+    assert recommender.model_data_version == recommender.data_loader.get_data_version()
+    assert recommender._folded_user(1, recommender._user_code(1)) is None
+
+    # Зміна оцінки на місці: watermark той самий, але версія не переприв'язується
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE UserSongInteractions SET Rating = 1 WHERE rowid = "
+                 "(SELECT MIN(rowid) FROM UserSongInteractions WHERE UserId = 1 AND Rating > 1)")
+    conn.commit()
+    conn.close()
+    assert recommender.data_loader.get_current_watermark() == recommender.training_watermark
+
+    recommender._reset_fold_in(None, rebind=True)
+    assert recommender.model_data_version is None
+    assert recommender._folded_user(1, recommender._user_code(1)) is not None
+
+
+def test_incremental_update_warm_starts_svd_factors(recommender, db_path):
+    heard = recommender.data_loader.get_listened_tracks(1)
+    new_track = next(t for t in recommender.track_ids if t not in heard)
+    user_factors = recommender.svd_user_factors
+    previous = user_factors.copy()
+    # Теплий старт зачіпає користувачів з дельти та всіх, хто оцінив треки з дельти
+    codes = recommender.track_index.get_indexer([new_track, 'track001', 'track002'])
+    touched = set(recommender.user_item_matrix[:, codes].nonzero()[0]) | {recommender._user_code(1)}
+    untouched = [u for u in range(len(recommender.user_ids)) if u not in touched]
+    assert untouched
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO Favorites (UserId, SpotifyTrackId, AddedToFavoritesAt) VALUES (?, ?, '2025-07-01')",
+        [(900, 'track001'), (900, 'track002'), (1, new_track)]
+    )
+    conn.commit()
+    conn.close()
+
+    metrics = recommender.update_incremental()
+    assert 'incremental_rebuild' not in metrics
+    assert metrics['svd_warm_start_users'] == 2 and metrics['svd_drift_growth'] > 0
+
+    # Новий користувач отримав рядок факторів, незачеплені рядки не змінились,
+    # а попередні масиви (які могли читати запити) лишились незмінними
+    assert recommender.svd_user_factors.shape[0] == len(recommender.user_ids)
+    assert recommender._user_code(900) >= 0
+    np.testing.assert_array_equal(recommender.svd_user_factors[untouched], previous[untouched])
+    assert not np.allclose(recommender.svd_user_factors[recommender._user_code(1)], previous[recommender._user_code(1)])
+    np.testing.assert_array_equal(user_factors, previous)
+    assert recommender.svd_drift_baseline['appended'] == 3
+    assert recommender.get_svd_recommendations(900, limit=3)
+
+    # Дрейф понад поріг - повне перенавчання з новою точкою відліку
+    recommender.svd_rebuild_growth = 0.0
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO Favorites (UserId, SpotifyTrackId, AddedToFavoritesAt) VALUES (900, 'track003', '2025-07-02')")
+    conn.commit()
+    conn.close()
+
+    metrics = recommender.update_incremental()
+    assert metrics['incremental_rebuild']
+    assert recommender.svd_drift_baseline['appended'] == 0
+    assert recommender.svd_drift_baseline['interactions'] == recommender.user_item_matrix.nnz
+
+
+def test_incremental_update_rebuilds_after_in_place_changes(recommender, db_path):
+    # Знижений рейтинг на місці: дельта за rowid його не бачить, maximum не може знизити
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM Favorites WHERE UserId = 1")
+    conn.execute("DELETE FROM History WHERE UserId = 1")
+    track_id = conn.execute(
+        "SELECT SpotifyTrackId FROM UserSongInteractions WHERE UserId = 1 AND Rating > 1 ORDER BY rowid"
+    ).fetchone()[0]
+    conn.execute("UPDATE UserSongInteractions SET Rating = 1 WHERE UserId = 1 AND SpotifyTrackId = ?", (track_id,))
+    conn.commit()
+    conn.close()
+
+    metrics = recommender.update_incremental()
+    assert metrics['incremental_rebuild'] == "враховані рядки змінені або видалені"
+    user, item = recommender._user_code(1), recommender.track_index.get_loc(track_id)
+    assert recommender.user_item_matrix[user, item] == 1
+
+    # Після повного тренування стан знову узгоджений - наступне оновлення інкрементальне
+    assert 'incremental_rebuild' not in recommender.update_incremental()
+
+
+def test_parallel_sub_models_match_sequential_training(recommender, db_path):
+    sequential = MusicRecommenderML()
+    sequential.data_loader = DataLoader(db_path)
+    sequential.training_workers = 1
+    sequential.training_cpu_budget = {"content": 1, "als": 1}
+    metrics = sequential.train_models()
+
+    assert {'data', 'rating_matrix', 'content', 'collaborative', 'svd', 'als',
+            'sub_models_wall', 'serving_caches'} <= set(metrics['stage_durations'])
+    assert metrics['training_duration'] >= metrics['stage_durations']['sub_models_wall']
+    assert sequential._cpu_budget("content") == 1
+
+    # Під-моделі не залежать одна від одної - паралельне тренування дає ті самі моделі
+    np.testing.assert_array_equal(sequential.svd_user_factors, recommender.svd_user_factors)
+    np.testing.assert_array_equal(sequential.als_model.item_factors, recommender.als_model.item_factors)
+    np.testing.assert_array_equal(sequential.active_user_indices, recommender.active_user_indices)
+    X = np.random.default_rng(0).random((5, len(recommender.feature_columns)))
+    np.testing.assert_array_equal(sequential.content_model.predict(X), recommender.content_model.predict(X))
+
+    # Одночасні під-моделі: BLAS однопотоковий, ядра діляться між усіма під-моделями пулу
+    def blas_threads():
+        return {"blas_threads": [info["num_threads"] for info in threadpool_info() if info["user_api"] == "blas"]}
+    metrics, _ = recommender._train_sub_models({"blas": blas_threads, "other": dict}, lambda stage, fraction: None)
+    assert set(metrics["blas_threads"]) <= {1}
+    assert recommender._cpu_budget("als") == max(1, (os.cpu_count() or 1) // 2)
+
+
+def test_content_recommendations_walk_precomputed_ranking(recommender):
+    catalog = recommender.data_loader.get_track_catalog()
+    ranking = recommender.content_ranking
+    assert ranking is not None and ranking.catalog_fingerprint == catalog.fingerprint
+
+    # Та ж відповідь, що й предикція по всіх непрослуханих треках
+    listened = recommender.data_loader.get_listened_tracks(1)
+    X = np.nan_to_num(catalog.feature_matrix(recommender.feature_columns, np.arange(len(catalog))))
+    scores = recommender.content_model.predict(recommender.scaler.transform(X))
+    expected = [(catalog.track_ids[row], scores[row]) for row in np.argsort(-scores, kind='stable')
+                if catalog.track_ids[row] not in listened][:7]
+    result = recommender.get_content_recommendations(1, limit=7)
+    assert [r['track_id'] for r in result] == [track_id for track_id, _ in expected]
+    np.testing.assert_allclose([r['predicted_rating'] for r in result], [score for _, score in expected])
+    assert recommender.content_ranking is ranking
+
+    # Нова версія БД з тим самим каталогом - лише перевірка відбитка, без предикції
+    recommender.content_ranking = ranking._replace(catalog_version=None)
+    recommender.content_model.predict = lambda X: pytest.fail("ранжування має перевикористовуватись")
+    assert [r['track_id'] for r in recommender.get_content_recommendations(1, limit=7)] == \
+        [r['track_id'] for r in result]
+    assert recommender.content_ranking.catalog_version == catalog.data_version
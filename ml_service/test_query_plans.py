@@ -0,0 +1,129 @@
+"""
+Перевірка планів запитів: per-request запити DataLoader та EnhancedDataLoader
+не повинні сканувати великі таблиці повністю (лише SEARCH по індексах).
+Масові запити (тренування, знімки, статистика) та обслуговування (cleanup_old_metrics -
+ROW_NUMBER по всіх метриках) сканують таблиці за призначенням - вони виконуються
+та перевіряються EXPLAIN, але сканування дозволені.
+"""
+
+import re
+import sqlite3
+
+import pytest
+
+from data_loader import DataLoader
+from db_indexes import REQUIRED_INDEXES, missing_indexes, provision_indexes
+from enhanced_data_loader import EnhancedDataLoader
+
+LARGE_TABLES = {
+    'History', 'Favorites', 'UserSongInteractions', 'SongFeatures', 'MLTrainingData', 'MLModelMetrics',
+    'MLDataWatermarks',  # Невелика, але пошук watermark за назвою має йти по первинному ключу
+}
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)')
+
+
+def _data_loader_calls(loader: DataLoader):
+    watermark = loader.get_current_watermark()
+    loader.save_watermark(watermark)
+    per_request = {
+        'get_listened_tracks': lambda: loader.get_listened_tracks(3),
+        'get_user_profile': lambda: loader.get_user_profile(3),
+        'get_user_ratings': lambda: loader.get_user_ratings(3),
+        'load_user_history': lambda: loader.load_user_history(3),
+        'load_interactions_since': lambda: loader.load_interactions_since(watermark),
+        'get_current_watermark': loader.get_current_watermark,
+        'load_watermark': loader.load_watermark,
+    }
+    bulk = {
+        'load_user_interactions': loader.load_user_interactions,
+        'load_song_features': loader.load_song_features,
+        'load_interaction_arrays': loader.load_interaction_arrays,
+        'load_implicit_signals': loader.load_implicit_signals,
+        'prepare_training_set': lambda: loader.prepare_training_set(['Danceability', 'Tempo_norm']),
+        'get_all_user_profiles': loader.get_all_user_profiles,
+        'training_data_fingerprint': lambda: loader.training_data_fingerprint(['Danceability']),
+    }
+    return per_request, bulk
+
+
+def _enhanced_loader_calls(loader: EnhancedDataLoader):
+    per_request = {
+        'get_user_interaction_history': lambda: loader.get_user_interaction_history(3),
+        'get_track_features_for_prediction':
+            lambda: loader.get_track_features_for_prediction(['track001', 'track002', 'missing']),
+        'get_latest_model_metrics': lambda: loader.get_latest_model_metrics('Hybrid'),
+    }
+    bulk = {
+        'load_ml_training_data': lambda: loader.load_ml_training_data(time_window_days=30),
+        'get_training_data_stats': loader._read_training_data_stats,
+        'load_user_profiles': loader.load_user_profiles,
+        'cleanup_old_metrics': lambda: loader.cleanup_old_metrics(keep_last_n=1),
+    }
+    return per_request, bulk
+
+
+def _capture(conn: sqlite3.Connection, call) -> list:
+    """SQL запити (з підставленими параметрами), виконані під час call()"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith(('SELECT', 'WITH'))]
+
+
+def _full_scans(conn: sqlite3.Connection, statement: str) -> list:
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+    scans = []
+    for row in plan:
+        match = FULL_SCAN.match(row[-1])
+        if match and match.group(1) in LARGE_TABLES:
+            scans.append(row[-1])
+    return scans
+
+
+def _check(conn, per_request: dict, bulk: dict):
+    failures = []
+    for name, call in per_request.items():
+        statements = _capture(conn, call)
+        assert statements, f"{name}: не виконано жодного запиту"
+        for statement in statements:
+            scans = _full_scans(conn, statement)
+            if scans:
+                failures.append(f"{name}: {scans}\n{statement}")
+
+    for name, call in bulk.items():
+        for statement in _capture(conn, call):
+            _full_scans(conn, statement)  # Запит має бути валідним, сканування дозволені
+
+    assert not failures, "Повне сканування великих таблиць:\n" + "\n\n".join(failures)
+
+
+@pytest.fixture
+def provisioned_db(db_path):
+    created = provision_indexes(db_path)
+    assert created
+    conn = sqlite3.connect(db_path)
+    assert missing_indexes(conn) == {}
+    conn.close()
+    assert provision_indexes(db_path) == []
+    return db_path
+
+
+def test_required_indexes_cover_all_tables(provisioned_db):
+    conn = sqlite3.connect(provisioned_db)
+    indexed = {row[0] for row in conn.execute("SELECT tbl_name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert {table for table, _ in REQUIRED_INDEXES.values()} <= indexed
+
+
+def test_data_loader_per_request_queries_use_indexes(provisioned_db):
+    loader = DataLoader(provisioned_db)
+    _check(loader.connect_db(), *_data_loader_calls(loader))
+
+
+def test_enhanced_loader_per_request_queries_use_indexes(provisioned_db):
+    with EnhancedDataLoader(provisioned_db) as loader:
+        _check(loader.get_connection(), *_enhanced_loader_calls(loader))
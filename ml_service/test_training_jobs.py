@@ -0,0 +1,70 @@
+"""
+Фонові задачі тренування: знімок моделі між процесами та атомарна підміна
+"""
+
+import pickle
+
+from data_loader import DataLoader
+from ml_models import MusicRecommenderML
+from training_jobs import COMPLETED, FAILED, FULL, INCREMENTAL, ModelHolder, TrainingJobManager
+
+
+def _untrained(db_path: str) -> MusicRecommenderML:
+    model = MusicRecommenderML()
+    model.data_loader = DataLoader(db_path)
+    return model
+
+
+def test_model_snapshot_pickles_without_process_state(db_path):
+    model = _untrained(db_path)
+    model.train_models()
+    model.get_svd_recommendations(1, limit=5)
+
+    copy = pickle.loads(pickle.dumps(model))
+    assert copy.data_loader.db_path == db_path
+    assert copy.data_loader.connections is model.data_loader.connections  # Спільний менеджер процесу
+    assert len(copy.fold_in_cache) == 0 and copy.fold_in_cache.max_size == model.fold_in_cache.max_size
+    assert copy.model_data_version == model.model_data_version
+    assert ([r['track_id'] for r in copy.get_svd_recommendations(1, limit=5)]
+            == [r['track_id'] for r in model.get_svd_recommendations(1, limit=5)])
+
+
+def test_training_job_swaps_in_complete_snapshot(db_path):
+    initial = _untrained(db_path)
+    holder = ModelHolder(initial)
+    completed = []
+    manager = TrainingJobManager(holder, on_complete=completed.append)
+
+    job = manager.start(FULL)
+    assert manager.start(FULL) is job  # Одночасно лише одна задача
+    assert job.wait(timeout=300)
+    assert job.status == COMPLETED, job.error
+    assert job.progress == 1.0 and job.metrics['unique_users'] > 0
+    assert completed == [job]
+
+    # Запити, що тримали попередній знімок, його не бачать зміненим
+    trained = holder.current
+    assert trained is not initial and trained.is_trained and not initial.is_trained
+    assert holder.version == job.model_version == 1
+    # Версія БД знімка - версія цього процесу: незмінені користувачі не перевіряються
+    assert trained.model_data_version == trained.data_loader.get_data_version()
+    assert trained._folded_user(1, trained._user_code(1)) is None
+    assert trained.get_svd_recommendations(1, limit=3)
+
+    update = manager.start(INCREMENTAL)
+    assert update is not job and update.wait(timeout=300)
+    assert update.status == COMPLETED, update.error
+    assert holder.current is not trained and holder.version == 2
+    assert [j.job_id for j in manager.jobs()] == [update.job_id, job.job_id]
+    assert manager.get(job.job_id) is job
+
+
+def test_failed_training_job_keeps_current_snapshot(tmp_path):
+    initial = _untrained(str(tmp_path / "missing.db"))
+    holder = ModelHolder(initial)
+    manager = TrainingJobManager(holder)
+
+    job = manager.start(FULL)
+    assert job.wait(timeout=300)
+    assert job.status == FAILED and job.error
+    assert holder.current is initial and holder.version == 0
@@ -0,0 +1,116 @@
+import hashlib
+import sys
+from functools import cached_property
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional, Tuple
+
+# Числові фічі треку, що зберігаються в суцільній float32 матриці
+FEATURE_COLUMNS = [
+    'Danceability', 'Energy', 'Valence', 'Tempo',
+    'Acousticness', 'Instrumentalness', 'Speechiness',
+    'Loudness', 'Popularity', 'Key', 'Mode', 'TimeSignature', 'DurationMs'
+]
+
+# Текстові метадані для відображення рекомендацій
+METADATA_COLUMNS = ['Title', 'Artist', 'Genre']
+
+
+class TrackCatalog:
+    """
+    Колонковий каталог треків у пам'яті, побудований один раз на версію БД.
+    Спільний для всіх рекомендерів - як для доступу до фічей, так і для
+    додавання метаданих до результатів. Масиви не можна модифікувати.
+    """
+
+    def __init__(self, song_features: pd.DataFrame, data_version: Optional[Tuple] = None):
+        self.data_version = data_version
+        self.frame = song_features.reset_index(drop=True)
+
+        self.track_ids = self.frame['SpotifyTrackId'].to_numpy(dtype=object) \
+            if not self.frame.empty else np.empty(0, dtype=object)
+        self.row_index: Dict[str, int] = {track_id: row for row, track_id in enumerate(self.track_ids)}
+
+        self.column_index = {column: i for i, column in enumerate(FEATURE_COLUMNS)}
+        features = np.empty((len(self.frame), len(FEATURE_COLUMNS)), dtype=np.float32)
+        for column, i in self.column_index.items():
+            if column in self.frame:
+                features[:, i] = pd.to_numeric(self.frame[column], errors='coerce').to_numpy(dtype=np.float32)
+            else:
+                features[:, i] = np.nan
+        self.features = np.ascontiguousarray(features)
+        self.features.setflags(write=False)
+
+        # Інтернуємо рядки - артисти та жанри сильно повторюються
+        self.metadata: Dict[str, np.ndarray] = {}
+        for column in METADATA_COLUMNS:
+            if column in self.frame:
+                values = [sys.intern(v) if isinstance(v, str) else v for v in self.frame[column]]
+            else:
+                values = [None] * len(self.frame)
+            self.metadata[column] = np.array(values, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """
+        Відбиток вмісту (id треків та фічі в порядку рядків). На відміну від data_version
+        не змінюється від записів в інші таблиці та однаковий у різних процесах.
+        """
+        digest = hashlib.sha1("\0".join(map(str, self.track_ids)).encode('utf-8'))
+        digest.update(self.features.tobytes())
+        return digest.hexdigest()
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self.row_index
+
+    def rows(self, track_ids: Iterable[str]) -> np.ndarray:
+        """Номери рядків для треків (-1 для відсутніх у каталозі)"""
+        return np.array([self.row_index.get(track_id, -1) for track_id in track_ids], dtype=np.int64)
+
+    def rows_excluding(self, track_ids: Iterable[str]) -> np.ndarray:
+        """Номери рядків усіх треків каталогу, крім вказаних"""
+        mask = np.ones(len(self), dtype=bool)
+        excluded = [self.row_index[t] for t in track_ids if t in self.row_index]
+        mask[excluded] = False
+        return np.flatnonzero(mask)
+
+    def feature(self, column: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Колонка фічі (для всіх або вибраних рядків)"""
+        values = self.features[:, self.column_index[column]]
+        return values if rows is None else values[rows]
+
+    def valid_rows_mask(self, columns: Iterable[str]) -> np.ndarray:
+        """Маска рядків без NaN у вказаних фічах (*_norm перевіряються за базовою колонкою)"""
+        indices = [self.column_index[_base_column(column)] for column in columns]
+        return ~np.isnan(self.features[:, indices]).any(axis=1)
+
+    def feature_matrix(self, columns: Iterable[str], rows: np.ndarray) -> np.ndarray:
+        """
+        Матриця фічей (float32) для вибраних рядків.
+        Колонки *_norm - min-max нормалізація базової колонки по цих рядках.
+        """
+        columns = list(columns)
+        matrix = np.empty((len(rows), len(columns)), dtype=np.float32)
+        for i, column in enumerate(columns):
+            values = self.feature(_base_column(column), rows)
+            if column.endswith('_norm') and len(values):
+                low, high = np.nanmin(values), np.nanmax(values)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    values = (values - low) / (high - low)
+            matrix[:, i] = values
+        return matrix
+
+    def track_info(self, track_id: str) -> Dict:
+        """Метадані треку ({} якщо трека немає в каталозі)"""
+        row = self.row_index.get(track_id)
+        if row is None:
+            return {}
+        return {column: values[row] for column, values in self.metadata.items()}
+
+
+def _base_column(column: str) -> str:
+    """Tempo_norm -> Tempo"""
+    return column[:-len('_norm')] if column.endswith('_norm') else column
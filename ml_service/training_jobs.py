@@ -0,0 +1,241 @@
+"""
+Фонові задачі тренування.
+Моделі тренуються в окремому процесі на власній копії MusicRecommenderML, поки
+запити обслуговуються попереднім знімком. Готовий знімок повертається через pipe
+та публікується в ModelHolder одним присвоєнням посилання.
+"""
+
+import logging
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from ml_models import MusicRecommenderML
+
+logger = logging.getLogger(__name__)
+
+# Типи задач
+FULL = "full"
+INCREMENTAL = "incremental"
+
+# Стани задач
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class ModelHolder:
+    """
+    Поточний знімок моделей для запитів. Опублікований знімок не змінюється:
+    тренування будує новий об'єкт, а swap() підміняє посилання, тож запит,
+    що взяв current на початку, до кінця працює з одним узгодженим знімком.
+    """
+
+    def __init__(self, model: MusicRecommenderML):
+        self._model = model
+        self._lock = threading.Lock()
+        self.version = 0
+
+    @property
+    def current(self) -> MusicRecommenderML:
+        return self._model
+
+    def swap(self, model: MusicRecommenderML) -> MusicRecommenderML:
+        """Публікація нового знімка; повертає попередній"""
+        with self._lock:
+            previous, self._model = self._model, model
+            self.version += 1
+        return previous
+
+
+class TrainingJob:
+    """Стан фонової задачі тренування (оновлюється потоком, що стежить за процесом)"""
+
+    def __init__(self, kind: str):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.progress = 0.0
+        self.metrics: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.model_version: Optional[int] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Очікування завершення (True - задача завершилась)"""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "metrics": self.metrics,
+            "error": self.error,
+            "model_version": self.model_version,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+def _run_training_job(kind: str, model: MusicRecommenderML, connection):
+    """
+    Тіло дочірнього процесу: тренування переданої копії моделі. Прогрес та
+    результат (модель з метриками або помилка) надсилаються через pipe.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        def report(stage: str, fraction: float):
+            connection.send(("progress", stage, fraction))
+
+        if kind == FULL:
+            metrics = model.train_models(progress=report)
+        else:
+            report(INCREMENTAL, 0.0)
+            metrics = model.update_incremental()
+
+        if "error" in metrics:
+            connection.send(("error", str(metrics["error"])))
+        else:
+            connection.send(("done", model, metrics))
+    except Exception as e:
+        logger.exception(f"❌ Помилка тренування в процесі задачі: {e}")
+        connection.send(("error", str(e)))
+    finally:
+        connection.close()
+
+
+class TrainingJobManager:
+    """
+    Запуск задач тренування в окремих процесах (spawn - без успадкування потоків
+    та з'єднань SQLite сервісу) та публікація результатів у ModelHolder.
+    Одночасно виконується одна задача: повторний запуск повертає активну.
+    """
+
+    def __init__(self, holder: ModelHolder, model_factory: Optional[Callable[[], MusicRecommenderML]] = None,
+                 on_complete: Optional[Callable[[TrainingJob], None]] = None, max_history: int = 20):
+        self.holder = holder
+        self.model_factory = model_factory or self._fresh_model
+        self.on_complete = on_complete
+        self.max_history = max_history
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self._active: Optional[TrainingJob] = None
+        self._lock = threading.Lock()
+
+    def _fresh_model(self) -> MusicRecommenderML:
+        """Ненатренована модель з тим самим джерелом даних, що й поточний знімок"""
+        model = MusicRecommenderML()
+        model.data_loader = self.holder.current.data_loader
+        return model
+
+    def start(self, kind: str = FULL) -> TrainingJob:
+        """
+        Запуск задачі: full - тренування нової моделі з нуля, incremental -
+        update_incremental на копії поточного знімка
+        """
+        if kind not in (FULL, INCREMENTAL):
+            raise ValueError(f"Невідомий тип задачі тренування: {kind}")
+
+        with self._lock:
+            if self._active is not None and not self._active.finished:
+                return self._active
+
+            job = TrainingJob(kind)
+            base_model = self.holder.current if kind == INCREMENTAL else self.model_factory()
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+            self._active = job
+
+        thread = threading.Thread(target=self._run, args=(job, base_model),
+                                  name=f"training-{job.job_id[:8]}", daemon=True)
+        thread.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[TrainingJob]:
+        return list(reversed(self._jobs.values()))
+
+    @property
+    def active(self) -> Optional[TrainingJob]:
+        job = self._active
+        return job if job is not None and not job.finished else None
+
+    def _run(self, job: TrainingJob, base_model: MusicRecommenderML):
+        """Потік-спостерігач: запуск процесу, прогрес з pipe, публікація знімка"""
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_run_training_job, args=(job.kind, base_model, sender),
+                                        name=f"training-{job.job_id[:8]}", daemon=True)
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        logger.info(f"🚀 Задача тренування {job.job_id} ({job.kind}) запущена")
+
+        try:
+            process.start()
+            sender.close()  # Після завершення дочірнього процесу recv() отримає EOF
+
+            while True:
+                try:
+                    message = receiver.recv()
+                except EOFError:
+                    process.join()
+                    raise RuntimeError(f"Процес тренування завершився без результату (код {process.exitcode})")
+
+                if message[0] == "progress":
+                    _, job.stage, job.progress = message
+                elif message[0] == "error":
+                    raise RuntimeError(message[1])
+                else:
+                    _, model, metrics = message
+                    break
+
+            process.join()
+
+            # Версія БД (PRAGMA data_version) локальна для процесу: знімок прив'язується до версії
+            # цього процесу, якщо вміст джерел не змінився після тренування (інакше fold-in перевіряє)
+            job.stage = "publish"
+            model._reset_fold_in(None, rebind=True)
+
+            # Кеші процесу сервісу прогріваються до підміни - перші запити не чекають на БД
+            model.warm_serving_caches()
+            self.holder.swap(model)
+
+            job.metrics = metrics
+            job.model_version = self.holder.version
+            job.progress = 1.0
+            job.status = COMPLETED
+            logger.info(f"✅ Задача тренування {job.job_id} завершена, знімок моделей v{job.model_version}")
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.error(f"❌ Задача тренування {job.job_id} завершилась помилкою: {e}")
+        finally:
+            receiver.close()
+            if process.is_alive():
+                process.terminate()
+            job.finished_at = datetime.now()
+
+        if job.status == COMPLETED and self.on_complete is not None:
+            try:
+                self.on_complete(job)
+            except Exception as e:
+                logger.warning(f"Обробник завершення задачі {job.job_id}: {e}")
+        job._done.set()
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+
+class TrainingSetStore:
+    """
+    Колонкове сховище підготовлених даних для тренування на диску.
+    Кожен знімок - директорія з .npy файлами (по одному на масив) та manifest.json.
+    Ім'я директорії - хеш відбитка даних, тож знімок перевикористовується
+    лише поки джерела не змінились. Масиви читаються через memory-map.
+    """
+
+    def __init__(self, root: str, keep: int = 3):
+        self.root = root
+        self.keep = keep
+
+    @staticmethod
+    def key(fingerprint: Dict) -> str:
+        payload = json.dumps({'format': FORMAT_VERSION, **fingerprint}, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    def path(self, fingerprint: Dict) -> str:
+        return os.path.join(self.root, self.key(fingerprint))
+
+    def load(self, fingerprint: Dict) -> Optional[Dict[str, np.ndarray]]:
+        """Масиви знімка для відбитка (None якщо знімка немає або він пошкоджений)"""
+        path = self.path(fingerprint)
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            # Числові масиви не копіюються в пам'ять - сторінки підтягуються з диска
+            arrays = {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+                for name in manifest['arrays']
+            }
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Знімок даних {path} пошкоджений, буде перебудований: {e}")
+            return None
+
+        os.utime(path)  # Для вибору найстаріших знімків при очищенні
+        logger.info(f"Завантажено знімок даних для тренування з {path}")
+        return arrays
+
+    def save(self, fingerprint: Dict, arrays: Dict[str, np.ndarray]) -> str:
+        """Атомарний запис знімка (тимчасова директорія + rename)"""
+        path = self.path(fingerprint)
+        if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            return path
+
+        shutil.rmtree(path, ignore_errors=True)  # Недописаний знімок без manifest
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+            manifest = {
+                'format': FORMAT_VERSION,
+                'fingerprint': fingerprint,
+                'arrays': {name: {'dtype': str(array.dtype), 'shape': list(array.shape)}
+                           for name, array in arrays.items()},
+                'created_at': datetime.now().isoformat(),
+            }
+            with open(os.path.join(tmp_path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+
+            os.rename(tmp_path, path)
+        except OSError:
+            # Інший процес міг записати той самий знімок паралельно
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+                raise
+
+        logger.info(f"Збережено знімок даних для тренування в {path}")
+        self.prune()
+        return path
+
+    def prune(self):
+        """Видалення найстаріших знімків понад keep"""
+        if not os.path.isdir(self.root):
+            return
+        snapshots = [
+            os.path.join(self.root, name) for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, MANIFEST_FILE))
+        ]
+        snapshots.sort(key=os.path.getmtime, reverse=True)
+        for path in snapshots[self.keep:]:
+            shutil.rmtree(path, ignore_errors=True)